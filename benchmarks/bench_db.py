@@ -0,0 +1,239 @@
+"""
+Microbenchmarks of every function in db/reads.py and db/writes.py.
+
+Each call runs in its own app context, the way a request would, so it includes
+checking a connection out of the pool.
+"""
+
+import datetime as dt
+import time
+from itertools import islice
+from typing import Any
+
+from common import measure, summarize
+from sqlalchemy import text
+
+from car_mileage_log_flask.app import app
+from car_mileage_log_flask.db import orm_reads, reads, writes
+from car_mileage_log_flask.db.connection import get_engine
+from car_mileage_log_flask.domain import DriveLogStatus, JobSite, Vehicle
+
+
+def _in_app_context(fn):
+    def call():
+        with app.app_context():
+            return fn()
+
+    return call
+
+
+def _timed(fn) -> float:
+    start = time.perf_counter()
+    with app.app_context():
+        fn()
+    return time.perf_counter() - start
+
+
+# writes go to the first vehicle, reads are scoped to it
+VEHICLE_ID = 1
+
+
+def _last_end_km() -> int:
+    sql = "SELECT coalesce(max(end_km), 0) FROM drive_log_drivelog WHERE vehicle_id = :vehicle_id"
+    with get_engine().connect() as conn:
+        return conn.execute(text(sql), {"vehicle_id": VEHICLE_ID}).scalar_one()
+
+
+def _reads(iterations: int, slow_iterations: int) -> list[dict[str, Any]]:
+    with app.app_context():
+        page = reads.select_completed_drive_logs_page(limit=50, vehicle_id=VEHICLE_ID)
+    cursor = page.next_cursor
+    some_id = page.drive_logs[0].id if page.drive_logs else 1
+    created_at = dt.datetime.now(dt.timezone.utc)
+
+    cases = {
+        "select_all_job_sites": reads.select_all_job_sites,
+        "select_all_job_sites (uncached)": reads._select_all_job_sites,
+        "search_job_sites": lambda: reads.search_job_sites("job site 1", limit=10),
+        "search_job_sites (empty query)": lambda: reads.search_job_sites("", limit=10),
+        "select_job_site_by_id": lambda: reads.select_job_site_by_id(id=1),
+        "select_job_site_by_id (uncached)": lambda: reads._select_job_site_by_id(id=1),
+        "job_site_select_most_recent": lambda: reads.job_site_select_most_recent(VEHICLE_ID),
+        "select_completed_drive_logs_page": lambda: reads.select_completed_drive_logs_page(limit=50),
+        "select_completed_drive_logs_page (vehicle)": (
+            lambda: reads.select_completed_drive_logs_page(limit=50, vehicle_id=VEHICLE_ID)
+        ),
+        "select_completed_drive_logs_page (vehicle, after cursor)": (
+            lambda: reads.select_completed_drive_logs_page(
+                limit=50, after=cursor, vehicle_id=VEHICLE_ID
+            )
+        ),
+        "iter_completed_drive_logs (first 1000)": (
+            lambda: list(islice(reads.iter_completed_drive_logs(), 1000))
+        ),
+        "drive_log_select_earliest_in_progress": (
+            lambda: reads.drive_log_select_earliest_in_progress(VEHICLE_ID)
+        ),
+        "drive_log_select_last_completed": lambda: reads.drive_log_select_last_completed(VEHICLE_ID),
+        "drive_log_select_last_before": (
+            lambda: reads.drive_log_select_last_before(VEHICLE_ID, dt.date.today(), created_at)
+        ),
+        "select_start_drive_context": lambda: reads.select_start_drive_context(VEHICLE_ID),
+        "select_odometer_state": lambda: reads.select_odometer_state(VEHICLE_ID),
+        "select_job_site_history (90 days)": (
+            lambda: orm_reads.select_job_site_history(
+                id=1, since=dt.date.today() - dt.timedelta(days=90)
+            )
+        ),
+        "drive_log_select_by_id": lambda: reads.drive_log_select_by_id(id=some_id),
+        "drive_log_select_for_edit": lambda: reads.drive_log_select_for_edit(id=some_id),
+        "drive_logs_select_count_in_progress": (
+            lambda: reads.drive_logs_select_count_in_progress(VEHICLE_ID)
+        ),
+        "select_all_vehicles": reads.select_all_vehicles,
+        "select_vehicle_by_id": lambda: reads.select_vehicle_by_id(VEHICLE_ID),
+        "select_first_vehicle": reads.select_first_vehicle,
+        "select_user_by_username": lambda: reads.select_user_by_username("bench"),
+    }
+    results = [
+        measure(name, "db.reads", _in_app_context(fn), iterations)
+        for name, fn in cases.items()
+    ]
+    # loads the whole history, kept to show what pagination saves
+    results.append(
+        measure(
+            "select_completed_drive_logs",
+            "db.reads",
+            _in_app_context(reads.select_completed_drive_logs),
+            slow_iterations,
+            warmup=1,
+        )
+    )
+    return results
+
+
+def _drive_writes(iterations: int) -> list[dict[str, Any]]:
+    start_samples, end_samples, insert_samples, delete_samples = [], [], [], []
+    km = _last_end_km()
+
+    for _ in range(iterations):
+        km += 10
+        start_input = writes.StartDriveInput(
+            date=dt.date.today(), start_km=km, job_site_id=1, vehicle_id=VEHICLE_ID
+        )
+        start_samples.append(_timed(lambda: writes.start_drive(input=start_input)))
+
+        with app.app_context():
+            drive_log = reads.drive_log_select_earliest_in_progress(VEHICLE_ID)
+        assert drive_log is not None
+
+        km += 25
+        end_input = writes.EndDriveInput(id=drive_log.id, end_km=km)
+        end_samples.append(_timed(lambda: writes.end_drive(input=end_input)))
+
+    inserted_from_km = km + 10
+    for _ in range(iterations):
+        km += 10
+        insert_samples.append(
+            _timed(
+                lambda: writes.drive_log_insert(
+                    date=dt.date.today(),
+                    start_km=km,
+                    end_km=km + 5,
+                    status=DriveLogStatus.COMPLETED.value,
+                    job_site_id=1,
+                    vehicle_id=VEHICLE_ID,
+                )
+            )
+        )
+        km += 5
+
+    with get_engine().connect() as conn:
+        ids = conn.execute(
+            text(
+                "SELECT id FROM drive_log_drivelog"
+                " WHERE vehicle_id = :vehicle_id AND start_km >= :km"
+            ),
+            {"vehicle_id": VEHICLE_ID, "km": inserted_from_km},
+        ).scalars().all()
+    for id in ids:
+        delete_samples.append(_timed(lambda: writes.drive_log_delete(id=id)))
+
+    return [
+        summarize("start_drive", "db.writes", start_samples),
+        summarize("end_drive", "db.writes", end_samples),
+        summarize("drive_log_insert", "db.writes", insert_samples),
+        summarize("drive_log_delete", "db.writes", delete_samples),
+    ]
+
+
+def _bulk_insert(iterations: int, batch_size: int = 500) -> dict[str, Any]:
+    km = _last_end_km()
+    samples = []
+    for _ in range(iterations):
+        rows = []
+        for _ in range(batch_size):
+            km += 10
+            rows.append(
+                {
+                    "date": dt.date.today(),
+                    "start_km": km,
+                    "end_km": km + 5,
+                    "status": DriveLogStatus.COMPLETED.value,
+                    "job_site_id": 1,
+                    "vehicle_id": VEHICLE_ID,
+                    "created_at": dt.datetime.now(dt.timezone.utc),
+                }
+            )
+            km += 5
+        samples.append(_timed(lambda: writes.drive_logs_insert_many(rows)))
+    return summarize(f"drive_logs_insert_many ({batch_size} rows)", "db.writes", samples)
+
+
+def _job_site_writes(iterations: int) -> list[dict[str, Any]]:
+    insert_samples, update_samples, delete_samples = [], [], []
+    for i in range(iterations):
+        job_site = JobSite(id=None, name=f"Bench {i}", address=f"{i} Bench Road")
+        insert_samples.append(_timed(lambda: writes.insert_job_site(job_site=job_site)))
+
+        with get_engine().connect() as conn:
+            id = conn.execute(text("SELECT max(id) FROM drive_log_jobsite")).scalar_one()
+
+        job_site = JobSite(id=id, name=f"Bench {i} edited", address=f"{i} Bench Road")
+        update_samples.append(_timed(lambda: writes.update_job_site(job_site=job_site)))
+        delete_samples.append(_timed(lambda: writes.delete_job_site(id=id)))
+
+    return [
+        summarize("insert_job_site", "db.writes", insert_samples),
+        summarize("update_job_site", "db.writes", update_samples),
+        summarize("delete_job_site", "db.writes", delete_samples),
+    ]
+
+
+def _vehicle_and_user_writes(iterations: int) -> list[dict[str, Any]]:
+    vehicle_samples, user_samples = [], []
+    for i in range(iterations):
+        vehicle = Vehicle(id=None, name=f"Bench vehicle {i}", plate=f"WRITE{i}")
+        vehicle_samples.append(_timed(lambda: writes.insert_vehicle(vehicle=vehicle)))
+        user_samples.append(
+            _timed(lambda: writes.insert_user(username=f"bench-{i}", password_hash="-"))
+        )
+    return [
+        summarize("insert_vehicle", "db.writes", vehicle_samples),
+        summarize("insert_user", "db.writes", user_samples),
+    ]
+
+
+def _rebuild_odometer_state(iterations: int) -> dict[str, Any]:
+    samples = [_timed(writes.rebuild_odometer_state) for _ in range(iterations)]
+    return summarize("rebuild_odometer_state", "db.writes", samples)
+
+
+def run(iterations: int, slow_iterations: int) -> list[dict[str, Any]]:
+    results = _reads(iterations, slow_iterations)
+    results += _drive_writes(iterations)
+    results.append(_bulk_insert(max(1, iterations // 10)))
+    results += _job_site_writes(iterations)
+    results += _vehicle_and_user_writes(iterations)
+    results.append(_rebuild_odometer_state(slow_iterations))
+    return results
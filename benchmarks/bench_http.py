@@ -0,0 +1,112 @@
+"""
+Hot path benchmarks through the Flask test client.
+
+Covers the full request: routing, session, views, SQL and template rendering,
+without a network or WSGI server in between.
+"""
+
+import datetime as dt
+import time
+from typing import Any
+
+from common import measure, summarize
+
+from car_mileage_log_flask.app import app
+from car_mileage_log_flask.db.reads import (
+    DriveLogCursor,
+    drive_log_select_last_completed,
+    select_completed_drive_logs_page,
+)
+
+# the first vehicle, the one a new session drives
+VEHICLE_ID = 1
+
+
+def _logged_in_client():
+    app.config["WTF_CSRF_ENABLED"] = False
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["logged_in"] = True
+    return client
+
+
+def _start_end_drive(client, iterations: int, fragment: bool) -> list[dict[str, Any]]:
+    """
+    A start and an end drive, each up to the next screen: the POST and its
+    redirects, or for drive_queue.js's fragment requests the POST alone.
+    """
+    start_samples, end_samples = [], []
+    headers = {"HX-Request": "true"} if fragment else {}
+    mode = "fragment" if fragment else "redirects"
+
+    with app.app_context():
+        last = drive_log_select_last_completed(vehicle_id=VEHICLE_ID)
+    km = last.end_km if last and last.end_km else 0
+
+    for _ in range(iterations):
+        km += 10
+        form = {"date": dt.date.today().isoformat(), "start_km": km, "job_site_id": 1}
+        start = time.perf_counter()
+        response = client.post("/start-drive", data=form, headers=headers, follow_redirects=True)
+        start_samples.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.status_code
+        end_drive_url = response.headers["HX-Push-Url"] if fragment else response.request.path
+        assert end_drive_url.startswith("/end-drive/"), end_drive_url
+
+        km += 25
+        start = time.perf_counter()
+        response = client.post(
+            end_drive_url, data={"end_km": km}, headers=headers, follow_redirects=True
+        )
+        end_samples.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.status_code
+
+    return [
+        summarize(f"POST /start-drive ({mode})", "http", start_samples),
+        summarize(f"POST /end-drive/<id> ({mode})", "http", end_samples),
+    ]
+
+
+def run(iterations: int) -> list[dict[str, Any]]:
+    client = _logged_in_client()
+
+    def get(url: str):
+        def request():
+            response = client.get(url)
+            assert response.status_code == 200, (url, response.status_code)
+
+        return request
+
+    # a browser revalidating a page it already has
+    def revalidate(url: str):
+        etag = client.get(url).headers["ETag"]
+
+        def request():
+            response = client.get(url, headers={"If-None-Match": etag})
+            assert response.status_code == 304, (url, response.status_code)
+
+        return request
+
+    with app.app_context():
+        first_page = select_completed_drive_logs_page(limit=50, vehicle_id=VEHICLE_ID)
+    deep_cursor = first_page.next_cursor or DriveLogCursor(
+        created_at=dt.datetime.now(dt.timezone.utc), id=0
+    )
+
+    results = [
+        measure("GET /start-drive", "http", get("/start-drive"), iterations),
+        measure("GET /drive-logs", "http", get("/drive-logs"), iterations),
+        measure(
+            "GET /drive-logs?after=<cursor>",
+            "http",
+            get(f"/drive-logs?after={deep_cursor.encode()}"),
+            iterations,
+        ),
+        measure("GET /job-sites", "http", get("/job-sites"), iterations),
+        measure("GET /job-sites/search?q=", "http", get("/job-sites/search?q=job+1"), iterations),
+        measure("GET /drive-logs (304)", "http", revalidate("/drive-logs"), iterations),
+        measure("GET /job-sites (304)", "http", revalidate("/job-sites"), iterations),
+    ]
+    results += _start_end_drive(client, iterations, fragment=False)
+    results += _start_end_drive(client, iterations, fragment=True)
+    return results
@@ -0,0 +1,83 @@
+"""
+Shared helpers for the benchmark scripts: timing, percentiles, JSON results.
+"""
+
+import datetime as dt
+import json
+import os
+import platform
+import subprocess
+import time
+from collections.abc import Callable
+from typing import Any
+
+
+def percentile(sorted_samples: list[float], pct: float) -> float:
+    """Nearest-rank percentile of already sorted samples."""
+    index = max(0, min(len(sorted_samples) - 1, round(pct / 100 * len(sorted_samples)) - 1))
+    return sorted_samples[index]
+
+
+def summarize(name: str, group: str, samples: list[float]) -> dict[str, Any]:
+    ordered = sorted(samples)
+    total = sum(samples)
+    return {
+        "name": name,
+        "group": group,
+        "iterations": len(samples),
+        "throughput_per_s": len(samples) / total if total else None,
+        "mean_ms": total / len(samples) * 1000,
+        "p50_ms": percentile(ordered, 50) * 1000,
+        "p95_ms": percentile(ordered, 95) * 1000,
+        "p99_ms": percentile(ordered, 99) * 1000,
+    }
+
+
+def measure(
+    name: str,
+    group: str,
+    fn: Callable[[], Any],
+    iterations: int,
+    warmup: int = 3,
+) -> dict[str, Any]:
+    for _ in range(warmup):
+        fn()
+
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(name, group, samples)
+
+
+def git_commit() -> str | None:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def write_results(path: str | None, meta: dict[str, Any], results: list[dict[str, Any]]):
+    document = {
+        "meta": {
+            "commit": git_commit(),
+            "created_at": dt.datetime.now(dt.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            **meta,
+        },
+        "results": results,
+    }
+    text = json.dumps(document, indent=2)
+    if path:
+        with open(path, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
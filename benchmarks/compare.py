@@ -0,0 +1,34 @@
+"""
+Compare two benchmark result files, e.g. from two commits.
+
+    uv run python benchmarks/compare.py before.json after.json
+"""
+
+import argparse
+import json
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--metric", default="p95_ms")
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = {result["name"]: result for result in json.load(f)["results"]}
+    with open(args.after) as f:
+        after = {result["name"]: result for result in json.load(f)["results"]}
+
+    print(f"{'benchmark':55} {'before':>10} {'after':>10} {'change':>8}")
+    for name, result in after.items():
+        if name not in before:
+            print(f"{name:55} {'-':>10} {result[args.metric]:10.2f} {'new':>8}")
+            continue
+        old, new = before[name][args.metric], result[args.metric]
+        change = (new - old) / old * 100 if old else 0.0
+        print(f"{name:55} {old:10.2f} {new:10.2f} {change:+7.1f}%")
+
+
+if __name__ == "__main__":
+    main()
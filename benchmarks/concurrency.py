@@ -0,0 +1,150 @@
+"""
+Concurrency benchmark: sync gunicorn against the ASGI entry point.
+
+Starts each server on a benchmark database seeded by benchmarks/run.py, then
+keeps N clients busy on the hot path GET pages (start drive, drive log list,
+job site list) for a fixed time, for each N in --concurrency. Reports
+latency percentiles, throughput and errors per server and concurrency as
+JSON, in the same format as run.py.
+
+    BENCH_DATABASE_URL=postgresql+psycopg://localhost/car_mileage_bench \\
+        uv run --extra async python benchmarks/concurrency.py --output concurrency.json
+
+The sync server defaults to one worker, the way railway.json starts it.
+"""
+
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Any
+
+from common import summarize, write_results
+
+PATHS = ["/start-drive", "/drive-logs", "/job-sites"]
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _session_cookie() -> str:
+    import car_mileage_log_flask  # noqa: F401
+
+    os.environ["DATABASE_URL"] = os.environ["BENCH_DATABASE_URL"]
+    os.environ["FLASK_SECRET_KEY"] = os.getenv("FLASK_SECRET_KEY") or "benchmark"
+    from car_mileage_log_flask.app import app
+
+    serializer = app.session_interface.get_signing_serializer(app)
+    assert serializer is not None
+    return f"session={serializer.dumps({'logged_in': True})}"
+
+
+def _wait_for_port(port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit(f"Server on port {port} did not start")
+
+
+def _client(port: int, cookie: str, deadline: float, samples: list[float], errors: list[int]):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    i = 0
+    while time.monotonic() < deadline:
+        path = PATHS[i % len(PATHS)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            conn.request("GET", path, headers={"Cookie": cookie})
+            response = conn.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            errors.append(0)
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+            continue
+        elapsed = time.perf_counter() - start
+        if response.status != 200:
+            errors.append(response.status)
+        samples.append(elapsed)
+    conn.close()
+
+
+def _load(name: str, port: int, cookie: str, concurrency: int, duration: float) -> dict[str, Any]:
+    samples: list[float] = []
+    errors: list[int] = []
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(target=_client, args=(port, cookie, deadline, samples, errors))
+        for _ in range(concurrency)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    result = summarize(f"{name} c={concurrency}", "concurrency", samples)
+    # clients run in parallel, so throughput is requests over wall time
+    result["throughput_per_s"] = len(samples) / elapsed
+    result["concurrency"] = concurrency
+    result["errors"] = len(errors)
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare sync gunicorn with the ASGI entry point.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50, 100])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per level")
+    parser.add_argument("--gunicorn-workers", type=int, default=1)
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    if not os.getenv("BENCH_DATABASE_URL"):
+        sys.exit("Set BENCH_DATABASE_URL to a database seeded by benchmarks/run.py")
+
+    cookie = _session_cookie()
+    servers = {
+        "gunicorn (sync)": (
+            8401,
+            ["gunicorn", "car_mileage_log_flask.app:app", "-b", "127.0.0.1:8401",
+             "-w", str(args.gunicorn_workers), "--log-level", "warning"],
+        ),
+        "uvicorn (asgi)": (
+            8402,
+            ["uvicorn", "car_mileage_log_flask.asgi:asgi_app", "--port", "8402",
+             "--log-level", "warning"],
+        ),
+    }
+
+    results = []
+    for name, (port, command) in servers.items():
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(HERE, "serve.py"), *command],
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            _wait_for_port(port)
+            _load(name, port, cookie, 1, 1.0)  # warm up
+            for concurrency in args.concurrency:
+                results.append(_load(name, port, cookie, concurrency, args.duration))
+        finally:
+            server.terminate()
+            server.wait()
+
+    meta = {
+        "duration_s": args.duration,
+        "gunicorn_workers": args.gunicorn_workers,
+        "paths": PATHS,
+    }
+    write_results(args.output, meta, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Partitions read by the hot path statements of the yearly partitioned drive logs.
+
+Resets and seeds the benchmark database (30 minutes between drives, so 100k
+drives span about six years), starts a drive, then runs each statement under
+EXPLAIN ANALYZE and counts the partitions whose scans actually executed:
+
+- the start drive screen, the drive in progress and the end drive, through
+  the odometer state's dates: the current year's partition only
+- the first drive log page, of the fleet and of one vehicle: the newest
+  partitions until the page is full, next year's is probed empty
+- the odometer state refresh after every write: the newest partition holding
+  a drive of the vehicle
+- the edit screen, the edit and the delete of a drive by (id, date), as the
+  drive log list links them: the drive's own partition, and its neighbours'
+  when the drive before or after it is in another year
+- a drive log from the middle of the history, by id: every partition up to
+  its own, for comparison, and by (id, date): its own partition only
+
+    BENCH_DATABASE_URL=postgresql+psycopg://localhost:5432/car_mileage_bench \\
+        uv run python benchmarks/partition_pruning.py
+
+Prints the partitions read and the p50 latency of each statement as JSON,
+exits non-zero when a hot statement read a partition of a past year.
+"""
+
+import argparse
+import datetime as dt
+import json
+import os
+import sys
+
+
+def _partitions_read(plan: dict, prefix: str) -> set[str]:
+    # scans that ran; pruned ones are not in the plan or never executed
+    read = set()
+    if plan.get("Relation Name", "").startswith(prefix) and plan.get("Actual Loops", 0) > 0:
+        read.add(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        read |= _partitions_read(child, prefix)
+    return read
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"))
+    parser.add_argument("--drive-logs", type=int, default=100_000)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    if not args.database_url:
+        sys.exit("Set BENCH_DATABASE_URL or pass --database-url")
+
+    import car_mileage_log_flask  # noqa: F401  loads .env first, the URL below wins
+
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["DB_ECHO"] = "false"
+
+    from common import measure
+    from schema import reset_schema
+    from seed import seed_fleet
+    from sqlalchemy import text
+
+    from car_mileage_log_flask.db.connection import get_engine
+    from car_mileage_log_flask.db.partitions import PARTITION_PREFIX, select_partition_years
+    from car_mileage_log_flask.db.reads import (
+        DRIVE_LOG_BY_ID_SQL,
+        DRIVE_LOG_EDIT_SQL,
+        EARLIEST_IN_PROGRESS_SQL,
+        START_DRIVE_CONTEXT_SQL,
+        completed_drive_logs_page_stmt,
+        drive_log_select_for_edit,
+        drive_log_select_last_completed,
+    )
+    from car_mileage_log_flask.db.writes import (
+        DELETE_DRIVE_LOG_SQL,
+        EDIT_DRIVE_LOG_SQL,
+        END_DRIVE_SQL,
+        REFRESH_ODOMETER_STATE_SQL,
+        EndDriveInput,
+        StartDriveInput,
+        end_drive_params,
+        start_drive,
+    )
+
+    engine = get_engine()
+    reset_schema(engine)
+    seed_fleet(engine, vehicles=5, job_sites=10, drive_logs=args.drive_logs)
+
+    vehicle_id = 1
+    km = drive_log_select_last_completed(vehicle_id=vehicle_id).end_km
+    drive_log = start_drive(
+        StartDriveInput(date=dt.date.today(), start_km=km + 5, job_site_id=1, vehicle_id=vehicle_id)
+    )
+
+    def driver_sql(stmt):
+        compiled = stmt.compile(engine)
+        return str(compiled), compiled.params
+
+    end_params = end_drive_params(EndDriveInput(id=drive_log.id, end_km=km + 42))
+    by_id_and_date = {"id": drive_log.id, "drive_log_date": drive_log.date}
+    edit = drive_log_select_for_edit(id=drive_log.id, date=drive_log.date)
+    edit_params = {
+        **by_id_and_date,
+        "updated_at": edit.updated_at,
+        "date": drive_log.date,
+        "start_km": drive_log.start_km,
+        "end_km": None,
+        "job_site_id": drive_log.job_site_id,
+        "now": dt.datetime.now(dt.timezone.utc),
+    }
+    middle_id = args.drive_logs // 2
+    with engine.connect() as conn:
+        middle_date = conn.execute(
+            text("SELECT date FROM drive_log_drivelog WHERE id = :id"), {"id": middle_id}
+        ).scalar_one()
+    # (name, hot, SQL with :name parameters or the driver's own, parameters)
+    statements = [
+        ("start drive context", True, text(START_DRIVE_CONTEXT_SQL),
+         {"vehicle_id": vehicle_id, "job_sites_limit": 10}),
+        ("drive in progress", True, text(EARLIEST_IN_PROGRESS_SQL), {"vehicle_id": vehicle_id}),
+        ("end drive screen, by id", True, text(DRIVE_LOG_BY_ID_SQL),
+         {"id": drive_log.id, "drive_log_date": None}),
+        ("end drive", True, text(END_DRIVE_SQL), end_params),
+        ("odometer state refresh", True, text(REFRESH_ODOMETER_STATE_SQL),
+         {"vehicle_ids": [vehicle_id]}),
+        ("edit screen, by id and date", True, text(DRIVE_LOG_EDIT_SQL), by_id_and_date),
+        ("edit, by id and date", True, text(EDIT_DRIVE_LOG_SQL), edit_params),
+        ("delete, by id and date", True, text(DELETE_DRIVE_LOG_SQL), by_id_and_date),
+        ("first drive log page", True, *driver_sql(completed_drive_logs_page_stmt(50, None, None))),
+        ("first drive log page, one vehicle", True,
+         *driver_sql(completed_drive_logs_page_stmt(50, None, vehicle_id))),
+        ("drive log from the middle of the history, by id", False, text(DRIVE_LOG_BY_ID_SQL),
+         {"id": middle_id, "drive_log_date": None}),
+        ("drive log from the middle of the history, by id and date", False,
+         text(DRIVE_LOG_BY_ID_SQL), {"id": middle_id, "drive_log_date": middle_date}),
+    ]
+
+    current = f"{PARTITION_PREFIX}{dt.date.today().year}"
+    results = []
+    with engine.connect() as conn:
+        for name, hot, sql, params in statements:
+
+            def execute(explain: bool = False):
+                prefix = "EXPLAIN (ANALYZE, FORMAT JSON) " if explain else ""
+                if isinstance(sql, str):
+                    result = conn.exec_driver_sql(prefix + sql, params)
+                else:
+                    result = conn.execute(text(prefix + sql.text), params)
+                # the odometer state refresh returns no rows
+                rows = result.all() if result.returns_rows else []
+                # the writes, every run is rolled back
+                conn.rollback()
+                return rows
+
+            plan = execute(explain=True)[0][0][0]["Plan"]
+            read = _partitions_read(plan, PARTITION_PREFIX)
+
+            result = measure(name, "partitions", execute, args.iterations)
+            result["partitions_read"] = sorted(read)
+            # partition names sort by year
+            result["ok"] = not hot or all(partition >= current for partition in read)
+            results.append(result)
+
+    output = {
+        "benchmark": "partition_pruning",
+        "drive_logs": args.drive_logs,
+        "partitions": [f"{PARTITION_PREFIX}{year}" for year in select_partition_years()],
+        "results": results,
+    }
+    print(json.dumps(output, indent=2))
+    if not all(result["ok"] for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
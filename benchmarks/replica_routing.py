@@ -0,0 +1,157 @@
+"""
+Check read replica routing and read-your-writes against a real replica or a stub.
+
+Resets and seeds the benchmark database on the primary, then through the
+Flask test client:
+
+1. lists drive logs, which must read from the replica
+2. starts and ends a drive, then lists drive logs while the replica lags:
+   the list must read from the primary and show the new drive
+3. once the replica caught up, lists drive logs from the replica again
+
+With a streaming replica (pg_basebackup -R of the primary), lag is made by
+pausing its WAL replay, which needs a superuser. A stub, e.g. the primary's
+own URL as the replica's, has no replay LSN: reads stay on the primary for
+DB_REPLICA_MAX_LAG seconds after the write instead.
+
+    BENCH_DATABASE_URL=postgresql+psycopg://localhost:5432/car_mileage_bench \\
+    BENCH_REPLICA_URL=postgresql+psycopg://localhost:5433/car_mileage_bench \\
+        uv run python benchmarks/replica_routing.py
+
+Prints the database each step read from and its p50 latency as JSON, exits
+non-zero when a step read from the wrong one.
+"""
+
+import argparse
+import datetime as dt
+import json
+import os
+import sys
+import time
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"))
+    parser.add_argument("--replica-url", default=os.getenv("BENCH_REPLICA_URL"))
+    parser.add_argument("--drive-logs", type=int, default=10_000)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--max-lag", type=float, default=2.0, help="DB_REPLICA_MAX_LAG for a stub")
+    args = parser.parse_args()
+    if not args.database_url or not args.replica_url:
+        sys.exit("Set BENCH_DATABASE_URL and BENCH_REPLICA_URL, or pass --database-url and --replica-url")
+
+    import car_mileage_log_flask  # noqa: F401  loads .env first, the settings below win
+
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["DATABASE_REPLICA_URL"] = args.replica_url
+    os.environ["DB_REPLICA_MAX_LAG"] = str(args.max_lag)
+    os.environ["FLASK_SECRET_KEY"] = os.getenv("FLASK_SECRET_KEY") or "benchmark"
+    os.environ["DB_ECHO"] = "false"
+
+    from common import summarize
+    from schema import reset_schema
+    from seed import seed_fleet
+    from sqlalchemy import event, text
+
+    from car_mileage_log_flask.app import app
+    from car_mileage_log_flask.db.connection import (
+        WRITE_SESSION_KEY,
+        get_engine,
+        get_replica_engine,
+    )
+    from car_mileage_log_flask.db.reads import drive_log_select_last_completed
+
+    primary, replica = get_engine(), get_replica_engine()
+    with replica.connect() as conn:
+        streaming = conn.execute(text("SELECT pg_is_in_recovery()")).scalar()
+
+    def set_replay(paused: bool):
+        if streaming:
+            with replica.connect() as conn:
+                conn.execute(text(f"SELECT pg_wal_replay_{'pause' if paused else 'resume'}()"))
+
+    def wait_for_replica():
+        with primary.connect() as conn:
+            lsn = conn.execute(text("SELECT pg_current_wal_lsn()::text")).scalar()
+        with replica.connect() as conn:
+            while streaming and not conn.execute(
+                text("SELECT pg_last_wal_replay_lsn() >= CAST(:lsn AS pg_lsn)"), {"lsn": lsn}
+            ).scalar():
+                time.sleep(0.05)
+
+    set_replay(paused=False)
+    reset_schema(primary)
+    seed_fleet(primary, vehicles=5, job_sites=10, drive_logs=args.drive_logs)
+    wait_for_replica()
+
+    queries = {"primary": 0, "replica": 0}
+
+    def count(name):
+        def before_cursor_execute(conn, cursor, statement, *args):
+            # the replay check runs on the replica whichever way the reads go
+            if "pg_last_wal_replay_lsn" not in statement:
+                queries[name] += 1
+
+        return before_cursor_execute
+
+    event.listen(primary, "before_cursor_execute", count("primary"))
+    event.listen(replica, "before_cursor_execute", count("replica"))
+
+    app.config["WTF_CSRF_ENABLED"] = False
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["logged_in"] = True
+        session["vehicle_id"] = 1
+
+    def list_drive_logs(expected: str, iterations: int) -> dict:
+        samples, read_from = [], set()
+        for _ in range(iterations):
+            queries.update(primary=0, replica=0)
+            start = time.perf_counter()
+            response = client.get("/drive-logs")
+            samples.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.status_code
+            # the session's vehicle, the navigation and the like read from the primary
+            read_from.add("replica" if queries["replica"] else "primary")
+        result = summarize(f"GET /drive-logs, expected on the {expected}", "http", samples)
+        result["read_from"] = sorted(read_from)
+        result["ok"] = read_from == {expected}
+        return result, response
+
+    results = []
+    result, _ = list_drive_logs("replica", args.iterations)
+    results.append(result)
+
+    with app.app_context():
+        km = drive_log_select_last_completed(vehicle_id=1).end_km
+    set_replay(paused=True)
+    response = client.post(
+        "/start-drive",
+        data={"date": dt.date.today().isoformat(), "start_km": km + 5, "job_site_id": 1},
+    )
+    client.post(response.location, data={"end_km": km + 42})
+    with client.session_transaction() as session:
+        assert WRITE_SESSION_KEY in session, "the write was not remembered"
+
+    result, response = list_drive_logs("primary", 1 if not streaming else args.iterations)
+    result["sees_own_write"] = str(km + 42).encode() in response.data
+    result["ok"] = result["ok"] and result["sees_own_write"]
+    results.append(result)
+
+    set_replay(paused=False)
+    wait_for_replica()
+    if not streaming:
+        time.sleep(args.max_lag)
+    result, _ = list_drive_logs("replica", args.iterations)
+    with client.session_transaction() as session:
+        result["ok"] = result["ok"] and WRITE_SESSION_KEY not in session
+    results.append(result)
+
+    print(json.dumps({"benchmark": "replica_routing", "streaming": streaming, "results": results}, indent=2))
+    if not all(result["ok"] for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Memory and time of mapping completed drive log rows to read models.
+
+Before: `.mappings()` and a regular dataclass filled by column name, the way
+db/reads.py built read models until db/rows.py. After: the slotted
+DriveLogCompleted built by position through db/rows.py.
+
+Both map the same rows, fetched once, so the mapping is measured on its own;
+the full read (query, fetch and mapping) is measured too. Memory is what the
+read models hold on top of the fetched rows, measured with tracemalloc. Every
+number is per 100k rows.
+
+    BENCH_DATABASE_URL=postgresql+psycopg://localhost/car_mileage_bench \\
+        uv run python benchmarks/row_mapping.py --rows 100000
+"""
+
+import argparse
+import datetime as dt
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+import car_mileage_log_flask  # noqa: F401  loads .env first, the URL below wins
+
+
+@dataclass
+class DriveLogCompletedBefore:
+    id: int
+    date: dt.date
+    start_km: int
+    end_km: int
+    status: str
+    job_site_id: int
+    job_site_name: str
+    job_site_address: str
+    vehicle_id: int
+
+
+def _before_from_row(row) -> DriveLogCompletedBefore:
+    return DriveLogCompletedBefore(
+        id=row["id"],
+        date=row["date"],
+        start_km=row["start_km"],
+        end_km=row["end_km"],
+        status=row["status"],
+        job_site_id=row["job_site_id"],
+        job_site_name=row["job_site_name"],
+        job_site_address=row["job_site_address"],
+        vehicle_id=row["vehicle_id"],
+    )
+
+
+def _seconds(fn: Callable[[], Any], runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def _retained_bytes(fn: Callable[[], Any]) -> int:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = fn()  # noqa: F841  held until measured
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"))
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    if not args.database_url:
+        sys.exit("Set BENCH_DATABASE_URL or pass --database-url")
+
+    os.environ["DATABASE_URL"] = args.database_url
+    from car_mileage_log_flask.db.connection import get_engine
+    from car_mileage_log_flask.db.reads import DriveLogCompleted, completed_drive_logs_stmt
+    from car_mileage_log_flask.db.rows import model_rows
+
+    stmt = completed_drive_logs_stmt().limit(args.rows)
+
+    def read_before():
+        with get_engine().connect() as conn:
+            result = conn.execute(stmt)
+            return [_before_from_row(row) for row in result.mappings()]
+
+    def read_after():
+        with get_engine().connect() as conn:
+            return model_rows(conn.execute(stmt), DriveLogCompleted)
+
+    with get_engine().connect() as conn:
+        rows = conn.execute(stmt).all()
+    if not rows:
+        sys.exit("No completed drive logs, seed the database with benchmarks/run.py")
+
+    def map_before():
+        return [_before_from_row(row._mapping) for row in rows]
+
+    def map_after():
+        return [DriveLogCompleted(*row) for row in rows]
+
+    per_100k = 100_000 / len(rows)
+    results = {}
+    for name, map_rows, read in (
+        ("before", map_before, read_before),
+        ("after", map_after, read_after),
+    ):
+        read()  # warm up the pool and the statement cache
+        results[name] = {
+            "map_ms": _seconds(map_rows, args.runs) * per_100k * 1000,
+            "read_ms": _seconds(read, args.runs) * per_100k * 1000,
+            "retained_mb": _retained_bytes(map_rows) * per_100k / 2**20,
+        }
+
+    result = {
+        "benchmark": "row_mapping",
+        "rows": len(rows),
+        "runs": args.runs,
+        "per_rows": 100_000,
+        **results,
+    }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
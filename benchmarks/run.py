@@ -0,0 +1,79 @@
+"""
+Benchmark suite for the drive logging hot paths.
+
+Resets a benchmark Postgres database from the migrations, seeds a synthetic
+fleet, then measures the HTTP hot paths through the Flask test client and
+every function in db/reads.py and db/writes.py. Results are JSON, so runs on
+different commits can be compared with benchmarks/compare.py.
+
+    BENCH_DATABASE_URL=postgresql+psycopg://localhost/car_mileage_bench \\
+        uv run python benchmarks/run.py --drive-logs 100000 --output before.json
+
+Postgres only: the schema relies on a plpgsql trigger, a materialized view and
+JSON functions that SQLite does not have. The database name must contain
+"bench", since everything in it is dropped.
+"""
+
+import argparse
+import os
+import sys
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the drive logging hot paths.")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"))
+    parser.add_argument("--vehicles", type=int, default=20)
+    parser.add_argument("--job-sites", type=int, default=50)
+    parser.add_argument("--drive-logs", type=int, default=10_000)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--slow-iterations", type=int, default=5)
+    parser.add_argument("--skip-http", action="store_true")
+    parser.add_argument("--skip-db", action="store_true")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    if not args.database_url:
+        sys.exit("Set BENCH_DATABASE_URL or pass --database-url")
+
+    # importing the package loads .env (override=True); set the benchmark
+    # settings after that, and before the engine is created on first use
+    import car_mileage_log_flask  # noqa: F401
+
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["FLASK_SECRET_KEY"] = os.getenv("FLASK_SECRET_KEY") or "benchmark"
+    os.environ["DB_ECHO"] = "false"
+    os.environ["JOB_SITE_CACHE_BACKEND"] = "local"
+
+    from common import write_results
+    from schema import reset_schema
+    from seed import seed_fleet
+
+    from car_mileage_log_flask.db.connection import get_engine
+
+    engine = get_engine()
+    reset_schema(engine)
+    seed_fleet(
+        engine, vehicles=args.vehicles, job_sites=args.job_sites, drive_logs=args.drive_logs
+    )
+
+    results = []
+    if not args.skip_http:
+        import bench_http
+
+        results += bench_http.run(args.iterations)
+    if not args.skip_db:
+        import bench_db
+
+        results += bench_db.run(args.iterations, args.slow_iterations)
+
+    meta = {
+        "vehicles": args.vehicles,
+        "job_sites": args.job_sites,
+        "drive_logs": args.drive_logs,
+        "iterations": args.iterations,
+    }
+    write_results(args.output, meta, results)
+
+
+if __name__ == "__main__":
+    main()
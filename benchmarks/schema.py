@@ -0,0 +1,50 @@
+"""
+Create the schema of a benchmark database from the goose migrations.
+"""
+
+import glob
+import os
+
+from sqlalchemy import Engine, text
+
+MIGRATIONS_DIR = os.path.join(
+    os.path.dirname(__file__), "..", "src", "car_mileage_log_flask", "db", "migrations"
+)
+
+
+def _up_statements(migration: str) -> list[str]:
+    up = migration.split("-- +goose Down")[0]
+    statements, buffer, in_block = [], [], False
+    for line in up.splitlines():
+        if "+goose StatementBegin" in line:
+            in_block = True
+            continue
+        if "+goose StatementEnd" in line:
+            in_block = False
+            statements.append("\n".join(buffer))
+            buffer = []
+            continue
+        if line.strip().startswith("--"):
+            continue
+        buffer.append(line)
+        if not in_block and line.rstrip().endswith(";"):
+            statements.append("\n".join(buffer))
+            buffer = []
+    return [statement for statement in statements if statement.strip()]
+
+
+def reset_schema(engine: Engine):
+    """Drop everything in the public schema and apply all migrations."""
+    database = engine.url.database or ""
+    if "bench" not in database:
+        raise SystemExit(f"Refusing to reset '{database}': benchmark database names must contain 'bench'")
+
+    # AUTOCOMMIT: some migrations create indexes CONCURRENTLY
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("DROP SCHEMA public CASCADE"))
+        conn.execute(text("CREATE SCHEMA public"))
+        for path in sorted(glob.glob(os.path.join(MIGRATIONS_DIR, "*.sql"))):
+            with open(path) as f:
+                for statement in _up_statements(f.read()):
+                    # no parameters, so "%" in plpgsql RAISE is not a placeholder
+                    conn.connection.driver_connection.execute(statement)
@@ -0,0 +1,102 @@
+"""
+Seed a synthetic fleet: vehicles, job sites and a continuous history of
+completed drives per vehicle.
+"""
+
+from sqlalchemy import Engine, text
+
+from car_mileage_log_flask.db.writes import REFRESH_ODOMETER_STATE_SQL
+
+
+def seed_fleet(engine: Engine, vehicles: int, job_sites: int, drive_logs: int):
+    """
+    Insert `vehicles` vehicles, `job_sites` job sites and `drive_logs`
+    completed drives, spread evenly over the vehicles, and their odometer state.
+
+    Drives are 30 minutes apart, newest now, and each vehicle's odometer
+    readings are continuous, so the data satisfies logic_rules.md. The start km and
+    rollup triggers are off while seeding and turned back on afterwards, the
+    rollup is rebuilt in one go. The yearly partitions the drives span are
+    created first.
+    """
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                """
+                INSERT INTO drive_log_vehicle (created_at, updated_at, name, plate)
+                SELECT now(), now(), 'Vehicle ' || g, 'BENCH' || g
+                FROM generate_series(1, :vehicles) g
+                """
+            ),
+            {"vehicles": vehicles},
+        )
+        conn.execute(
+            text(
+                """
+                INSERT INTO drive_log_jobsite (created_at, updated_at, name, address)
+                SELECT now(), now(), 'Job site ' || g, g || ' Benchmark Street'
+                FROM generate_series(1, :job_sites) g
+                """
+            ),
+            {"job_sites": job_sites},
+        )
+
+        # a partition for every year the drives span, see migration 00009
+        conn.execute(
+            text(
+                """
+                SELECT drive_log_drivelog_create_partition(year::integer)
+                FROM generate_series(
+                    extract(year FROM now() - make_interval(mins => :drive_logs * 30)),
+                    extract(year FROM now())
+                ) AS year
+                """
+            ),
+            {"drive_logs": drive_logs},
+        )
+        conn.execute(text("ALTER TABLE drive_log_drivelog DISABLE TRIGGER drive_log_drivelog_check_start_km"))
+        # one rollup upsert per row is slow in bulk, the rollup is rebuilt below
+        conn.execute(text("ALTER TABLE drive_log_drivelog DISABLE TRIGGER drive_log_drivelog_roll_up"))
+        conn.execute(
+            text(
+                """
+                INSERT INTO drive_log_drivelog
+                    (created_at, updated_at, date, start_km, end_km, status,
+                     job_site_id, vehicle_id)
+                SELECT
+                    now() - make_interval(mins => (:drive_logs - g) * 30),
+                    now() - make_interval(mins => (:drive_logs - g) * 30),
+                    (now() - make_interval(mins => (:drive_logs - g) * 30))::date,
+                    (g / :vehicles) * 40,
+                    (g / :vehicles) * 40 + 5 + g % 30,
+                    'completed',
+                    1 + (g * 7919) % :job_sites,
+                    1 + g % :vehicles
+                FROM generate_series(1, :drive_logs) g
+                """
+            ),
+            {"drive_logs": drive_logs, "job_sites": job_sites, "vehicles": vehicles},
+        )
+        # the job site foreign key is deferred; check it now so the table can be altered
+        conn.execute(text("SET CONSTRAINTS ALL IMMEDIATE"))
+        conn.execute(text("ALTER TABLE drive_log_drivelog ENABLE TRIGGER drive_log_drivelog_check_start_km"))
+        conn.execute(text("ALTER TABLE drive_log_drivelog ENABLE TRIGGER drive_log_drivelog_roll_up"))
+        conn.execute(
+            text(REFRESH_ODOMETER_STATE_SQL),
+            {"vehicle_ids": list(range(1, vehicles + 1))},
+        )
+        conn.execute(text("TRUNCATE drive_log_daily_rollup"))
+        conn.execute(
+            text(
+                """
+                INSERT INTO drive_log_daily_rollup (vehicle_id, date, job_site_id, trips, km)
+                SELECT vehicle_id, date, job_site_id, count(*), sum(end_km - start_km)
+                FROM drive_log_drivelog
+                WHERE status = 'completed'
+                GROUP BY vehicle_id, date, job_site_id
+                """
+            )
+        )
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("ANALYZE"))
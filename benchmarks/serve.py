@@ -0,0 +1,38 @@
+"""
+Start gunicorn or uvicorn against the benchmark database.
+
+    python benchmarks/serve.py gunicorn car_mileage_log_flask.app:app -b 127.0.0.1:8001
+    python benchmarks/serve.py uvicorn car_mileage_log_flask.asgi:asgi_app --port 8002
+
+Runs the server in this process, after importing the package, so that
+BENCH_DATABASE_URL wins over a DATABASE_URL from .env.
+"""
+
+import os
+import sys
+
+import car_mileage_log_flask  # noqa: F401
+
+os.environ["DATABASE_URL"] = os.environ["BENCH_DATABASE_URL"]
+os.environ["FLASK_SECRET_KEY"] = os.getenv("FLASK_SECRET_KEY") or "benchmark"
+os.environ["DB_ECHO"] = "false"
+os.environ["JOB_SITE_CACHE_BACKEND"] = "local"
+
+
+def main() -> None:
+    server, args = sys.argv[1], sys.argv[2:]
+    if server == "gunicorn":
+        from gunicorn.app.wsgiapp import run
+
+        sys.argv = ["gunicorn", *args]
+        run()
+    elif server == "uvicorn":
+        import uvicorn
+
+        uvicorn.main.main(args=args)
+    else:
+        sys.exit(f"Unknown server '{server}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Cold import time of car_mileage_log_flask.app.
+
+Every run imports the app in a fresh interpreter, the same work a gunicorn
+worker does before it can serve its first request. DATABASE_URL points at an
+unreachable server unless it is already set, so the numbers also prove that
+importing the app does not touch the database.
+
+    uv run python benchmarks/startup.py --runs 20
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SNIPPET = (
+    "import time; "
+    "start = time.perf_counter(); "
+    "import car_mileage_log_flask.app; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def cold_import_seconds(env: dict[str, str]) -> float:
+    result = subprocess.run(
+        [sys.executable, "-c", SNIPPET],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env["FLASK_SECRET_KEY"] = env.get("FLASK_SECRET_KEY") or "benchmark"
+    env["DATABASE_URL"] = (
+        env.get("DATABASE_URL") or "postgresql+psycopg://bench@127.0.0.1:9/bench"
+    )
+
+    samples = [cold_import_seconds(env) for _ in range(args.runs)]
+
+    result = {
+        "benchmark": "cold_import_app",
+        "runs": args.runs,
+        "min_ms": min(samples) * 1000,
+        "median_ms": statistics.median(samples) * 1000,
+        "max_ms": max(samples) * 1000,
+    }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+from dotenv import load_dotenv
+
+# settings are read from the environment at import time, load .env first
+load_dotenv(override=True)
@@ -0,0 +1,287 @@
+"""
+Trip distance analytics, computed with NumPy over columns of drive logs.
+
+One query returns each column of the completed drives as a single bytea of
+big-endian integers, in vehicle and odometer order, so loading is one
+`frombuffer` per column instead of a Python object per drive. The rest is
+vectorized:
+
+- distance per trip, end km - start km
+- km per calendar day, with 7 and 30 day rolling averages
+- odometer jumps, the km between a drive's start and the same vehicle's
+  previous end; implausible when negative or beyond the upper fence of all jumps
+- each job site's distribution of trip distances
+
+NumPy is optional (the `analytics` extra), importing this module raises
+ImportError without it.
+"""
+
+import datetime as dt
+from dataclasses import dataclass
+
+import numpy as np
+from sqlalchemy import func, literal, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+
+from car_mileage_log_flask.db.connection import get_read_connection
+from car_mileage_log_flask.db.reads import select_all_job_sites
+from car_mileage_log_flask.db.tables import drive_logs_table
+from car_mileage_log_flask.domain import DriveLogStatus
+
+EPOCH = dt.date(1970, 1, 1)
+
+
+@dataclass
+class DriveLogColumns:
+    """Completed drives as parallel arrays, ordered by vehicle then time."""
+
+    id: np.ndarray
+    vehicle_id: np.ndarray
+    job_site_id: np.ndarray
+    # days since EPOCH
+    day: np.ndarray
+    start_km: np.ndarray
+    end_km: np.ndarray
+
+
+def _packed(column, send):
+    # int4send/int8send write big-endian bytes; one bytea per column
+    d = drive_logs_table
+    # the drive order of logic_rules.md
+    order = aggregate_order_by(literal(b""), d.c.vehicle_id, d.c.date, d.c.created_at, d.c.id)
+    return func.string_agg(send(column), order)
+
+
+def select_drive_log_columns(
+    vehicle_id: int | None = None, start: dt.date | None = None, end: dt.date | None = None
+) -> DriveLogColumns:
+    d = drive_logs_table
+    stmt = select(
+        _packed(d.c.id, func.int8send).label("id"),
+        _packed(d.c.vehicle_id, func.int8send).label("vehicle_id"),
+        _packed(d.c.job_site_id, func.int8send).label("job_site_id"),
+        _packed(d.c.date - EPOCH, func.int4send).label("day"),
+        _packed(d.c.start_km, func.int4send).label("start_km"),
+        _packed(d.c.end_km, func.int4send).label("end_km"),
+    ).where(d.c.status == DriveLogStatus.COMPLETED.value)
+    if vehicle_id is not None:
+        stmt = stmt.where(d.c.vehicle_id == vehicle_id)
+    if start is not None:
+        stmt = stmt.where(d.c.date >= start)
+    if end is not None:
+        stmt = stmt.where(d.c.date <= end)
+
+    with get_read_connection() as conn:
+        row = conn.execute(stmt).mappings().one()
+
+    def column(name: str, size: int) -> np.ndarray:
+        # no rows aggregate to NULL
+        return np.frombuffer(row[name] or b"", dtype=f">i{size}").astype(np.int64)
+
+    return DriveLogColumns(
+        id=column("id", 8),
+        vehicle_id=column("vehicle_id", 8),
+        job_site_id=column("job_site_id", 8),
+        day=column("day", 4),
+        start_km=column("start_km", 4),
+        end_km=column("end_km", 4),
+    )
+
+
+# --- COMPUTATION --- #
+
+
+@dataclass
+class DailyKm:
+    first_date: dt.date
+    last_date: dt.date
+    # one value per calendar day from first_date, days without drives included
+    km: np.ndarray
+    rolling_7: np.ndarray
+    rolling_30: np.ndarray
+
+
+@dataclass
+class DistanceHistogram:
+    edges: list[float]
+    counts: list[int]
+
+
+@dataclass
+class OdometerJump:
+    drive_log_id: int
+    vehicle_id: int
+    date: dt.date
+    previous_end_km: int
+    start_km: int
+    jump_km: int
+
+
+@dataclass
+class JobSiteDistribution:
+    job_site_id: int
+    job_site_name: str
+    job_site_address: str
+    trips: int
+    km: int
+    mean_km: float
+    p10_km: float
+    median_km: float
+    p90_km: float
+    max_km: int
+
+
+@dataclass
+class DriveAnalytics:
+    trips: int
+    km: int
+    mean_km: float
+    median_km: float
+    daily: DailyKm | None
+    histogram: DistanceHistogram
+    jump_fence_km: float
+    # every implausible jump, the largest first
+    jumps: list[OdometerJump]
+    job_sites: list[JobSiteDistribution]
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Mean of each value and the `window - 1` before it; the first ones average what there is."""
+    sums = np.concatenate(([0.0], np.cumsum(values, dtype=np.float64)))
+    ends = np.arange(1, len(values) + 1)
+    widths = np.minimum(ends, window)
+    return (sums[ends] - sums[ends - widths]) / widths
+
+
+def daily_km(columns: DriveLogColumns, distance: np.ndarray) -> DailyKm | None:
+    if not len(distance):
+        return None
+    first = columns.day.min()
+    km = np.bincount(columns.day - first, weights=distance)
+    return DailyKm(
+        first_date=EPOCH + dt.timedelta(days=int(first)),
+        last_date=EPOCH + dt.timedelta(days=int(columns.day.max())),
+        km=km,
+        rolling_7=rolling_mean(km, 7),
+        rolling_30=rolling_mean(km, 30),
+    )
+
+
+def odometer_jumps(columns: DriveLogColumns) -> tuple[np.ndarray, np.ndarray]:
+    """Index of every drive that follows one of the same vehicle, and its jump in km."""
+    follows = np.flatnonzero(columns.vehicle_id[1:] == columns.vehicle_id[:-1]) + 1
+    jumps = columns.start_km[follows] - columns.end_km[follows - 1]
+    return follows, jumps
+
+
+def upper_fence(values: np.ndarray, k: float = 3.0) -> float:
+    """Tukey's outer fence, Q3 + k * IQR; 0 for no values."""
+    if not len(values):
+        return 0.0
+    q1, q3 = np.percentile(values, [25, 75])
+    return float(q3 + k * (q3 - q1))
+
+
+def _group_quantile(
+    values: np.ndarray, starts: np.ndarray, counts: np.ndarray, q: float
+) -> np.ndarray:
+    # linear interpolation like np.percentile, within each sorted group
+    position = q * (counts - 1)
+    below = np.floor(position).astype(np.int64)
+    above = np.minimum(below + 1, counts - 1)
+    fraction = position - below
+    return values[starts + below] * (1 - fraction) + values[starts + above] * fraction
+
+
+def job_site_distributions(
+    job_site_id: np.ndarray, distance: np.ndarray
+) -> list[JobSiteDistribution]:
+    """Trip distance distribution per job site, most trips first."""
+    if not len(distance):
+        return []
+    order = np.lexsort((distance, job_site_id))
+    sites = job_site_id[order]
+    values = distance[order]
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(sites)) + 1))
+    counts = np.diff(np.concatenate((starts, [len(values)])))
+    totals = np.add.reduceat(values, starts)
+
+    p10 = _group_quantile(values, starts, counts, 0.1)
+    median = _group_quantile(values, starts, counts, 0.5)
+    p90 = _group_quantile(values, starts, counts, 0.9)
+    maximum = values[starts + counts - 1]
+
+    job_sites = {job_site.id: job_site for job_site in select_all_job_sites()}
+    distributions = []
+    for i in np.argsort(-counts, kind="stable"):
+        job_site = job_sites.get(int(sites[starts[i]]))
+        distributions.append(
+            JobSiteDistribution(
+                job_site_id=int(sites[starts[i]]),
+                job_site_name=job_site.name if job_site else "",
+                job_site_address=job_site.address if job_site else "",
+                trips=int(counts[i]),
+                km=int(totals[i]),
+                mean_km=float(totals[i] / counts[i]),
+                p10_km=float(p10[i]),
+                median_km=float(median[i]),
+                p90_km=float(p90[i]),
+                max_km=int(maximum[i]),
+            )
+        )
+    return distributions
+
+
+def compute_analytics(columns: DriveLogColumns, min_jump_km: int = 100) -> DriveAnalytics:
+    """
+    Everything on the analytics page. A jump is implausible when negative, or
+    above both `min_jump_km` and the upper fence of all jumps.
+    """
+    distance = columns.end_km - columns.start_km
+
+    follows, jumps = odometer_jumps(columns)
+    fence = max(upper_fence(jumps), float(min_jump_km))
+    implausible = np.flatnonzero((jumps < 0) | (jumps > fence))
+    implausible = implausible[np.argsort(-np.abs(jumps[implausible]), kind="stable")]
+
+    counts, edges = np.histogram(distance, bins=20) if len(distance) else ([], [])
+
+    return DriveAnalytics(
+        trips=len(distance),
+        km=int(distance.sum()),
+        mean_km=float(distance.mean()) if len(distance) else 0.0,
+        median_km=float(np.median(distance)) if len(distance) else 0.0,
+        daily=daily_km(columns, distance),
+        histogram=DistanceHistogram(
+            edges=[float(edge) for edge in edges], counts=[int(count) for count in counts]
+        ),
+        jump_fence_km=fence,
+        jumps=[
+            OdometerJump(
+                drive_log_id=int(columns.id[follows[i]]),
+                vehicle_id=int(columns.vehicle_id[follows[i]]),
+                date=EPOCH + dt.timedelta(days=int(columns.day[follows[i]])),
+                previous_end_km=int(columns.end_km[follows[i] - 1]),
+                start_km=int(columns.start_km[follows[i]]),
+                jump_km=int(jumps[i]),
+            )
+            for i in implausible
+        ],
+        job_sites=job_site_distributions(columns.job_site_id, distance),
+    )
+
+
+# --- CHARTS --- #
+
+
+def polyline(
+    values: np.ndarray, y_max: float, width: int, height: int, max_points: int = 600
+) -> str:
+    """SVG polyline points for `values`, every nth one when there are more than `max_points`."""
+    if not len(values):
+        return ""
+    step = -(-len(values) // max_points)
+    index = np.arange(0, len(values), step)
+    x = index * (width / max(len(values) - 1, 1))
+    y = height - values[index] * (height / y_max if y_max else 0)
+    return " ".join(f"{a:.1f},{b:.1f}" for a, b in zip(x, y))
@@ -1,40 +1,101 @@
 import datetime as dt
+import io
 import os
+from dataclasses import asdict
 from datetime import timedelta
 from typing import Any
 
-from flask import Flask, flash, redirect, render_template, request, url_for
+import click
+from flask import (
+    Flask,
+    Response,
+    abort,
+    flash,
+    make_response,
+    redirect,
+    render_template,
+    request,
+    send_file,
+    send_from_directory,
+    session,
+    stream_with_context,
+    url_for,
+)
 from flask_wtf.csrf import CSRFProtect
+from sqlalchemy.exc import IntegrityError
 
-from car_mileage_log_flask import commands, queries
+from car_mileage_log_flask import assets, commands, compression, exports, metrics, queries
 from car_mileage_log_flask.blueprints.auth import auth_bp, login_required
+from car_mileage_log_flask.db import connection, partitions
+from car_mileage_log_flask.db.cache import job_site_cache
+from car_mileage_log_flask.db.orm_reads import select_job_site_history
 from car_mileage_log_flask.db.reads import (
+    DriveLog,
+    DriveLogCompleted,
+    DriveLogCursor,
+    DriveLogPage,
+    StartDriveContext,
     drive_log_select_by_id,
-    drive_log_select_earliest_in_progress,
-    drive_log_select_last_completed,
-    drive_logs_select_count_in_progress,
-    job_site_select_most_recent,
+    drive_log_select_for_edit,
+    iter_completed_drive_logs,
+    search_job_sites,
     select_all_job_sites,
-    select_completed_drive_logs,
+    select_all_vehicles,
+    select_completed_drive_logs_page,
+    select_drive_logs_version,
+    select_first_vehicle,
+    select_fleet_version,
     select_job_site_by_id,
+    select_job_site_version,
+    select_job_sites_version,
+    select_start_drive_context,
+    select_vehicle_by_id,
+)
+from car_mileage_log_flask.db.reports import (
+    ReportPeriod,
+    select_totals_by_job_site,
+    select_totals_by_period,
 )
 from car_mileage_log_flask.db.writes import (
+    EditDriveLogInput,
     EndDriveInput,
     StartDriveInput,
     delete_job_site,
     drive_log_insert,
+    rebuild_odometer_state,
 )
 from car_mileage_log_flask.db.writes import drive_log_delete as db_drive_log_delete
+from car_mileage_log_flask.db.writes import edit_drive_log as db_edit_drive_log
 from car_mileage_log_flask.db.writes import end_drive as db_end_drive
 from car_mileage_log_flask.db.writes import start_drive as db_start_drive
-from car_mileage_log_flask.domain import DriveLogStatus
+from car_mileage_log_flask.domain import (
+    DriveDateOutOfRangeError,
+    DriveInProgressError,
+    DriveLogChangedError,
+    DriveLogStatus,
+    EndKmTooLowError,
+    OdometerConflictError,
+    StartKmTooLowError,
+    Vehicle,
+)
+from car_mileage_log_flask.http_cache import conditional_page
 
 app = Flask(__name__)
 secret_key = os.getenv("FLASK_SECRET_KEY")
 assert secret_key
 app.secret_key = secret_key
 app.permanent_session_lifetime = timedelta(days=7)
+app.config["DRIVE_LOGS_PAGE_SIZE"] = int(os.getenv("DRIVE_LOGS_PAGE_SIZE", "50"))
+app.config["JOB_SITE_SEARCH_LIMIT"] = int(os.getenv("JOB_SITE_SEARCH_LIMIT", "10"))
+app.config["JOB_SITE_HISTORY_DAYS"] = int(os.getenv("JOB_SITE_HISTORY_DAYS", "90"))
+app.config["ANALYTICS_MIN_JUMP_KM"] = int(os.getenv("ANALYTICS_MIN_JUMP_KM", "100"))
+app.config["SYNC_MAX_EVENTS"] = int(os.getenv("SYNC_MAX_EVENTS", "100"))
 csrf = CSRFProtect(app)
+connection.init_app(app)
+assets.init_app(app)
+# before metrics: after_request functions run in reverse, compression runs last
+compression.init_app(app)
+metrics.init_app(app)
 
 app.register_blueprint(auth_bp)
 
@@ -42,6 +103,26 @@ app.register_blueprint(auth_bp)
 # ---- APP ---- #
 
 
+def current_vehicle_id() -> int:
+    """
+    The vehicle picked on the vehicles page, else the first one.
+
+    Redirects to adding a vehicle when there is none yet.
+    """
+    vehicle_id = session.get("vehicle_id")
+    if vehicle_id is None:
+        vehicle_id = pick_first_vehicle(select_first_vehicle())
+    return vehicle_id
+
+
+def pick_first_vehicle(vehicle: Vehicle | None) -> int:
+    if vehicle is None:
+        flash("Add a vehicle first", "warning")
+        abort(redirect(url_for("vehicles_new")))
+    session["vehicle_id"] = vehicle.id
+    return vehicle.id
+
+
 @app.get("/")
 @login_required
 def home():
@@ -51,110 +132,282 @@ def home():
 @app.route("/start-drive", methods=["GET", "POST"])
 @login_required
 def start_drive():
+    errors = {}
+
+    if request.method == "POST":
+        # VALIDATION is done by the database, no reads before the insert
+        input = start_drive_input_from_form()
+        try:
+            drive_log = db_start_drive(input=input)
+        except StartKmTooLowError as e:
+            errors["start_km"] = str(e)
+        except DriveDateOutOfRangeError as e:
+            errors["date"] = str(e)
+        except DriveInProgressError as e:
+            flash(str(e), "warning")
+            # a fragment request gets the drive in progress from the snapshot below
+            if not wants_fragment():
+                return redirect(url_for("home"))
+        else:
+            flash("Drive started", "success")
+            if wants_fragment():
+                return render_end_drive(drive_log, {})
+            return redirect(url_for("end_drive", id=drive_log.id))
+
+    # get data in one round trip
+    snapshot = select_start_drive_context(
+        vehicle_id=current_vehicle_id(), job_sites_limit=app.config["JOB_SITE_SEARCH_LIMIT"]
+    )
+    return render_start_drive(snapshot, errors)
+
+
+def start_drive_input_from_form() -> StartDriveInput:
+    date = dt.datetime.strptime(request.form["date"], "%Y-%m-%d")
+    start_km = int(request.form["start_km"])
+    job_site_id = int(request.form["job_site_id"])
+    return StartDriveInput(
+        date=date,
+        start_km=start_km,
+        job_site_id=job_site_id,
+        vehicle_id=current_vehicle_id(),
+        driver_id=session.get("user_id"),
+    )
+
+
+def wants_fragment() -> bool:
+    # sent by static/js/drive_queue.js, the header htmx sends
+    return request.headers.get("HX-Request") == "true"
+
+
+def render_drive_screen(template: str, url: str, **context):
+    """
+    The start or end drive page. A fragment request gets the screen alone, to
+    swap in for the one it was posted from, with its URL in HX-Push-Url.
+    """
+    if not wants_fragment():
+        return render_template(template, **context)
+    response = make_response(render_template(template, fragment=True, **context))
+    response.headers["HX-Push-Url"] = url
+    return response
+
+
+def render_start_drive(snapshot: StartDriveContext, errors: dict[str, str]):
     # first check if there is drive in progress
-    drive_in_progress = drive_log_select_earliest_in_progress()
+    drive_in_progress = snapshot.drive_in_progress
     if drive_in_progress:
+        if wants_fragment():
+            return render_end_drive(drive_in_progress, {})
         return redirect(url_for("end_drive", id=drive_in_progress.id))
 
-    # get data
     today_date = dt.date.today()
-    job_sites = select_all_job_sites()
-    last_job_site = job_site_select_most_recent()
-    previous_drive_log = drive_log_select_last_completed()
 
     # build a base context
     context = {
-        "last_job_site": last_job_site,
-        "job_sites": job_sites,
+        "last_job_site": snapshot.last_job_site,
+        "job_sites": snapshot.job_sites,
         "today_date": today_date,
-        "previous_drive_log": previous_drive_log,
+        "previous_drive_log": snapshot.previous_drive_log,
+        # a drive queued offline stays on this vehicle, whichever is picked when it syncs
+        "vehicle_id": current_vehicle_id(),
     }
 
-    if request.method == "POST":
-        # FORM DATA
-        raw_date = request.form["date"]
-        raw_start_km = request.form["start_km"]
-        raw_job_site_id = request.form["job_site_id"]
-
-        date = dt.datetime.strptime(raw_date, "%Y-%m-%d")
-        start_km = int(raw_start_km)
-        job_site_id = int(raw_job_site_id)
-
-        # VALIDATION
-        errors = {}
-
-        # start_km must not be lower than previous end_km
-        if previous_drive_log and start_km < previous_drive_log.end_km:
-            errors["start_km"] = (
-                f"Start km ({start_km}) cannot be lower than previous End km ({previous_drive_log.end_km}), cmon"
-            )
-
-        if not errors:
-            input = StartDriveInput(
-                date=date, start_km=start_km, job_site_id=job_site_id
-            )
-            db_start_drive(input=input)
-            flash("Drive started", "success")
-            return redirect(url_for("home"))
-        else:
-            context["errors"] = errors
-            context["date"] = raw_date
-            context["start_km"] = raw_start_km
-            context["job_site_id"] = raw_job_site_id
+    if errors:
+        context["errors"] = errors
+        context["date"] = request.form["date"]
+        context["start_km"] = request.form["start_km"]
+        context["job_site_id"] = request.form["job_site_id"]
 
-    # if request.method is GET
-    return render_template("start-drive.html", **context)
+    return render_drive_screen("start-drive.html", url_for("start_drive"), **context)
 
 
 @app.route("/end-drive/<int:id>", methods=["GET", "POST"])
 @login_required
 def end_drive(id: int):
+    context: dict[str, Any] = {}
+
+    if request.method == "POST":
+        # FORM DATA
+        raw_end_km = request.form["end_km"]
+        end_km = int(raw_end_km)
+
+        # VALIDATION is done by the database, no reads before the update
+        input = EndDriveInput(id=id, end_km=end_km)
+        try:
+            ended = db_end_drive(input=input)
+        except (EndKmTooLowError, OdometerConflictError) as e:
+            context["errors"] = {"end_km": str(e)}
+            context["end_km"] = raw_end_km
+        else:
+            if ended:
+                flash("Drive ended", "success")
+                if not wants_fragment():
+                    return redirect(url_for("start_drive"))
+                snapshot = select_start_drive_context(
+                    vehicle_id=current_vehicle_id(),
+                    job_sites_limit=app.config["JOB_SITE_SEARCH_LIMIT"],
+                )
+                return render_start_drive(snapshot, {})
+
     # get data
     drive_log = drive_log_select_by_id(id=id)
+    return render_end_drive(drive_log, context)
+
 
+def render_end_drive(drive_log: DriveLog | DriveLogCompleted | None, context: dict[str, Any]):
     if drive_log is None:
         flash("Drive log doesn exist", "warning")
+        if wants_fragment():
+            # drive_queue.js loads the page instead of swapping in a screen
+            return Response(status=204, headers={"HX-Redirect": url_for("home")})
         return redirect(url_for("home"))
 
-    # build base context
-    context: dict[str, Any] = {"drive_log": drive_log}
+    context["drive_log"] = drive_log
+    return render_drive_screen("end_drive.html", url_for("end_drive", id=drive_log.id), **context)
 
-    if request.method == "POST":
-        # FORM DATA
-        raw_end_km = request.form["end_km"]
-        end_km = int(raw_end_km)
 
-        # VALIDATIONS
-        errors = {}
+# ---- SYNC ---- #
+
+
+@app.post("/sync")
+@csrf.exempt
+@login_required
+def sync():
+    """
+    Apply a batch of start and end drive events queued offline by
+    static/js/drive_queue.js, see commands/sync_drive_events.py.
+
+    Exempt from CSRF, the queue can outlive the form's token; only JSON is
+    accepted, which a cross-site form cannot send.
+    """
+    body = request.get_json()
+    events = body.get("events") if isinstance(body, dict) else None
+    if not isinstance(events, list):
+        return {"error": "Expected {\"events\": [...]}"}, 400
+    if len(events) > app.config["SYNC_MAX_EVENTS"]:
+        return {"error": f"At most {app.config['SYNC_MAX_EVENTS']} events per batch"}, 413
+
+    input = commands.SyncDriveEventsInput(
+        events=events, vehicle_id=current_vehicle_id(), driver_id=session.get("user_id")
+    )
+    try:
+        result = commands.sync_drive_events_command(input=input)
+    except commands.InvalidSyncEventError as e:
+        return {"error": str(e), "index": e.index}, 400
+
+    return {
+        "outcomes": [
+            {
+                "key": str(outcome.key),
+                "applied": outcome.applied,
+                "replayed": outcome.replayed,
+                "drive_log_id": outcome.drive_log_id,
+                "vehicle_id": outcome.vehicle_id,
+                "error": outcome.error,
+            }
+            for outcome in result.outcomes
+        ],
+        "states": [
+            {
+                "vehicle_id": state.vehicle_id,
+                "updated_at": state.updated_at.isoformat(),
+                "drive_in_progress_id": state.drive_in_progress_id,
+                "last_drive_id": state.last_drive_id,
+                "last_end_km": state.last_end_km,
+                "last_job_site_id": state.last_job_site_id,
+            }
+            for state in result.states
+        ],
+    }
+
 
-        # end_km cannot be lower than start_km
-        if end_km < drive_log.start_km:
-            errors["end_km"] = (
-                f"End km ({end_km}) cannot be lower than Start km ({drive_log.start_km}))"
-            )
+@app.get("/sw.js")
+def service_worker():
+    # served from the root so its scope covers the whole app
+    assert app.static_folder
+    response = send_from_directory(app.static_folder, "sw.js", max_age=0)
+    response.cache_control.no_cache = True
+    return response
 
-        if not errors:
-            input = EndDriveInput(id=id, end_km=end_km)
-            db_end_drive(input=input)
-            flash("Drive ended", "success")
-            return redirect(url_for("home"))
+
+# ---- VEHICLES ---- #
+
+
+@app.get("/vehicles")
+@login_required
+def vehicles_index():
+    context = {
+        "vehicles": select_all_vehicles(),
+        "current_vehicle_id": session.get("vehicle_id"),
+    }
+    return render_template("vehicles/index.html", **context)
+
+
+@app.get("/vehicles/new")
+@login_required
+def vehicles_new():
+    return render_template("vehicles/new.html")
+
+
+@app.post("/vehicles/new")
+@login_required
+def vehicles_new_submit():
+    name = request.form.get("vehicle-name")
+    plate = request.form.get("vehicle-plate")
+    if name and plate:
+        input = commands.CreateVehicleInput(name=name, plate=plate)
+        try:
+            commands.create_vehicle_command(input=input)
+        except IntegrityError:
+            flash(f"A vehicle with plate {plate} already exists", "danger")
         else:
-            context["errors"] = errors
-            context["end_km"] = raw_end_km
-    # when request method is GET
-    return render_template("end_drive.html", **context)
+            flash("Vehicle added", "success")
+    else:
+        flash("Vehicle not added", "danger")
+    return redirect(url_for("vehicles_index"))
+
+
+@app.post("/vehicles/select/<int:id>")
+@login_required
+def vehicles_select(id: int):
+    vehicle = select_vehicle_by_id(id=id)
+    if vehicle is None:
+        abort(404)
+    session["vehicle_id"] = vehicle.id
+    flash(f"Driving {vehicle.name}", "success")
+    return redirect(url_for("home"))
 
 
 # ---- JOB SITES ---- #
 
+JOB_SITE_SEARCH_MAX_LIMIT = 50
+
 
 @app.get("/job-sites")
 @login_required
 def job_sites_index():
-    job_sites = queries.get_all_job_sites()
+    q = request.args.get("q", "").strip()
+    if q:
+        # ranked by recent drives too, which the job sites version does not cover
+        job_sites = search_job_sites(query=q, limit=JOB_SITE_SEARCH_MAX_LIMIT)
+        return render_template("job_sites/index.html", job_sites=job_sites, q=q)
 
-    context = {"job_sites": job_sites}
-    return render_template("job_sites/index.html", **context)
+    def render():
+        job_sites = queries.get_all_job_sites()
+        context = {"job_sites": job_sites}
+        return render_template("job_sites/index.html", **context)
+
+    return conditional_page(select_job_sites_version(), render)
+
+
+@app.get("/job-sites/search")
+@login_required
+def job_sites_search():
+    """Best matches for ?q= as JSON, for the job site autocomplete."""
+    limit = request.args.get("limit", app.config["JOB_SITE_SEARCH_LIMIT"], type=int)
+    job_sites = search_job_sites(
+        query=request.args.get("q", ""), limit=max(1, min(limit, JOB_SITE_SEARCH_MAX_LIMIT))
+    )
+    return [asdict(job_site) for job_site in job_sites]
 
 
 @app.get("/job-sites/new")
@@ -166,9 +419,22 @@ def job_sites_new():
 @app.get("/job-sites/details/<int:id>")
 @login_required
 def job_sites_details(id: int):
-    job_site = select_job_site_by_id(id=id)
-    context = {"job_site": job_site}
-    return render_template("job_sites/details.html", **context)
+    since = dt.date.today() - timedelta(days=app.config["JOB_SITE_HISTORY_DAYS"])
+
+    def render():
+        history = select_job_site_history(id=id, since=since)
+        if history is None:
+            abort(404)
+        context = {"history": history, "since": since}
+        return render_template("job_sites/details.html", **context)
+
+    return conditional_page(select_job_site_version(id=id), render, key=(since,))
+
+
+@app.get("/job-sites/cache-stats")
+@login_required
+def job_sites_cache_stats():
+    return asdict(job_site_cache.stats())
 
 
 @app.post("/job-sites/new")
@@ -176,7 +442,6 @@ def job_sites_details(id: int):
 def job_sites_new_submit():
     name = request.form.get("job-site-name")
     address = request.form.get("job-site-address")
-    print(request.form)
     if name and address:
         input = commands.CreateJobSiteInput(name=name, address=address)
         commands.create_job_site_command(input=input)
@@ -233,11 +498,164 @@ def job_sites_edit_submit(id: int):
 @app.get("/drive-logs")
 @login_required
 def drive_logs_index():
-    drive_logs = select_completed_drive_logs()
-    context = {"drive_logs": drive_logs}
+    vehicle_id = current_vehicle_id()
+    after = drive_logs_cursor_from_args()
+
+    def render():
+        page = select_completed_drive_logs_page(
+            limit=app.config["DRIVE_LOGS_PAGE_SIZE"], after=after, vehicle_id=vehicle_id
+        )
+        return render_drive_logs_index(page)
+
+    version = select_drive_logs_version(vehicle_id=vehicle_id)
+    return conditional_page(version, render, key=(vehicle_id,))
+
+
+def drive_logs_cursor_from_args() -> DriveLogCursor | None:
+    raw_after = request.args.get("after")
+    if not raw_after:
+        return None
+    try:
+        return DriveLogCursor.decode(raw_after)
+    except ValueError:
+        abort(400)
+
+
+def render_drive_logs_index(page: DriveLogPage):
+    context = {"drive_logs": page.drive_logs, "next_cursor": page.next_cursor}
     return render_template("drive_logs/index.html", **context)
 
 
+@app.get("/drive-logs/export")
+@login_required
+def drive_logs_export():
+    export_format = request.args.get("format", "csv")
+    drive_logs = iter_completed_drive_logs(
+        start=request.args.get("start", type=dt.date.fromisoformat),
+        end=request.args.get("end", type=dt.date.fromisoformat),
+        job_site_id=request.args.get("job_site_id", type=int),
+        vehicle_id=request.args.get("vehicle_id", type=int),
+    )
+
+    if export_format == "csv":
+        return Response(
+            stream_with_context(exports.iter_csv(drive_logs)),
+            mimetype="text/csv",
+            headers={"Content-Disposition": "attachment; filename=drive-logs.csv"},
+        )
+
+    if export_format == "xlsx":
+        try:
+            file = exports.write_xlsx(drive_logs)
+        except ImportError:
+            abort(501, "XLSX export needs openpyxl installed")
+        return send_file(
+            file,
+            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            as_attachment=True,
+            download_name="drive-logs.xlsx",
+        )
+
+    abort(400)
+
+
+@app.route("/drive-logs/import", methods=["GET", "POST"])
+@login_required
+def drive_logs_import():
+    context = {}
+
+    if request.method == "POST":
+        upload = request.files.get("file")
+        if not upload:
+            flash("Choose a CSV file", "warning")
+            return redirect(url_for("drive_logs_import"))
+
+        file = io.TextIOWrapper(upload.stream, encoding="utf-8-sig", newline="")
+        input = commands.ImportDriveLogsInput(file=file, vehicle_id=current_vehicle_id())
+        result = commands.import_drive_logs_command(input=input)
+        flash(f"Imported {result.inserted} drive logs", "success")
+        context["result"] = result
+
+    return render_template("drive_logs/import.html", **context)
+
+
+@app.cli.command("import-drive-logs")
+@click.argument("csv_file", type=click.File("r", encoding="utf-8-sig"))
+@click.option("--vehicle-id", type=int, required=True)
+@click.option("--chunk-size", default=500, show_default=True)
+def drive_logs_import_cli(csv_file, vehicle_id: int, chunk_size: int):
+    """Import historical drive logs of one vehicle from CSV_FILE."""
+    input = commands.ImportDriveLogsInput(
+        file=csv_file, vehicle_id=vehicle_id, chunk_size=chunk_size
+    )
+    result = commands.import_drive_logs_command(input=input)
+    for error in result.errors:
+        click.echo(f"line {error.line}: {error.message}", err=True)
+    click.echo(f"Imported {result.inserted} drive logs, {len(result.errors)} rows with errors")
+
+
+@app.cli.command("create-user")
+@click.argument("username")
+@click.password_option()
+def create_user_cli(username: str, password: str):
+    """Create a driver login."""
+    input = commands.CreateUserInput(username=username, password=password)
+    user_id = commands.create_user_command(input=input)
+    click.echo(f"Created user {username} ({user_id})")
+
+
+@app.cli.command("rebuild-odometer-state")
+def rebuild_odometer_state_cli():
+    """Recompute every vehicle's odometer state from the drive logs."""
+    count = rebuild_odometer_state()
+    click.echo(f"Rebuilt the odometer state of {count} vehicles")
+
+
+@app.cli.command("create-drive-log-partitions")
+@click.option("--years-ahead", default=1, show_default=True, help="Years past the current one.")
+@click.option("--from-year", type=int, help="First past year, to backfill or import history.")
+def create_drive_log_partitions_cli(years_ahead: int, from_year: int | None):
+    """
+    Create the yearly drive log partitions, this year's, or --from-year's,
+    through --years-ahead years ahead.
+    """
+    for name in partitions.create_partitions(years_ahead=years_ahead, since=from_year):
+        click.echo(f"Created {name}")
+    if from_year is not None:
+        open_years = partitions.select_partition_years()
+        for year in partitions.archived_years():
+            if year >= from_year and year not in open_years:
+                click.echo(f"Skipped {year}, it is archived and dropped")
+    click.echo(f"Drive logs can be dated through {dt.date.today().year + years_ahead}")
+
+
+@app.cli.command("archive-drive-logs")
+@click.argument("year", type=int)
+@click.option("--drop", is_flag=True, help="Drop the year's partition once it is archived.")
+def archive_drive_logs_cli(year: int, drop: bool):
+    """Archive the drive logs of a past YEAR to Parquet in DRIVE_LOG_ARCHIVE_DIR."""
+    try:
+        result = partitions.archive_year(year, drop=drop)
+    except (partitions.ArchiveError, ImportError) as e:
+        raise click.ClickException(str(e)) from e
+    click.echo(f"Archived {result.rows} drive logs of {year} to {result.path}")
+    if result.dropped:
+        click.echo(f"Dropped {partitions.partition_name(year)}")
+
+
+@app.cli.command("build-assets")
+@click.option("--check", is_flag=True, help="Fail if static/dist is not up to date, write nothing.")
+def build_assets_cli(check: bool):
+    """Build the trimmed, fingerprinted and precompressed assets in static/dist."""
+    if check:
+        if assets.build_assets(write=False) != assets.manifest():
+            raise click.ClickException("static/dist is out of date, run `flask build-assets`")
+        click.echo("static/dist is up to date")
+        return
+    for name, built in assets.build_assets().items():
+        click.echo(f"{name} -> {built}")
+
+
 @app.get("/drive-logs/new")
 @login_required
 def drive_logs_new():
@@ -254,26 +672,35 @@ def drive_logs_new_submit():
     end_km = int(request.form["drive-log-end-km"])
     job_site_id = int(request.form["job-site-id"])
 
-    # VALIDATIONS
-    errors = {}
-
-    # Cannot be more than 1 drive in progress
-    drive_in_progress_count = drive_logs_select_count_in_progress()
-
-    drive_log_insert(
-        date=date,
-        start_km=start_km,
-        end_km=end_km,
-        status=DriveLogStatus.COMPLETED.value,
-        job_site_id=job_site_id,
-    )
+    # VALIDATIONS are done by the database
+    try:
+        drive_log_insert(
+            date=date,
+            start_km=start_km,
+            end_km=end_km,
+            status=DriveLogStatus.COMPLETED.value,
+            job_site_id=job_site_id,
+            vehicle_id=current_vehicle_id(),
+            driver_id=session.get("user_id"),
+        )
+    except (
+        StartKmTooLowError,
+        EndKmTooLowError,
+        OdometerConflictError,
+        DriveInProgressError,
+        DriveDateOutOfRangeError,
+    ) as e:
+        flash(str(e), "danger")
+        return redirect(url_for("drive_logs_new"))
     return redirect(url_for("drive_logs_index"))
 
 
 @app.get("/drive-logs/delete/<int:id>")
 @login_required
 def drive_logs_delete(id: int):
-    drive_log = drive_log_select_by_id(id=id)
+    # the drive's date, its partition, from the drive log list
+    date = request.args.get("date", type=dt.date.fromisoformat)
+    drive_log = drive_log_select_by_id(id=id, date=date)
     if drive_log is None:
         flash("Drive log doesn't exist", "warning")
         return redirect(url_for("drive_logs_index"))
@@ -285,8 +712,9 @@ def drive_logs_delete(id: int):
 @app.post("/drive-logs/delete/<int:id>")
 @login_required
 def drive_logs_delete_confirmed(id: int):
+    date = request.form.get("date", type=dt.date.fromisoformat)
     try:
-        db_drive_log_delete(id=id)
+        db_drive_log_delete(id=id, date=date)
         flash("Drive log deleted", "success")
     except Exception:
         flash("Drive log cannot be deleted", "danger")
@@ -297,4 +725,140 @@ def drive_logs_delete_confirmed(id: int):
 @app.get("/drive-logs/edit/<int:id>")
 @login_required
 def drive_logs_edit(id: int):
-    return render_template("drive_logs/edit.html")
+    # the drive's date, its partition, from the drive log list
+    date = request.args.get("date", type=dt.date.fromisoformat)
+    edit = drive_log_select_for_edit(id=id, date=date)
+    if edit is None:
+        flash("Drive log doesn't exist", "warning")
+        return redirect(url_for("drive_logs_index"))
+
+    context = {"edit": edit, "job_sites": select_all_job_sites()}
+    return render_template("drive_logs/edit.html", **context)
+
+
+@app.post("/drive-logs/edit/<int:id>")
+@login_required
+def drive_logs_edit_submit(id: int):
+    raw_end_km = request.form.get("drive-log-end-km")
+    input = EditDriveLogInput(
+        id=id,
+        updated_at=dt.datetime.fromisoformat(request.form["drive-log-updated-at"]),
+        date=dt.date.fromisoformat(request.form["drive-log-date"]),
+        start_km=int(request.form["drive-log-start-km"]),
+        end_km=int(raw_end_km) if raw_end_km else None,
+        job_site_id=int(request.form["job-site-id"]),
+        read_date=request.form.get("drive-log-read-date", type=dt.date.fromisoformat),
+    )
+
+    # VALIDATIONS and the version check are done by the database
+    try:
+        edited = db_edit_drive_log(input=input)
+    except DriveLogChangedError as e:
+        flash(str(e), "warning")
+        changed = True
+    except (
+        StartKmTooLowError,
+        EndKmTooLowError,
+        OdometerConflictError,
+        DriveDateOutOfRangeError,
+    ) as e:
+        flash(str(e), "danger")
+        changed = False
+    else:
+        if edited:
+            flash("Drive log edited", "success")
+        else:
+            flash("Drive log doesn't exist", "warning")
+        return redirect(url_for("drive_logs_index"))
+
+    # the form again with what was typed, against the version saved now
+    edit = drive_log_select_for_edit(id=id, date=input.read_date)
+    if edit is None:
+        return redirect(url_for("drive_logs_index"))
+    context = {
+        "edit": edit,
+        "job_sites": select_all_job_sites(),
+        "form": request.form,
+        "changed": changed,
+    }
+    return render_template("drive_logs/edit.html", **context)
+
+
+# ---- REPORTS ---- #
+
+
+@app.get("/reports")
+@login_required
+def reports_index():
+    try:
+        period = ReportPeriod(request.args.get("period", ReportPeriod.MONTH.value))
+    except ValueError:
+        abort(400)
+    start = request.args.get("start", type=dt.date.fromisoformat)
+    end = request.args.get("end", type=dt.date.fromisoformat)
+    job_site_id = request.args.get("job_site_id", type=int)
+    vehicle_id = request.args.get("vehicle_id", type=int)
+
+    period_totals = select_totals_by_period(
+        period=period, start=start, end=end, job_site_id=job_site_id, vehicle_id=vehicle_id
+    )
+    job_site_totals = select_totals_by_job_site(start=start, end=end, vehicle_id=vehicle_id)
+
+    context = {
+        "periods": ReportPeriod,
+        "period": period,
+        "start": start,
+        "end": end,
+        "job_site_id": job_site_id,
+        "job_sites": select_all_job_sites(),
+        "vehicle_id": vehicle_id,
+        "vehicles": select_all_vehicles(),
+        "period_totals": period_totals,
+        "job_site_totals": job_site_totals,
+    }
+    return render_template("reports/index.html", **context)
+
+
+# ---- ANALYTICS ---- #
+
+ANALYTICS_CHART_WIDTH = 600
+ANALYTICS_CHART_HEIGHT = 160
+
+
+@app.get("/analytics")
+@login_required
+def analytics_index():
+    try:
+        from car_mileage_log_flask import analytics
+    except ImportError:
+        abort(501, "Analytics needs numpy installed")
+
+    vehicle_id = request.args.get("vehicle_id", type=int)
+    start = request.args.get("start", type=dt.date.fromisoformat)
+    end = request.args.get("end", type=dt.date.fromisoformat)
+
+    def render():
+        columns = analytics.select_drive_log_columns(vehicle_id=vehicle_id, start=start, end=end)
+        result = analytics.compute_analytics(
+            columns, min_jump_km=app.config["ANALYTICS_MIN_JUMP_KM"]
+        )
+        charts = {}
+        if result.daily is not None:
+            y_max = float(result.daily.rolling_7.max())
+            size = (y_max, ANALYTICS_CHART_WIDTH, ANALYTICS_CHART_HEIGHT)
+            charts["rolling_7"] = analytics.polyline(result.daily.rolling_7, *size)
+            charts["rolling_30"] = analytics.polyline(result.daily.rolling_30, *size)
+            charts["y_max"] = y_max
+        context = {
+            "vehicles": select_all_vehicles(),
+            "vehicle_id": vehicle_id,
+            "start": start,
+            "end": end,
+            "analytics": result,
+            "charts": charts,
+            "chart_width": ANALYTICS_CHART_WIDTH,
+            "chart_height": ANALYTICS_CHART_HEIGHT,
+        }
+        return render_template("analytics/index.html", **context)
+
+    return conditional_page(select_fleet_version(), render)
@@ -0,0 +1,174 @@
+"""
+ASGI entry point: the same app, with the hot path views made async.
+
+    uvicorn car_mileage_log_flask.asgi:asgi_app
+
+Start drive, end drive, the drive log list and the job site list are replaced
+by async views on db/async_reads.py and db/async_writes.py. Every other view
+stays sync.
+
+Flask itself is WSGI, so each request runs on a thread of its own, at most
+ASGI_THREADS at a time. Async views are not given a throwaway event loop per
+request, as under a WSGI server: they run on the server's loop, where their
+queries share the asyncio engine's pool. A thread waiting on a query holds no
+database connection, so one process serves many concurrent drivers with a
+small pool. Needs the `async` extra.
+"""
+
+import asyncio
+import os
+
+from asgiref.sync import ThreadSensitiveContext
+from asgiref.wsgi import WsgiToAsgi
+from flask import flash, redirect, render_template, request, session, url_for
+
+from car_mileage_log_flask.app import (
+    JOB_SITE_SEARCH_MAX_LIMIT,
+    app,
+    drive_logs_cursor_from_args,
+    pick_first_vehicle,
+    render_drive_logs_index,
+    render_end_drive,
+    render_start_drive,
+    start_drive_input_from_form,
+    wants_fragment,
+)
+from car_mileage_log_flask.blueprints.auth import login_required
+from car_mileage_log_flask.db import async_reads, async_writes
+from car_mileage_log_flask.db.writes import EndDriveInput
+from car_mileage_log_flask.domain import (
+    DriveDateOutOfRangeError,
+    DriveInProgressError,
+    EndKmTooLowError,
+    OdometerConflictError,
+    StartKmTooLowError,
+)
+from car_mileage_log_flask.http_cache import conditional_page_async
+
+# ---- VIEWS ---- #
+
+
+async def current_vehicle_id() -> int:
+    """
+    app.current_vehicle_id without a blocking query on the loop. Awaited
+    first in each view, so the app's helpers called after find the vehicle
+    in the session.
+    """
+    vehicle_id = session.get("vehicle_id")
+    if vehicle_id is None:
+        vehicle_id = pick_first_vehicle(await async_reads.select_first_vehicle())
+    return vehicle_id
+
+
+@login_required
+async def start_drive():
+    vehicle_id = await current_vehicle_id()
+    errors = {}
+
+    if request.method == "POST":
+        input = start_drive_input_from_form()
+        try:
+            drive_log = await async_writes.start_drive(input=input)
+        except StartKmTooLowError as e:
+            errors["start_km"] = str(e)
+        except DriveDateOutOfRangeError as e:
+            errors["date"] = str(e)
+        except DriveInProgressError as e:
+            flash(str(e), "warning")
+            if not wants_fragment():
+                return redirect(url_for("home"))
+        else:
+            flash("Drive started", "success")
+            if wants_fragment():
+                return render_end_drive(drive_log, {})
+            return redirect(url_for("end_drive", id=drive_log.id))
+
+    snapshot = await async_reads.select_start_drive_context(
+        vehicle_id=vehicle_id, job_sites_limit=app.config["JOB_SITE_SEARCH_LIMIT"]
+    )
+    return render_start_drive(snapshot, errors)
+
+
+@login_required
+async def end_drive(id: int):
+    context = {}
+
+    if request.method == "POST":
+        raw_end_km = request.form["end_km"]
+        input = EndDriveInput(id=id, end_km=int(raw_end_km))
+        try:
+            ended = await async_writes.end_drive(input=input)
+        except (EndKmTooLowError, OdometerConflictError) as e:
+            context["errors"] = {"end_km": str(e)}
+            context["end_km"] = raw_end_km
+        else:
+            if ended:
+                flash("Drive ended", "success")
+                if not wants_fragment():
+                    return redirect(url_for("start_drive"))
+                snapshot = await async_reads.select_start_drive_context(
+                    vehicle_id=await current_vehicle_id(),
+                    job_sites_limit=app.config["JOB_SITE_SEARCH_LIMIT"],
+                )
+                return render_start_drive(snapshot, {})
+
+    drive_log = await async_reads.drive_log_select_by_id(id=id)
+    return render_end_drive(drive_log, context)
+
+
+@login_required
+async def drive_logs_index():
+    vehicle_id = await current_vehicle_id()
+    after = drive_logs_cursor_from_args()
+
+    async def render():
+        page = await async_reads.select_completed_drive_logs_page(
+            limit=app.config["DRIVE_LOGS_PAGE_SIZE"], after=after, vehicle_id=vehicle_id
+        )
+        return render_drive_logs_index(page)
+
+    version = await async_reads.select_drive_logs_version(vehicle_id=vehicle_id)
+    return await conditional_page_async(version, render, key=(vehicle_id,))
+
+
+@login_required
+async def job_sites_index():
+    q = request.args.get("q", "").strip()
+    if q:
+        job_sites = await async_reads.search_job_sites(query=q, limit=JOB_SITE_SEARCH_MAX_LIMIT)
+        return render_template("job_sites/index.html", job_sites=job_sites, q=q)
+
+    async def render():
+        job_sites = await async_reads.select_all_job_sites()
+        return render_template("job_sites/index.html", job_sites=job_sites)
+
+    version = await async_reads.select_job_sites_version()
+    return await conditional_page_async(version, render)
+
+
+ASYNC_VIEWS = {
+    "start_drive": start_drive,
+    "end_drive": end_drive,
+    "drive_logs_index": drive_logs_index,
+    "job_sites_index": job_sites_index,
+}
+
+app.view_functions.update(ASYNC_VIEWS)
+
+
+# ---- SERVER ---- #
+
+
+class _ThreadPerRequestWsgiToAsgi(WsgiToAsgi):
+    # asgiref runs every WSGI request on one shared thread, unless the request
+    # is in a ThreadSensitiveContext, which gets a thread of its own
+    def __init__(self, wsgi_application) -> None:
+        super().__init__(wsgi_application)
+        self.threads = asyncio.Semaphore(int(os.getenv("ASGI_THREADS", "64")))
+
+    async def __call__(self, scope, receive, send):
+        async with self.threads, ThreadSensitiveContext():
+            await super().__call__(scope, receive, send)
+
+
+asgi_app = _ThreadPerRequestWsgiToAsgi(app)
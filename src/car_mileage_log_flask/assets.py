@@ -0,0 +1,274 @@
+"""
+Static assets: vendored, trimmed, fingerprinted and precompressed.
+
+Bootstrap's CSS and the Bootstrap Icons the templates use are vendored in
+vendor/, pages load nothing from a CDN. `flask build-assets` builds
+static/dist/ from them and static/js/:
+
+- css/app.css: the Bootstrap rules whose classes appear in the templates or
+  in static/js, and a rule per icon used, its SVG as a mask so it takes the
+  text colour
+- the scripts the templates load, as they are
+- each file named after a hash of its content, with a .gz and a .br next to
+  it (.br needs the `compression` extra), and manifest.json from names to
+  the built files
+
+static/dist/ is committed, deploys do not build it. Templates link assets
+with `asset_url("css/app.css")`, served from /assets/ with an immutable
+Cache-Control: a changed file gets a new name, so browsers never revalidate
+one. Clients that accept br or gzip get the precompressed file.
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import re
+import shutil
+from collections.abc import Iterable, Iterator
+from functools import lru_cache
+from pathlib import Path
+from urllib.parse import quote
+
+from flask import Flask, Response, abort, request, send_file, url_for
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # the `compression` extra
+    brotli = None
+
+PACKAGE = Path(__file__).parent
+VENDOR = PACKAGE / "vendor"
+STATIC = PACKAGE / "static"
+DIST = STATIC / "dist"
+MANIFEST = DIST / "manifest.json"
+
+# the scripts templates load through asset_url; sw.js imports drive_queue.js
+# from static/js/ too, a service worker needs a stable URL
+SCRIPTS = ("js/drive_queue.js", "js/job_site_search.js")
+
+MAX_AGE = 365 * 24 * 60 * 60
+
+# --- CSS --- #
+
+CLASS = re.compile(r"\.(-?[_a-zA-Z][\w-]*)")
+TOKEN = re.compile(r"-?[_a-zA-Z][\w-]*")
+# alert-{{ category }} in a template, `alert-${category}` in a script
+DYNAMIC_PREFIX = re.compile(r"([_a-zA-Z][\w-]*-)(?:\{\{|\$\{)")
+# wrapping blocks whose rules are trimmed one by one
+GROUPING_RULES = ("@media", "@supports", "@container", "@layer")
+
+ICON_CSS = (
+    ".bi::before{content:'';display:inline-block;width:1em;height:1em;"
+    "vertical-align:-.125em;background-color:currentColor;"
+    "-webkit-mask:var(--bi) center/contain no-repeat;mask:var(--bi) center/contain no-repeat}"
+)
+
+
+def _skip_string(css: str, i: int) -> int:
+    # index after the string starting at i
+    quote_char = css[i]
+    i += 1
+    while css[i] != quote_char:
+        i += 2 if css[i] == "\\" else 1
+    return i + 1
+
+
+def _blocks(css: str) -> Iterator[tuple[str, str | None]]:
+    """
+    The top level statements of `css`: (prelude, body) for a block, (text,
+    None) for a statement without one, like @charset or a /*! license */.
+    """
+    i, start, depth, prelude_end = 0, 0, 0, 0
+    while i < len(css):
+        char = css[i]
+        if char in "\"'":
+            i = _skip_string(css, i)
+            continue
+        if css.startswith("/*", i):
+            end = css.index("*/", i) + 2
+            if depth == 0:
+                if css.startswith("/*!", i):
+                    yield css[i:end], None
+                start = end
+            i = end
+            continue
+        if char == "{":
+            if depth == 0:
+                prelude_end = i
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                yield css[start:prelude_end].strip(), css[prelude_end + 1 : i]
+                start = i + 1
+        elif char == ";" and depth == 0:
+            yield css[start : i + 1].strip(), None
+            start = i + 1
+        i += 1
+
+
+def _split_selectors(prelude: str) -> list[str]:
+    # on the commas outside of :is(...), :not(...) and the like
+    selectors, depth, start = [], 0, 0
+    for i, char in enumerate(prelude):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            selectors.append(prelude[start:i])
+            start = i + 1
+    selectors.append(prelude[start:])
+    return selectors
+
+
+def trim_css(css: str, used: set[str]) -> str:
+    """
+    `css` without the selectors naming a class not in `used`, and without the
+    rules left with no selector. Keyframes no kept rule animates are dropped.
+    """
+    rules, keyframes = [], []
+    for prelude, body in _blocks(css):
+        if body is None:
+            rules.append(prelude)
+        elif prelude.startswith(GROUPING_RULES):
+            inner = trim_css(body, used)
+            if inner:
+                rules.append(f"{prelude}{{{inner}}}")
+        elif prelude.startswith("@keyframes"):
+            keyframes.append((prelude.split()[1], f"{prelude}{{{body}}}"))
+        elif prelude.startswith("@"):
+            rules.append(f"{prelude}{{{body}}}")
+        else:
+            selectors = [
+                selector
+                for selector in _split_selectors(prelude)
+                if all(name in used for name in CLASS.findall(selector))
+            ]
+            if selectors:
+                rules.append(f"{','.join(selectors)}{{{body}}}")
+
+    kept = "".join(rules)
+    animated = [rule for name, rule in keyframes if re.search(rf"[\s:,]{re.escape(name)}\b", kept)]
+    return kept + "".join(animated)
+
+
+def used_classes(sources: Iterable[str], known: set[str]) -> set[str]:
+    """
+    Every word of `sources` that could be a class. A class built from a prefix
+    and a variable keeps every known class with that prefix.
+    """
+    used = set()
+    for text in sources:
+        used.update(TOKEN.findall(text))
+        for prefix in DYNAMIC_PREFIX.findall(text):
+            used.update(name for name in known if name.startswith(prefix))
+    return used
+
+
+def _icon_css(names: Iterable[str]) -> str:
+    rules = [ICON_CSS]
+    for name in sorted(names):
+        path = VENDOR / "bootstrap-icons" / f"{name}.svg"
+        if not path.exists():
+            raise FileNotFoundError(f"bi-{name} is used, add {path} from Bootstrap Icons 1.13.1")
+        svg = " ".join(path.read_text().split()).replace('"', "'")
+        rules.append(f'.bi-{name}{{--bi:url("data:image/svg+xml,{quote(svg, safe=" /=:.,-")}")}}')
+    return "".join(rules)
+
+
+def _template_sources() -> Iterator[str]:
+    for path in sorted((PACKAGE / "templates").rglob("*.html")):
+        yield path.read_text()
+    for path in sorted((STATIC / "js").glob("*.js")):
+        yield path.read_text()
+
+
+def bundle_css() -> str:
+    """Bootstrap trimmed to the classes in use, and the icons in use."""
+    bootstrap = (VENDOR / "bootstrap" / "bootstrap.min.css").read_text()
+    sources = list(_template_sources())
+    used = used_classes(sources, known=set(CLASS.findall(bootstrap)))
+    icons = {name[3:] for name in used if name.startswith("bi-")}
+    return trim_css(bootstrap, used) + _icon_css(icons)
+
+
+# --- BUILD --- #
+
+
+def _fingerprinted(name: str, data: bytes) -> str:
+    stem, _, extension = name.rpartition(".")
+    return f"{stem}.{hashlib.blake2b(data, digest_size=6).hexdigest()}.{extension}"
+
+
+def build_assets(write: bool = True) -> dict[str, str]:
+    """
+    Build static/dist/, see the module docstring, and return its manifest.
+    With `write` False nothing is written, to compare with the built one.
+    """
+    outputs = {"css/app.css": bundle_css().encode()}
+    outputs.update({name: (STATIC / name).read_bytes() for name in SCRIPTS})
+    built = {name: _fingerprinted(name, data) for name, data in outputs.items()}
+    if not write:
+        return built
+
+    shutil.rmtree(DIST, ignore_errors=True)
+    for name, data in outputs.items():
+        path = DIST / built[name]
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        # mtime=0: the same input builds the same bytes
+        path.with_name(f"{path.name}.gz").write_bytes(gzip.compress(data, 9, mtime=0))
+        if brotli is not None:
+            path.with_name(f"{path.name}.br").write_bytes(brotli.compress(data, quality=11))
+    MANIFEST.write_text(json.dumps(built, indent=2, sort_keys=True) + "\n")
+    return built
+
+
+@lru_cache(maxsize=1)
+def _load_manifest(mtime_ns: int) -> dict[str, str]:
+    return json.loads(MANIFEST.read_text())
+
+
+def manifest() -> dict[str, str]:
+    """The built assets by name, read again when a rebuild changes it."""
+    if not MANIFEST.exists():
+        return {}
+    return _load_manifest(MANIFEST.stat().st_mtime_ns)
+
+
+# --- SERVING --- #
+
+
+def asset_url(name: str) -> str:
+    built = manifest().get(name)
+    if built is None:
+        raise LookupError(f"{name} is not built, run `flask build-assets`")
+    return url_for("assets", filename=built)
+
+
+def send_asset(filename: str) -> Response:
+    path = safe_join(str(DIST), filename)
+    if path is None or filename.endswith((".gz", ".br")) or not Path(path).is_file():
+        abort(404)
+
+    mimetype = mimetypes.guess_type(filename)[0]
+    for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+        if request.accept_encodings[encoding] and Path(path + suffix).is_file():
+            response = send_file(path + suffix, mimetype=mimetype, max_age=MAX_AGE)
+            response.content_encoding = encoding
+            break
+    else:
+        response = send_file(path, mimetype=mimetype, max_age=MAX_AGE)
+
+    response.vary.add("Accept-Encoding")
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def init_app(app: Flask) -> None:
+    app.add_url_rule("/assets/<path:filename>", "assets", send_asset)
+    app.add_template_global(asset_url)
@@ -2,15 +2,29 @@
 Auth flask blueprint
 """
 
+import inspect
 import os
 from functools import wraps
 
 from flask import Blueprint, flash, redirect, render_template, request, session, url_for
+from werkzeug.security import check_password_hash
+
+from car_mileage_log_flask.db.reads import select_user_by_username
 
 auth_bp = Blueprint("auth", __name__, url_prefix="/auth")
 
 
 def login_required(view):
+    if inspect.iscoroutinefunction(view):
+
+        @wraps(view)
+        async def wrapped_async_view(*args, **kwargs):
+            if not session.get("logged_in"):
+                return redirect(url_for("auth.login"))
+            return await view(*args, **kwargs)
+
+        return wrapped_async_view
+
     @wraps(view)
     def wrapped_view(*args, **kwargs):
         if not session.get("logged_in"):
@@ -26,7 +40,16 @@ def login():
         username = request.form["username"]
         password = request.form["password"]
 
-        if username == os.getenv("AUTH_USERNAME") and password == os.getenv(
+        credentials = select_user_by_username(username)
+        if credentials is not None and check_password_hash(
+            credentials.password_hash, password
+        ):
+            session.permanent = True
+            session["logged_in"] = True
+            session["user_id"] = credentials.user.id
+            return redirect(url_for("home"))
+        # the single shared login from before drivers had their own accounts
+        elif username == os.getenv("AUTH_USERNAME") and password == os.getenv(
             "AUTH_PASSWORD"
         ):
             session.permanent = True
@@ -40,4 +63,6 @@ def login():
 @auth_bp.route("/logout")
 def logout():
     session.pop("logged_in", None)
+    session.pop("user_id", None)
+    session.pop("vehicle_id", None)
     return redirect(url_for("auth.login"))
@@ -2,7 +2,26 @@ from car_mileage_log_flask.commands.create_job_site import (
     CreateJobSiteInput,
     create_job_site_command,
 )
+from car_mileage_log_flask.commands.create_user import (
+    CreateUserInput,
+    create_user_command,
+)
+from car_mileage_log_flask.commands.create_vehicle import (
+    CreateVehicleInput,
+    create_vehicle_command,
+)
 from car_mileage_log_flask.commands.edit_job_site import (
     EditJobSiteInput,
     edit_job_site_command,
 )
+from car_mileage_log_flask.commands.import_drive_logs import (
+    ImportDriveLogsInput,
+    ImportDriveLogsResult,
+    import_drive_logs_command,
+)
+from car_mileage_log_flask.commands.sync_drive_events import (
+    InvalidSyncEventError,
+    SyncDriveEventsInput,
+    SyncDriveEventsResult,
+    sync_drive_events_command,
+)
@@ -0,0 +1,16 @@
+from dataclasses import dataclass
+
+from werkzeug.security import generate_password_hash
+
+from car_mileage_log_flask.db.writes import insert_user
+
+
+@dataclass
+class CreateUserInput:
+    username: str
+    password: str
+
+
+def create_user_command(input: CreateUserInput) -> int:
+    password_hash = generate_password_hash(input.password)
+    return insert_user(username=input.username, password_hash=password_hash)
@@ -0,0 +1,15 @@
+from dataclasses import dataclass
+
+from car_mileage_log_flask.db.writes import insert_vehicle
+from car_mileage_log_flask.domain import Vehicle
+
+
+@dataclass
+class CreateVehicleInput:
+    name: str
+    plate: str
+
+
+def create_vehicle_command(input: CreateVehicleInput) -> int:
+    vehicle = Vehicle(id=None, name=input.name, plate=input.plate.upper())
+    return insert_vehicle(vehicle=vehicle)
@@ -0,0 +1,177 @@
+"""
+Bulk import of historical drive logs from CSV.
+
+The CSV is read row by row and validated in a single pass against the rules in
+logic_rules.md, chaining each row to the previous accepted one. Valid rows are
+inserted in chunks, one transaction per chunk, and checked against the drives
+already in the database around them. Invalid rows, and the rows of a chunk the
+database rejects, are reported and skipped; the rest of the batch still goes in.
+
+Columns: date (YYYY-MM-DD), start_km, end_km and job_site_address or
+job_site_name. The drive log CSV export has the same columns. All rows belong
+to one vehicle, odometer readings are chained per vehicle.
+"""
+
+import csv
+import datetime as dt
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from datetime import timezone
+from typing import TextIO
+
+from car_mileage_log_flask.db.reads import (
+    drive_log_select_last_before,
+    select_all_job_sites,
+)
+from car_mileage_log_flask.db.writes import drive_logs_insert_many
+from car_mileage_log_flask.domain import DriveLogStatus, EndKmTooLowError, StartKmTooLowError
+
+
+@dataclass
+class ImportDriveLogsInput:
+    file: TextIO
+    vehicle_id: int
+    chunk_size: int = 500
+
+
+@dataclass
+class ImportRowError:
+    line: int
+    message: str
+
+
+@dataclass
+class ImportDriveLogsResult:
+    inserted: int = 0
+    errors: list[ImportRowError] = field(default_factory=list)
+
+
+def _created_at(date: dt.date, line: int) -> dt.datetime:
+    # historical rows are ordered by the day they were driven, not by when
+    # they were imported; the line number keeps rows of one day in file order
+    midnight = dt.datetime.combine(date, dt.time.min, tzinfo=timezone.utc)
+    return midnight + dt.timedelta(microseconds=line)
+
+
+def _job_site_lookup() -> dict[str, int]:
+    lookup = {}
+    for job_site in select_all_job_sites():
+        assert job_site.id is not None
+        lookup[job_site.name.casefold()] = job_site.id
+        lookup[job_site.address.casefold()] = job_site.id
+    return lookup
+
+
+def _insert_chunk(
+    chunk: list[tuple[int, dict]], result: ImportDriveLogsResult
+) -> dict | None:
+    """Returns the last row the database accepted, None when it refused them all."""
+    accepted = None
+    errors = drive_logs_insert_many([row for _, row in chunk])
+    for (line, row), error in zip(chunk, errors):
+        if error is None:
+            result.inserted += 1
+            accepted = row
+        else:
+            result.errors.append(ImportRowError(line=line, message=error))
+    return accepted
+
+
+def _breaks_chain(previous: dict, date: dt.date, start_km: int) -> bool:
+    return date < previous["date"] or start_km < previous["end_km"]
+
+
+def _parse_rows(file: TextIO) -> Iterable[tuple[int, dict[str, str]]]:
+    reader = csv.DictReader(file)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def import_drive_logs_command(input: ImportDriveLogsInput) -> ImportDriveLogsResult:
+    result = ImportDriveLogsResult()
+    job_sites = _job_site_lookup()
+
+    baseline_loaded = False
+    # the last row the database accepted; until then, the drive before the batch
+    previous_end_km: int | None = None
+    previous_date: dt.date | None = None
+    chunk: list[tuple[int, dict]] = []
+
+    def flush():
+        nonlocal previous_end_km, previous_date, chunk
+        accepted = _insert_chunk(chunk, result)
+        if accepted is not None:
+            previous_end_km = accepted["end_km"]
+            previous_date = accepted["date"]
+        chunk = []
+
+    for line, raw in _parse_rows(input.file):
+        try:
+            date = dt.date.fromisoformat(raw["date"].strip())
+            start_km = int(raw["start_km"])
+            end_km = int(raw["end_km"])
+        except (KeyError, TypeError, ValueError) as e:
+            result.errors.append(ImportRowError(line=line, message=f"Invalid row: {e}"))
+            continue
+
+        job_site_key = (raw.get("job_site_address") or raw.get("job_site_name") or "").strip()
+        job_site_id = job_sites.get(job_site_key.casefold())
+        if job_site_id is None:
+            message = f"Unknown job site '{job_site_key}'"
+            result.errors.append(ImportRowError(line=line, message=message))
+            continue
+
+        if not baseline_loaded:
+            # the batch continues from whatever was driven before its first row
+            previous = drive_log_select_last_before(
+                vehicle_id=input.vehicle_id, date=date, created_at=_created_at(date, line)
+            )
+            previous_end_km = previous.end_km if previous else None
+            baseline_loaded = True
+
+        if chunk and _breaks_chain(chunk[-1][1], date, start_km):
+            # a pending row may yet be refused by the database, insert them so
+            # this row is only refused against accepted ones
+            flush()
+        last_date, last_end_km = previous_date, previous_end_km
+        if chunk:
+            last_date, last_end_km = chunk[-1][1]["date"], chunk[-1][1]["end_km"]
+
+        if last_date is not None and date < last_date:
+            message = f"Date {date} is before the previous row's date {last_date}"
+            result.errors.append(ImportRowError(line=line, message=message))
+            continue
+
+        if last_end_km is not None and start_km < last_end_km:
+            error = StartKmTooLowError(start_km=start_km, previous_end_km=last_end_km)
+            result.errors.append(ImportRowError(line=line, message=str(error)))
+            continue
+
+        if end_km < start_km:
+            error = EndKmTooLowError(end_km=end_km, start_km=start_km)
+            result.errors.append(ImportRowError(line=line, message=str(error)))
+            continue
+
+        chunk.append(
+            (
+                line,
+                {
+                    "date": date,
+                    "start_km": start_km,
+                    "end_km": end_km,
+                    "status": DriveLogStatus.COMPLETED.value,
+                    "job_site_id": job_site_id,
+                    "vehicle_id": input.vehicle_id,
+                    "created_at": _created_at(date, line),
+                },
+            )
+        )
+
+        if len(chunk) >= input.chunk_size:
+            flush()
+
+    if chunk:
+        flush()
+
+    result.errors.sort(key=lambda error: error.line)
+    return result
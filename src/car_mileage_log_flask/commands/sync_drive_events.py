@@ -0,0 +1,107 @@
+"""
+Sync of start and end drive events queued by a driver's browser while offline.
+
+Events are JSON objects, applied in the order sent:
+
+    {"key": "<uuid>", "type": "start", "date": "YYYY-MM-DD",
+     "start_km": 1200, "job_site_id": 3, "vehicle_id": 1}
+    {"key": "<uuid>", "type": "end", "end_km": 1250, "drive_log_id": 17}
+    {"key": "<uuid>", "type": "end", "end_km": 1250, "start_key": "<uuid>"}
+
+An end event names its drive by id, or, when the drive was started offline
+too, by the key of its start event. Keys are generated by the client; an event
+sent twice is applied once. A start event is for the vehicle selected when it
+was queued, or, without a vehicle_id, the one selected now. A malformed event
+rejects the whole batch, an event that breaks a rule in logic_rules.md is
+rejected on its own.
+"""
+
+import datetime as dt
+from dataclasses import dataclass
+from uuid import UUID
+
+from car_mileage_log_flask.db.reads import OdometerState, select_odometer_state
+from car_mileage_log_flask.db.writes import (
+    StartDriveInput,
+    SyncEndEvent,
+    SyncEventOutcome,
+    SyncStartEvent,
+    apply_sync_events,
+)
+
+
+class InvalidSyncEventError(ValueError):
+    def __init__(self, index: int, message: str) -> None:
+        self.index = index
+        super().__init__(f"Event {index}: {message}")
+
+
+@dataclass
+class SyncDriveEventsInput:
+    events: list[dict]
+    vehicle_id: int
+    driver_id: int | None = None
+
+
+@dataclass
+class SyncDriveEventsResult:
+    outcomes: list[SyncEventOutcome]
+    # odometer state of the selected vehicle and every vehicle an event touched
+    states: list[OdometerState]
+
+
+def _parse_uuid(value) -> UUID:
+    # UUID() fails on anything but a string with AttributeError
+    if not isinstance(value, str):
+        raise TypeError(f"expected a UUID string, got {value!r}")
+    return UUID(value)
+
+
+def _parse_event(raw: dict, input: SyncDriveEventsInput) -> SyncStartEvent | SyncEndEvent:
+    key = _parse_uuid(raw["key"])
+    match raw["type"]:
+        case "start":
+            vehicle_id = raw.get("vehicle_id")
+            start = StartDriveInput(
+                date=dt.date.fromisoformat(raw["date"]),
+                start_km=int(raw["start_km"]),
+                job_site_id=int(raw["job_site_id"]),
+                vehicle_id=int(vehicle_id) if vehicle_id is not None else input.vehicle_id,
+                driver_id=input.driver_id,
+            )
+            return SyncStartEvent(key=key, input=start)
+        case "end":
+            drive_log_id = raw.get("drive_log_id")
+            start_key = raw.get("start_key")
+            if (drive_log_id is None) == (start_key is None):
+                raise ValueError("an end event needs one of drive_log_id or start_key")
+            return SyncEndEvent(
+                key=key,
+                end_km=int(raw["end_km"]),
+                drive_log_id=int(drive_log_id) if drive_log_id is not None else None,
+                start_key=_parse_uuid(start_key) if start_key is not None else None,
+            )
+        case other:
+            raise ValueError(f"unknown event type {other!r}")
+
+
+def sync_drive_events_command(input: SyncDriveEventsInput) -> SyncDriveEventsResult:
+    """Raises InvalidSyncEventError, before applying anything, when an event is malformed."""
+    events = []
+    for index, raw in enumerate(input.events):
+        try:
+            events.append(_parse_event(raw, input))
+        except (KeyError, TypeError, ValueError) as e:
+            raise InvalidSyncEventError(index=index, message=str(e)) from e
+
+    outcomes = apply_sync_events(events, user_id=input.driver_id)
+
+    vehicle_ids = [input.vehicle_id]
+    for outcome in outcomes:
+        if outcome.vehicle_id is not None and outcome.vehicle_id not in vehicle_ids:
+            vehicle_ids.append(outcome.vehicle_id)
+    states = [select_odometer_state(vehicle_id=vehicle_id) for vehicle_id in vehicle_ids]
+
+    return SyncDriveEventsResult(
+        outcomes=outcomes, states=[state for state in states if state is not None]
+    )
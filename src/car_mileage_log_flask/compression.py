@@ -0,0 +1,77 @@
+"""
+Compression of rendered pages and JSON responses.
+
+HTML and JSON responses of at least COMPRESS_MIN_BYTES are compressed with
+brotli when the client accepts it and the `compression` extra is installed,
+else with gzip. The levels are the fast ones, a response is compressed on
+every request; static assets are precompressed at their best level instead,
+see assets.py.
+
+A compressed response is a different representation of the same page, so a
+strong ETag is made weak; conditional GETs still match, see http_cache.py.
+
+On unless COMPRESS_RESPONSES is false, e.g. behind a proxy that compresses.
+"""
+
+import gzip
+import os
+
+from flask import Flask, Response, request
+
+from car_mileage_log_flask.db.connection import env_flag
+
+try:
+    import brotli
+except ImportError:  # the `compression` extra
+    brotli = None
+
+MIMETYPES = {"text/html", "application/json"}
+BROTLI_QUALITY = 5
+GZIP_LEVEL = 6
+
+
+def _encoding() -> str | None:
+    if brotli is not None and request.accept_encodings["br"]:
+        return "br"
+    if request.accept_encodings["gzip"]:
+        return "gzip"
+    return None
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, GZIP_LEVEL, mtime=0)
+
+
+def _compress_response(response: Response, min_bytes: int) -> Response:
+    if (
+        response.mimetype not in MIMETYPES
+        or response.direct_passthrough
+        or response.is_streamed
+        or response.status_code in (204, 304)
+        or "Content-Encoding" in response.headers
+        or "Content-Range" in response.headers
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = _encoding()
+    data = response.get_data()
+    if encoding is None or len(data) < min_bytes:
+        return response
+
+    response.set_data(compress(data, encoding))
+    response.content_encoding = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app: Flask) -> None:
+    if not env_flag("COMPRESS_RESPONSES", True):
+        return
+
+    min_bytes = int(os.getenv("COMPRESS_MIN_BYTES", "500"))
+    app.after_request(lambda response: _compress_response(response, min_bytes))
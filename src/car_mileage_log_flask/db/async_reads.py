@@ -0,0 +1,138 @@
+"""
+Async variants of the db/reads.py functions used by the hot path views.
+
+Same SQL and the same read models as the sync functions, run on the asyncio
+engine. See asgi.py for how they are served.
+"""
+
+from sqlalchemy import text
+
+from car_mileage_log_flask.db.cache import job_site_cache
+from car_mileage_log_flask.db.connection import async_connection, async_read_connection
+from car_mileage_log_flask.db.reads import (
+    DRIVE_LOG_BY_ID_SQL,
+    DRIVE_LOGS_VERSION_SQL,
+    EARLIEST_IN_PROGRESS_SQL,
+    JOB_SITES_VERSION_SQL,
+    RECENT_JOB_SITES_SQL,
+    SEARCH_JOB_SITES_SQL,
+    START_DRIVE_CONTEXT_SQL,
+    ContentVersion,
+    DriveLog,
+    DriveLogCompleted,
+    DriveLogCursor,
+    DriveLogPage,
+    StartDriveContext,
+    completed_drive_logs_page_stmt,
+    content_version_from_row,
+    drive_log_page_from_result,
+    job_sites_stmt,
+    job_sites_tsquery,
+    start_drive_context_from_row,
+    vehicles_stmt,
+)
+from car_mileage_log_flask.db.rows import first_model_row, model_rows, one_model_row
+from car_mileage_log_flask.db.tables import job_sites_table, vehicles_table
+from car_mileage_log_flask.domain import JobSite, Vehicle
+
+# --- JOB SITES --- #
+
+
+async def select_all_job_sites() -> list[JobSite]:
+    return list(await job_site_cache.get_or_load_async("all", _select_all_job_sites))
+
+
+async def _select_all_job_sites() -> list[JobSite]:
+    async with async_connection() as conn:
+        result = await conn.execute(job_sites_stmt())
+
+    return model_rows(result, JobSite)
+
+
+async def select_job_site_by_id(id: int) -> JobSite:
+    return await job_site_cache.get_or_load_async(
+        ("id", id), lambda: _select_job_site_by_id(id)
+    )
+
+
+async def _select_job_site_by_id(id: int) -> JobSite:
+    stmt = job_sites_stmt().where(job_sites_table.c.id == id)
+    async with async_connection() as conn:
+        result = await conn.execute(stmt)
+
+    return one_model_row(result, JobSite)
+
+
+async def search_job_sites(query: str, limit: int) -> list[JobSite]:
+    tsquery = job_sites_tsquery(query)
+    sql = SEARCH_JOB_SITES_SQL if tsquery else RECENT_JOB_SITES_SQL
+    params = {"tsquery": tsquery, "job_sites_limit": limit}
+    async with async_read_connection() as conn:
+        result = await conn.execute(text(sql), params)
+
+    return model_rows(result, JobSite)
+
+
+# ---- VEHICLES ---- #
+
+
+async def select_first_vehicle() -> Vehicle | None:
+    stmt = vehicles_stmt().order_by(vehicles_table.c.id).limit(1)
+    async with async_connection() as conn:
+        result = await conn.execute(stmt)
+
+    return first_model_row(result, Vehicle)
+
+
+# ---- DRIVE LOGS ---- #
+
+
+async def select_completed_drive_logs_page(
+    limit: int, after: DriveLogCursor | None = None, vehicle_id: int | None = None
+) -> DriveLogPage:
+    stmt = completed_drive_logs_page_stmt(limit, after, vehicle_id)
+
+    async with async_read_connection() as conn:
+        result = await conn.execute(stmt)
+
+    return drive_log_page_from_result(result, limit)
+
+
+async def drive_log_select_earliest_in_progress(vehicle_id: int) -> DriveLogCompleted | None:
+    async with async_connection() as conn:
+        result = await conn.execute(text(EARLIEST_IN_PROGRESS_SQL), {"vehicle_id": vehicle_id})
+
+    return first_model_row(result, DriveLogCompleted)
+
+
+async def select_start_drive_context(
+    vehicle_id: int, job_sites_limit: int = 10
+) -> StartDriveContext:
+    params = {"vehicle_id": vehicle_id, "job_sites_limit": job_sites_limit}
+    async with async_connection() as conn:
+        result = await conn.execute(text(START_DRIVE_CONTEXT_SQL), params)
+
+    return start_drive_context_from_row(result.mappings().one())
+
+
+async def drive_log_select_by_id(id: int) -> DriveLog | None:
+    async with async_connection() as conn:
+        result = await conn.execute(text(DRIVE_LOG_BY_ID_SQL), {"id": id, "drive_log_date": None})
+
+    return first_model_row(result, DriveLog)
+
+
+# --- VERSIONS --- #
+
+
+async def select_job_sites_version() -> ContentVersion:
+    async with async_read_connection() as conn:
+        result = await conn.execute(text(JOB_SITES_VERSION_SQL))
+    return content_version_from_row(result.mappings().one())
+
+
+async def select_drive_logs_version(vehicle_id: int) -> ContentVersion:
+    params = {"vehicle_id": vehicle_id}
+    async with async_read_connection() as conn:
+        result = await conn.execute(text(DRIVE_LOGS_VERSION_SQL), params)
+    return content_version_from_row(result.mappings().one())
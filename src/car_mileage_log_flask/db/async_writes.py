@@ -0,0 +1,68 @@
+"""
+Async variants of the db/writes.py functions used by the hot path views.
+
+Same statements, rule enforcement and domain errors as the sync functions, run
+on the asyncio engine.
+"""
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from car_mileage_log_flask.db.async_reads import drive_log_select_by_id
+from car_mileage_log_flask.db.connection import async_transaction
+from car_mileage_log_flask.db.reads import DriveLog
+from car_mileage_log_flask.db.rows import one_model_row
+from car_mileage_log_flask.db.writes import (
+    END_DRIVE_SQL,
+    ODOMETER_STATE_LOCK_SQL,
+    REFRESH_ODOMETER_STATE_SQL,
+    EndDriveInput,
+    StartDriveInput,
+    end_drive_params,
+    raise_drive_log_rule_error,
+    started_drive_log_stmt,
+)
+
+
+async def _refresh_odometer_state(conn: AsyncConnection, vehicle_id: int):
+    params = {"vehicle_ids": [vehicle_id]}
+    await conn.execute(text(ODOMETER_STATE_LOCK_SQL), params)
+    await conn.execute(text(REFRESH_ODOMETER_STATE_SQL), params)
+
+
+async def start_drive(input: StartDriveInput) -> DriveLog:
+    """
+    Returns the started drive log.
+    Raises StartKmTooLowError or DriveInProgressError when a rule is broken,
+    DriveDateOutOfRangeError when its year has no partition.
+    """
+    stmt = started_drive_log_stmt(input)
+    try:
+        async with async_transaction() as conn:
+            drive_log = one_model_row(await conn.execute(stmt), DriveLog)
+            await _refresh_odometer_state(conn, input.vehicle_id)
+    except IntegrityError as e:
+        raise_drive_log_rule_error(e, start_km=input.start_km, end_km=None, date=input.date)
+    return drive_log
+
+
+async def end_drive(input: EndDriveInput) -> bool:
+    """
+    Returns False when there is no drive log with that id.
+    Raises EndKmTooLowError when end km is below the drive's start km,
+    OdometerConflictError when a drive after it starts below it.
+    """
+    try:
+        async with async_transaction() as conn:
+            result = await conn.execute(text(END_DRIVE_SQL), end_drive_params(input))
+            vehicle_id = result.scalar_one_or_none()
+            if vehicle_id is not None:
+                await _refresh_odometer_state(conn, vehicle_id)
+    except IntegrityError as e:
+        drive_log = await drive_log_select_by_id(id=input.id)
+        if drive_log is None:
+            raise
+        raise_drive_log_rule_error(e, start_km=drive_log.start_km, end_km=input.end_km)
+
+    return vehicle_id is not None
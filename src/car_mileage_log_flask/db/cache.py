@@ -0,0 +1,223 @@
+"""
+In-process cache for rarely changing reads (job sites).
+
+Entries expire after a TTL, the least recently used entry is evicted when the
+cache is full, and writes invalidate everything by bumping a generation
+counter. The counter lives in a pluggable backend so that several gunicorn
+workers can see each other's invalidations:
+
+- local: in-process counter, only this worker sees invalidations
+- file: counter in a file shared by all workers on the same machine
+- postgres: LISTEN/NOTIFY, every worker connected to the database
+"""
+
+import fcntl
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from dataclasses import dataclass
+from typing import Any, Protocol
+
+import psycopg
+from psycopg import sql
+from sqlalchemy import text
+
+from car_mileage_log_flask.db.connection import get_engine
+
+
+class GenerationBackend(Protocol):
+    def current(self) -> int: ...
+
+    def bump(self) -> None: ...
+
+
+class LocalGeneration:
+    def __init__(self) -> None:
+        self._generation = 0
+
+    def current(self) -> int:
+        return self._generation
+
+    def bump(self) -> None:
+        self._generation += 1
+
+
+class FileGeneration:
+    """Generation counter stored in a file, incremented under an exclusive lock."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def current(self) -> int:
+        try:
+            with open(self.path) as f:
+                return int(f.read() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def bump(self) -> None:
+        with open(self.path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            generation = int(f.read() or 0) + 1
+            f.seek(0)
+            f.truncate()
+            f.write(str(generation))
+
+
+class PostgresNotifyGeneration:
+    """
+    Generation counter driven by Postgres NOTIFY.
+
+    A daemon thread LISTENs on `channel` and bumps the local counter on every
+    notification from another worker; a worker's own bump is counted when it is
+    made, its notification carries the worker's token and is skipped. The listener also
+    bumps on (re)connect, since notifications sent while it was disconnected
+    are lost.
+    """
+
+    def __init__(self, channel: str = "job_sites_changed") -> None:
+        self.channel = channel
+        self._generation = 0
+        self._listener: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._token: str | None = None
+        self._token_pid: int | None = None
+
+    def _own_token(self) -> str:
+        # unique per process: pids repeat across containers and hosts, and
+        # this object is created before gunicorn forks, so a new pid gets a new one
+        pid = os.getpid()
+        if self._token_pid != pid:
+            self._token, self._token_pid = uuid.uuid4().hex, pid
+        return self._token
+
+    def current(self) -> int:
+        if self._listener is None:
+            self._start_listener()
+        return self._generation
+
+    def bump(self) -> None:
+        self._increment()
+        with get_engine().connect() as conn:
+            conn.execute(
+                text("SELECT pg_notify(:channel, :token)"),
+                {"channel": self.channel, "token": self._own_token()},
+            )
+            conn.commit()
+
+    def _increment(self) -> None:
+        # the request threads and the listener both bump
+        with self._lock:
+            self._generation += 1
+
+    def _start_listener(self) -> None:
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, daemon=True)
+                self._listener.start()
+
+    def _listen(self) -> None:
+        url = get_engine().url.set(drivername="postgresql")
+        dsn = url.render_as_string(hide_password=False)
+        while True:
+            try:
+                with psycopg.connect(dsn, autocommit=True) as conn:
+                    conn.execute(sql.SQL("LISTEN {}").format(sql.Identifier(self.channel)))
+                    self._increment()
+                    for notify in conn.notifies():
+                        if notify.payload != self._own_token():
+                            self._increment()
+            except psycopg.Error:
+                self._increment()
+                time.sleep(1)
+
+
+@dataclass
+class CacheStats:
+    hits: int
+    misses: int
+    size: int
+
+
+class TTLCache:
+    def __init__(self, ttl: float, maxsize: int, generation: GenerationBackend) -> None:
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.generation = generation
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[float, int, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    _MISS = object()
+
+    def _lookup(self, key: Hashable) -> tuple[int, float, Any]:
+        # read the generation before loading, so a write that lands while
+        # loading leaves the stored entry already stale
+        generation = self.generation.current()
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now and entry[1] == generation:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return generation, now, entry[2]
+            self.misses += 1
+        return generation, now, self._MISS
+
+    def _store(self, key: Hashable, generation: int, now: float, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (now + self.ttl, generation, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        generation, now, value = self._lookup(key)
+        if value is self._MISS:
+            value = loader()
+            self._store(key, generation, now, value)
+        return value
+
+    async def get_or_load_async(
+        self, key: Hashable, loader: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Same as `get_or_load`, for an async loader. Shares entries with it."""
+        generation, now, value = self._lookup(key)
+        if value is self._MISS:
+            value = await loader()
+            self._store(key, generation, now, value)
+        return value
+
+    def invalidate(self) -> None:
+        self.generation.bump()
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> CacheStats:
+        return CacheStats(hits=self.hits, misses=self.misses, size=len(self._entries))
+
+
+def _generation_backend_from_env() -> GenerationBackend:
+    backend = os.getenv("JOB_SITE_CACHE_BACKEND", "local")
+    if backend == "local":
+        return LocalGeneration()
+    if backend == "file":
+        default_path = os.path.join(tempfile.gettempdir(), "car_mileage_log_job_sites.gen")
+        return FileGeneration(os.getenv("JOB_SITE_CACHE_FILE", default_path))
+    if backend == "postgres":
+        return PostgresNotifyGeneration()
+    raise ValueError(f"Unknown JOB_SITE_CACHE_BACKEND: {backend}")
+
+
+job_site_cache = TTLCache(
+    ttl=float(os.getenv("JOB_SITE_CACHE_TTL", "300")),
+    maxsize=int(os.getenv("JOB_SITE_CACHE_MAXSIZE", "1024")),
+    generation=_generation_backend_from_env(),
+)
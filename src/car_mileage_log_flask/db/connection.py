@@ -1,18 +1,315 @@
 import os
+import time
+from collections.abc import AsyncIterator, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from functools import cache
+from typing import TYPE_CHECKING
 
-import records
-from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from flask import Flask, g, has_app_context, has_request_context, session
+from sqlalchemy import Connection, Engine, create_engine, make_url, text
+from sqlalchemy.orm import Session as OrmSession
 from sqlalchemy.orm import sessionmaker
 
-load_dotenv(override=True)
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
 
-db_url = os.getenv("DATABASE_URL")
-assert db_url, "DATABASE_URL is not set"
 
-engine = create_engine(db_url, echo=True)
+def env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.lower() in ("1", "true", "yes", "on")
 
-db = records.Database(engine.url)
 
-Session = sessionmaker(bind=engine)
-session = Session()
+@cache
+def _engine_options() -> dict:
+    return {
+        "echo": env_flag("DB_ECHO", False),
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "5")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": env_flag("DB_POOL_PRE_PING", True),
+    }
+
+
+def _database_url() -> str:
+    db_url = os.getenv("DATABASE_URL")
+    assert db_url, "DATABASE_URL is not set"
+    return db_url
+
+
+def replica_url() -> str | None:
+    """The read replica's URL, None when reads all go to the primary."""
+    return os.getenv("DATABASE_REPLICA_URL") or None
+
+
+@cache
+def get_engine() -> Engine:
+    """
+    The application engine, created on first use.
+
+    Nothing connects to the database at import time, so workers boot without
+    waiting on it.
+    """
+    return create_engine(_database_url(), **_engine_options())
+
+
+@cache
+def get_async_engine() -> "AsyncEngine":
+    """
+    The asyncio engine used by db/async_reads.py and db/async_writes.py.
+
+    Same database and pool settings as `get_engine`, always through psycopg 3.
+    Needs the `async` extra (SQLAlchemy's asyncio support needs greenlet).
+    The pool belongs to the event loop that first uses it: serve async views
+    through asgi.py, which runs all of them on the server's loop.
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = make_url(_database_url()).set(drivername="postgresql+psycopg")
+    return create_async_engine(url, **_engine_options())
+
+
+@cache
+def get_replica_engine() -> Engine:
+    """The read replica's engine, see `get_read_connection`. Same pool settings as `get_engine`."""
+    return create_engine(replica_url(), **_engine_options())
+
+
+@cache
+def get_async_replica_engine() -> "AsyncEngine":
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = make_url(replica_url()).set(drivername="postgresql+psycopg")
+    return create_async_engine(url, **_engine_options())
+
+
+# bind when opening: Session(bind=get_engine()), or use get_session()
+Session = sessionmaker()
+
+
+@contextmanager
+def get_connection() -> Iterator[Connection]:
+    """
+    Connection for reads and writes.
+
+    Inside a Flask app context every call shares one connection, checked out
+    from the pool on first use and returned on teardown. Outside of it
+    (scripts, notebooks) each call checks out its own connection.
+    """
+    if not has_app_context():
+        with get_engine().connect() as conn:
+            yield conn
+        return
+
+    conn = g.get("db_connection")
+    if conn is None:
+        start = time.perf_counter()
+        conn = g.db_connection = get_engine().connect()
+        # reported by metrics.py as pool checkout wait
+        g.db_pool_wait = time.perf_counter() - start
+    yield conn
+
+
+@contextmanager
+def transaction() -> Iterator[Connection]:
+    """
+    Commit the block when it succeeds, roll it back when it raises.
+
+    Nested blocks join the outermost one, which commits once at the end.
+    """
+    with get_connection() as conn:
+        if conn.info.get("in_transaction_block"):
+            yield conn
+            return
+
+        conn.info["in_transaction_block"] = True
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.info.pop("in_transaction_block", None)
+        if _remembers_writes():
+            # after the commit, so the LSN covers the commit record; the query
+            # begins a transaction of its own, ended at once so the shared
+            # connection is not left idle in transaction
+            lsn = conn.execute(text(CURRENT_LSN_SQL)).scalar_one()
+            conn.commit()
+            _remember_write(lsn)
+
+
+@contextmanager
+def get_session() -> Iterator[OrmSession]:
+    """
+    ORM session for the block, on the connection of `get_connection`.
+
+    Short lived on purpose: open one per query function, load what the caller
+    needs eagerly and return read models, not ORM objects.
+    """
+    with get_connection() as conn, Session(bind=conn) as session:
+        yield session
+
+
+@asynccontextmanager
+async def async_connection() -> AsyncIterator["AsyncConnection"]:
+    """
+    Async connection for reads, checked out for the block.
+
+    Not shared through `g`: concurrent awaits in one request would otherwise
+    use the same connection at once.
+    """
+    async with get_async_engine().connect() as conn:
+        yield conn
+
+
+@asynccontextmanager
+async def async_transaction() -> AsyncIterator["AsyncConnection"]:
+    """Commit the block when it succeeds, roll it back when it raises."""
+    async with get_async_engine().connect() as conn:
+        async with conn.begin():
+            yield conn
+        if _remembers_writes():
+            _remember_write(await conn.scalar(text(CURRENT_LSN_SQL)))
+
+
+# --- READ REPLICA --- #
+
+# Heavy reads (listings, exports, reports, analytics) go to the replica at
+# DATABASE_REPLICA_URL when set, through get_read_connection(). Writes, and
+# reads that must see them (start and end drive, edits), stay on the primary
+# through get_connection().
+#
+# Read your writes: after each write transaction of a request, the primary's
+# WAL position (LSN) and the time are kept in the session. The next request
+# reading from the replica first checks whether the replica has replayed up
+# to that LSN, and reads from the primary until it has. A replica that does
+# not replay WAL (logical replication, or the primary itself as a local stub)
+# has no replay LSN: reads wait DB_REPLICA_MAX_LAG seconds after the write.
+#
+# One decision per request, so a page's version and its content come from the
+# same database, see http_cache.py.
+
+WRITE_SESSION_KEY = "db_write"
+CURRENT_LSN_SQL = "SELECT pg_current_wal_lsn()::text"
+REPLAYED_SQL = "SELECT pg_last_wal_replay_lsn() >= CAST(:lsn AS pg_lsn)"
+
+
+def _remembers_writes() -> bool:
+    return replica_url() is not None and has_request_context()
+
+
+def _remember_write(lsn: str) -> None:
+    session[WRITE_SESSION_KEY] = [lsn, time.time()]
+    # decided before the write, the rest of the request decides again
+    g.pop("db_reads_from_replica", None)
+
+
+def _caught_up(replayed: bool | None, written_at: float) -> bool:
+    if replayed is None:
+        return time.time() - written_at >= float(os.getenv("DB_REPLICA_MAX_LAG", "5"))
+    return replayed
+
+
+def _settle(reads_from_replica: bool) -> bool:
+    # the replica caught up for good, later requests skip the check
+    if reads_from_replica:
+        session.pop(WRITE_SESSION_KEY, None)
+    g.db_reads_from_replica = reads_from_replica
+    return reads_from_replica
+
+
+def _replica_connection() -> Connection:
+    conn = g.get("db_replica_connection")
+    if conn is None:
+        conn = g.db_replica_connection = get_replica_engine().connect()
+    return conn
+
+
+def _reads_from_replica() -> bool:
+    if not has_request_context():
+        return True
+    if "db_reads_from_replica" in g:
+        return g.db_reads_from_replica
+
+    write = session.get(WRITE_SESSION_KEY)
+    if write is None:
+        return _settle(True)
+    lsn, written_at = write
+    replayed = _replica_connection().execute(text(REPLAYED_SQL), {"lsn": lsn}).scalar()
+    return _settle(_caught_up(replayed, written_at))
+
+
+@contextmanager
+def get_read_connection() -> Iterator[Connection]:
+    """
+    Connection for heavy reads: the replica's, or the primary's when there is
+    no replica or it has not replayed this session's last write yet.
+
+    Shared in an app context like `get_connection`'s.
+    """
+    if replica_url() is None or not _reads_from_replica():
+        with get_connection() as conn:
+            yield conn
+        return
+
+    if not has_app_context():
+        with get_replica_engine().connect() as conn:
+            yield conn
+        return
+
+    yield _replica_connection()
+
+
+@contextmanager
+def get_read_session() -> Iterator[OrmSession]:
+    """ORM session like `get_session`'s, on the connection of `get_read_connection`."""
+    with get_read_connection() as conn, Session(bind=conn) as session:
+        yield session
+
+
+def get_read_engine() -> Engine:
+    """The engine of `get_read_connection`, for reads that keep their own connection."""
+    if replica_url() is None or not _reads_from_replica():
+        return get_engine()
+    return get_replica_engine()
+
+
+async def _async_reads_from_replica() -> bool:
+    if not has_request_context():
+        return True
+    if "db_reads_from_replica" in g:
+        return g.db_reads_from_replica
+
+    write = session.get(WRITE_SESSION_KEY)
+    if write is None:
+        return _settle(True)
+    lsn, written_at = write
+    async with get_async_replica_engine().connect() as conn:
+        replayed = await conn.scalar(text(REPLAYED_SQL), {"lsn": lsn})
+    return _settle(_caught_up(replayed, written_at))
+
+
+@asynccontextmanager
+async def async_read_connection() -> AsyncIterator["AsyncConnection"]:
+    """Async connection for heavy reads, routed like `get_read_connection`."""
+    if replica_url() is None or not await _async_reads_from_replica():
+        engine = get_async_engine()
+    else:
+        engine = get_async_replica_engine()
+    async with engine.connect() as conn:
+        yield conn
+
+
+def close_connection(exception: BaseException | None = None) -> None:
+    for name in ("db_connection", "db_replica_connection"):
+        conn = g.pop(name, None)
+        if conn is not None:
+            conn.close()
+
+
+def init_app(app: Flask) -> None:
+    app.teardown_appcontext(close_connection)
@@ -0,0 +1,31 @@
+-- +goose Up
+CREATE TABLE IF NOT EXISTS drive_log_jobsite (
+    id bigint GENERATED BY DEFAULT AS IDENTITY,
+    created_at timestamp with time zone NOT NULL,
+    updated_at timestamp with time zone NOT NULL,
+    name varchar(255) NOT NULL,
+    address varchar(255) NOT NULL,
+    CONSTRAINT drive_log_jobsite_pkey PRIMARY KEY (id)
+);
+
+CREATE TABLE IF NOT EXISTS drive_log_drivelog (
+    id bigint GENERATED BY DEFAULT AS IDENTITY,
+    created_at timestamp with time zone NOT NULL,
+    updated_at timestamp with time zone NOT NULL,
+    date date NOT NULL,
+    start_km integer NOT NULL,
+    status varchar(20) NOT NULL,
+    job_site_id bigint NOT NULL,
+    end_km integer,
+    CONSTRAINT drive_log_drivelog_pkey PRIMARY KEY (id),
+    CONSTRAINT drive_log_drivelog_job_site_id_41254f97_fk_drive_log_jobsite_id
+        FOREIGN KEY (job_site_id) REFERENCES drive_log_jobsite (id)
+        DEFERRABLE INITIALLY DEFERRED
+);
+
+CREATE INDEX IF NOT EXISTS drive_log_drivelog_job_site_id_41254f97
+    ON drive_log_drivelog (job_site_id);
+
+-- +goose Down
+DROP TABLE IF EXISTS drive_log_drivelog;
+DROP TABLE IF EXISTS drive_log_jobsite;
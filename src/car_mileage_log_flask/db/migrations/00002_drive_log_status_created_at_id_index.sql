@@ -0,0 +1,7 @@
+-- +goose NO TRANSACTION
+-- +goose Up
+CREATE INDEX CONCURRENTLY IF NOT EXISTS drive_log_drivelog_status_created_at_id
+    ON drive_log_drivelog (status, created_at, id);
+
+-- +goose Down
+DROP INDEX CONCURRENTLY IF EXISTS drive_log_drivelog_status_created_at_id;
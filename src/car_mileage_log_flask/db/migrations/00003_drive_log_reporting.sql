@@ -0,0 +1,22 @@
+-- +goose NO TRANSACTION
+-- +goose Up
+CREATE INDEX CONCURRENTLY IF NOT EXISTS drive_log_drivelog_status_date
+    ON drive_log_drivelog (status, date);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS drive_log_daily_rollup AS
+SELECT
+    date,
+    job_site_id,
+    count(*) AS trips,
+    sum(end_km - start_km) AS km
+FROM drive_log_drivelog
+WHERE status = 'completed'
+GROUP BY date, job_site_id;
+
+-- unique index is required by REFRESH MATERIALIZED VIEW CONCURRENTLY
+CREATE UNIQUE INDEX IF NOT EXISTS drive_log_daily_rollup_date_job_site_id
+    ON drive_log_daily_rollup (date, job_site_id);
+
+-- +goose Down
+DROP MATERIALIZED VIEW IF EXISTS drive_log_daily_rollup;
+DROP INDEX CONCURRENTLY IF EXISTS drive_log_drivelog_status_date;
@@ -0,0 +1,75 @@
+-- Rules from logic_rules.md, enforced by the database.
+-- Constraint names are matched in db/writes.py to raise the domain errors.
+
+-- +goose Up
+CREATE INDEX IF NOT EXISTS drive_log_drivelog_created_at
+    ON drive_log_drivelog (created_at);
+
+-- 1. Start km cannot be less than previous drive end km
+-- +goose StatementBegin
+CREATE OR REPLACE FUNCTION drive_log_drivelog_check_start_km() RETURNS trigger AS $$
+DECLARE
+    previous_end_km integer;
+BEGIN
+    -- one writer at a time, so concurrent drives cannot both pass the check
+    PERFORM pg_advisory_xact_lock(hashtext('drive_log_drivelog_start_km'));
+
+    SELECT end_km INTO previous_end_km
+    FROM drive_log_drivelog
+    WHERE created_at < NEW.created_at AND id <> NEW.id
+    ORDER BY created_at DESC
+    LIMIT 1;
+
+    IF previous_end_km IS NOT NULL AND NEW.start_km < previous_end_km THEN
+        RAISE EXCEPTION 'Start km (%) cannot be lower than previous End km (%)',
+                NEW.start_km, previous_end_km
+            USING ERRCODE = 'check_violation',
+                  CONSTRAINT = 'drive_log_drivelog_start_km_not_below_previous_end_km',
+                  DETAIL = previous_end_km::text;
+    END IF;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+-- +goose StatementEnd
+
+CREATE TRIGGER drive_log_drivelog_check_start_km
+    BEFORE INSERT OR UPDATE OF start_km, created_at ON drive_log_drivelog
+    FOR EACH ROW EXECUTE FUNCTION drive_log_drivelog_check_start_km();
+
+-- 2. End km cannot be less than same drive start km
+-- NOT VALID: enforced for new and updated rows, existing history is not rechecked
+ALTER TABLE drive_log_drivelog
+    ADD CONSTRAINT drive_log_drivelog_end_km_not_below_start_km
+    CHECK (end_km IS NULL OR end_km >= start_km) NOT VALID;
+
+-- 3. Cannot be more than one drive in progress
+-- history from before this rule may break it; stop here rather than fail on the
+-- index, which drive to end is for the user to decide
+-- +goose StatementBegin
+DO $$
+DECLARE
+    in_progress bigint[];
+BEGIN
+    SELECT array_agg(id ORDER BY created_at) INTO in_progress
+    FROM drive_log_drivelog
+    WHERE status = 'in_progress';
+
+    IF cardinality(in_progress) > 1 THEN
+        RAISE EXCEPTION 'Drive logs % are in progress, only one drive can be', in_progress
+            USING HINT = 'End or delete all but one of them, then run the migrations again';
+    END IF;
+END;
+$$;
+-- +goose StatementEnd
+
+CREATE UNIQUE INDEX IF NOT EXISTS drive_log_drivelog_one_in_progress
+    ON drive_log_drivelog ((true))
+    WHERE status = 'in_progress';
+
+-- +goose Down
+DROP INDEX IF EXISTS drive_log_drivelog_one_in_progress;
+ALTER TABLE drive_log_drivelog DROP CONSTRAINT IF EXISTS drive_log_drivelog_end_km_not_below_start_km;
+DROP TRIGGER IF EXISTS drive_log_drivelog_check_start_km ON drive_log_drivelog;
+DROP FUNCTION IF EXISTS drive_log_drivelog_check_start_km();
+DROP INDEX IF EXISTS drive_log_drivelog_created_at;
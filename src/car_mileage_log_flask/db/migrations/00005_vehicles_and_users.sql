@@ -0,0 +1,139 @@
+-- Vehicles and drivers. The rules from logic_rules.md now apply per vehicle.
+-- Existing drive logs are assigned to one vehicle created here.
+
+-- +goose Up
+CREATE TABLE IF NOT EXISTS drive_log_vehicle (
+    id bigint GENERATED BY DEFAULT AS IDENTITY,
+    created_at timestamp with time zone NOT NULL,
+    updated_at timestamp with time zone NOT NULL,
+    name varchar(255) NOT NULL,
+    plate varchar(20) NOT NULL,
+    CONSTRAINT drive_log_vehicle_pkey PRIMARY KEY (id),
+    CONSTRAINT drive_log_vehicle_plate_key UNIQUE (plate)
+);
+
+CREATE TABLE IF NOT EXISTS drive_log_user (
+    id bigint GENERATED BY DEFAULT AS IDENTITY,
+    created_at timestamp with time zone NOT NULL,
+    updated_at timestamp with time zone NOT NULL,
+    username varchar(150) NOT NULL,
+    password_hash varchar(255) NOT NULL,
+    CONSTRAINT drive_log_user_pkey PRIMARY KEY (id),
+    CONSTRAINT drive_log_user_username_key UNIQUE (username)
+);
+
+INSERT INTO drive_log_vehicle (created_at, updated_at, name, plate)
+SELECT now(), now(), 'Car', 'CAR'
+WHERE EXISTS (SELECT 1 FROM drive_log_drivelog);
+
+ALTER TABLE drive_log_drivelog
+    ADD COLUMN vehicle_id bigint,
+    ADD COLUMN driver_id bigint;
+
+UPDATE drive_log_drivelog
+SET vehicle_id = (SELECT min(id) FROM drive_log_vehicle);
+
+ALTER TABLE drive_log_drivelog
+    ALTER COLUMN vehicle_id SET NOT NULL,
+    ADD CONSTRAINT drive_log_drivelog_vehicle_id_fk_drive_log_vehicle_id
+        FOREIGN KEY (vehicle_id) REFERENCES drive_log_vehicle (id)
+        DEFERRABLE INITIALLY DEFERRED,
+    ADD CONSTRAINT drive_log_drivelog_driver_id_fk_drive_log_user_id
+        FOREIGN KEY (driver_id) REFERENCES drive_log_user (id)
+        ON DELETE SET NULL
+        DEFERRABLE INITIALLY DEFERRED;
+
+-- per vehicle lookups: last drive, previous drive (trigger), drive log pages
+CREATE INDEX IF NOT EXISTS drive_log_drivelog_vehicle_created_at
+    ON drive_log_drivelog (vehicle_id, created_at);
+CREATE INDEX IF NOT EXISTS drive_log_drivelog_vehicle_status_created_at_id
+    ON drive_log_drivelog (vehicle_id, status, created_at, id);
+CREATE INDEX IF NOT EXISTS drive_log_drivelog_driver_id
+    ON drive_log_drivelog (driver_id);
+
+-- 1. Start km cannot be less than the vehicle's previous drive end km
+-- +goose StatementBegin
+CREATE OR REPLACE FUNCTION drive_log_drivelog_check_start_km() RETURNS trigger AS $$
+DECLARE
+    previous_end_km integer;
+BEGIN
+    -- one writer per vehicle at a time, so concurrent drives cannot both pass the check
+    PERFORM pg_advisory_xact_lock(
+        hashtext('drive_log_drivelog_start_km'), hashtext(NEW.vehicle_id::text)
+    );
+
+    SELECT end_km INTO previous_end_km
+    FROM drive_log_drivelog
+    WHERE vehicle_id = NEW.vehicle_id AND created_at < NEW.created_at AND id <> NEW.id
+    ORDER BY created_at DESC
+    LIMIT 1;
+
+    IF previous_end_km IS NOT NULL AND NEW.start_km < previous_end_km THEN
+        RAISE EXCEPTION 'Start km (%) cannot be lower than previous End km (%)',
+                NEW.start_km, previous_end_km
+            USING ERRCODE = 'check_violation',
+                  CONSTRAINT = 'drive_log_drivelog_start_km_not_below_previous_end_km',
+                  DETAIL = previous_end_km::text;
+    END IF;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+-- +goose StatementEnd
+
+DROP TRIGGER IF EXISTS drive_log_drivelog_check_start_km ON drive_log_drivelog;
+CREATE TRIGGER drive_log_drivelog_check_start_km
+    BEFORE INSERT OR UPDATE OF start_km, created_at, vehicle_id ON drive_log_drivelog
+    FOR EACH ROW EXECUTE FUNCTION drive_log_drivelog_check_start_km();
+
+-- 3. Cannot be more than one drive in progress per vehicle
+DROP INDEX IF EXISTS drive_log_drivelog_one_in_progress;
+CREATE UNIQUE INDEX IF NOT EXISTS drive_log_drivelog_one_in_progress_per_vehicle
+    ON drive_log_drivelog (vehicle_id)
+    WHERE status = 'in_progress';
+
+-- +goose Down
+DROP INDEX IF EXISTS drive_log_drivelog_one_in_progress_per_vehicle;
+CREATE UNIQUE INDEX IF NOT EXISTS drive_log_drivelog_one_in_progress
+    ON drive_log_drivelog ((true))
+    WHERE status = 'in_progress';
+
+-- +goose StatementBegin
+CREATE OR REPLACE FUNCTION drive_log_drivelog_check_start_km() RETURNS trigger AS $$
+DECLARE
+    previous_end_km integer;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('drive_log_drivelog_start_km'));
+
+    SELECT end_km INTO previous_end_km
+    FROM drive_log_drivelog
+    WHERE created_at < NEW.created_at AND id <> NEW.id
+    ORDER BY created_at DESC
+    LIMIT 1;
+
+    IF previous_end_km IS NOT NULL AND NEW.start_km < previous_end_km THEN
+        RAISE EXCEPTION 'Start km (%) cannot be lower than previous End km (%)',
+                NEW.start_km, previous_end_km
+            USING ERRCODE = 'check_violation',
+                  CONSTRAINT = 'drive_log_drivelog_start_km_not_below_previous_end_km',
+                  DETAIL = previous_end_km::text;
+    END IF;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+-- +goose StatementEnd
+
+DROP TRIGGER IF EXISTS drive_log_drivelog_check_start_km ON drive_log_drivelog;
+CREATE TRIGGER drive_log_drivelog_check_start_km
+    BEFORE INSERT OR UPDATE OF start_km, created_at ON drive_log_drivelog
+    FOR EACH ROW EXECUTE FUNCTION drive_log_drivelog_check_start_km();
+
+DROP INDEX IF EXISTS drive_log_drivelog_driver_id;
+DROP INDEX IF EXISTS drive_log_drivelog_vehicle_status_created_at_id;
+DROP INDEX IF EXISTS drive_log_drivelog_vehicle_created_at;
+ALTER TABLE drive_log_drivelog
+    DROP COLUMN IF EXISTS driver_id,
+    DROP COLUMN IF EXISTS vehicle_id;
+DROP TABLE IF EXISTS drive_log_user;
+DROP TABLE IF EXISTS drive_log_vehicle;
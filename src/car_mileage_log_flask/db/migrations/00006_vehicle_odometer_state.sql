@@ -0,0 +1,44 @@
+-- Current odometer state per vehicle, kept up to date by db/writes.py in the
+-- same transaction as every drive log write. Rebuilt from history here and by
+-- `flask rebuild-odometer-state`.
+
+-- +goose Up
+CREATE TABLE IF NOT EXISTS drive_log_vehicle_state (
+    vehicle_id bigint NOT NULL,
+    updated_at timestamp with time zone NOT NULL,
+    drive_in_progress_id bigint,
+    last_drive_id bigint,
+    last_end_km integer,
+    last_job_site_id bigint,
+    CONSTRAINT drive_log_vehicle_state_pkey PRIMARY KEY (vehicle_id),
+    CONSTRAINT drive_log_vehicle_state_vehicle_id_fk_drive_log_vehicle_id
+        FOREIGN KEY (vehicle_id) REFERENCES drive_log_vehicle (id)
+        ON DELETE CASCADE
+);
+
+INSERT INTO drive_log_vehicle_state
+    (vehicle_id, updated_at, drive_in_progress_id, last_drive_id, last_end_km, last_job_site_id)
+SELECT v.id, now(), in_progress.id, last_drive.id, last_completed.end_km, last_drive.job_site_id
+FROM drive_log_vehicle v
+LEFT JOIN LATERAL (
+    SELECT id FROM drive_log_drivelog
+    WHERE vehicle_id = v.id AND status = 'in_progress'
+    ORDER BY created_at
+    LIMIT 1
+) in_progress ON true
+LEFT JOIN LATERAL (
+    SELECT id, job_site_id FROM drive_log_drivelog
+    WHERE vehicle_id = v.id
+    ORDER BY created_at DESC
+    LIMIT 1
+) last_drive ON true
+LEFT JOIN LATERAL (
+    SELECT end_km FROM drive_log_drivelog
+    WHERE vehicle_id = v.id AND status = 'completed'
+    ORDER BY created_at DESC
+    LIMIT 1
+) last_completed ON true
+ON CONFLICT (vehicle_id) DO NOTHING;
+
+-- +goose Down
+DROP TABLE IF EXISTS drive_log_vehicle_state;
@@ -0,0 +1,9 @@
+-- Job site search (/job-sites/search): full-text prefix matching on name and
+-- address. Full-text search is built in, no extension needed.
+
+-- +goose Up
+CREATE INDEX IF NOT EXISTS drive_log_jobsite_search
+    ON drive_log_jobsite USING gin (to_tsvector('simple', name || ' ' || address));
+
+-- +goose Down
+DROP INDEX IF EXISTS drive_log_jobsite_search;
@@ -0,0 +1,23 @@
+-- Start and end drive events received through POST /sync, by the key the
+-- client generated. A resent event is answered with its recorded outcome
+-- instead of being applied twice.
+
+-- +goose Up
+CREATE TABLE IF NOT EXISTS drive_log_sync_event (
+    key uuid NOT NULL,
+    created_at timestamp with time zone NOT NULL,
+    kind varchar(10) NOT NULL,
+    user_id bigint,
+    drive_log_id bigint,
+    error text,
+    CONSTRAINT drive_log_sync_event_pkey PRIMARY KEY (key),
+    CONSTRAINT drive_log_sync_event_drive_log_id_fk_drive_log_drivelog_id
+        FOREIGN KEY (drive_log_id) REFERENCES drive_log_drivelog (id)
+        ON DELETE SET NULL,
+    CONSTRAINT drive_log_sync_event_user_id_fk_drive_log_user_id
+        FOREIGN KEY (user_id) REFERENCES drive_log_user (id)
+        ON DELETE SET NULL
+);
+
+-- +goose Down
+DROP TABLE IF EXISTS drive_log_sync_event;
@@ -0,0 +1,261 @@
+-- Drive logs partitioned by year of their date, drive_log_drivelog_y<year>.
+-- Partitions are created ahead by `flask create-drive-log-partitions` through
+-- drive_log_drivelog_create_partition(); a drive dated in a year without one
+-- is refused. Closed years can be archived to Parquet and their partition
+-- dropped, see db/partitions.py.
+--
+-- Unique constraints of a partitioned table must include the partition key:
+-- - the primary key is (id, date), ids stay unique through the identity
+-- - one drive in progress per vehicle is checked by a trigger, under the
+--   vehicle's lock of the start km trigger, raising the same constraint name
+-- - drive_log_sync_event.drive_log_id loses its foreign key, db/writes.py
+--   clears it when a drive log is deleted
+--
+-- The odometer state keeps the date of the drives it points to, so the start
+-- and end drive screens read them from one partition.
+
+-- +goose Up
+DROP MATERIALIZED VIEW IF EXISTS drive_log_daily_rollup;
+ALTER TABLE drive_log_sync_event
+    DROP CONSTRAINT IF EXISTS drive_log_sync_event_drive_log_id_fk_drive_log_drivelog_id;
+
+ALTER TABLE drive_log_drivelog RENAME TO drive_log_drivelog_unpartitioned;
+
+CREATE TABLE drive_log_drivelog (
+    id bigint GENERATED BY DEFAULT AS IDENTITY,
+    created_at timestamp with time zone NOT NULL,
+    updated_at timestamp with time zone NOT NULL,
+    date date NOT NULL,
+    start_km integer NOT NULL,
+    status varchar(20) NOT NULL,
+    job_site_id bigint NOT NULL,
+    end_km integer,
+    vehicle_id bigint NOT NULL,
+    driver_id bigint
+) PARTITION BY RANGE (date);
+
+-- +goose StatementBegin
+CREATE OR REPLACE FUNCTION drive_log_drivelog_create_partition(year integer) RETURNS text AS $$
+DECLARE
+    partition text := format('drive_log_drivelog_y%s', year);
+BEGIN
+    IF to_regclass(partition) IS NULL THEN
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF drive_log_drivelog FOR VALUES FROM (%L) TO (%L)',
+            partition, make_date(year, 1, 1), make_date(year + 1, 1, 1)
+        );
+    END IF;
+    RETURN partition;
+END;
+$$ LANGUAGE plpgsql;
+-- +goose StatementEnd
+
+-- every year with drives, through next year
+SELECT drive_log_drivelog_create_partition(year::integer)
+FROM generate_series(
+    (SELECT least(min(extract(year FROM date)), extract(year FROM current_date))
+     FROM drive_log_drivelog_unpartitioned),
+    extract(year FROM current_date) + 1
+) AS year;
+
+INSERT INTO drive_log_drivelog (
+    id, created_at, updated_at, date, start_km, status, job_site_id, end_km, vehicle_id, driver_id
+)
+SELECT id, created_at, updated_at, date, start_km, status, job_site_id, end_km, vehicle_id, driver_id
+FROM drive_log_drivelog_unpartitioned;
+
+SELECT setval(
+    pg_get_serial_sequence('drive_log_drivelog', 'id'),
+    (SELECT coalesce(max(id), 0) + 1 FROM drive_log_drivelog),
+    false
+);
+
+DROP TABLE drive_log_drivelog_unpartitioned;
+ALTER SEQUENCE drive_log_drivelog_id_seq1 RENAME TO drive_log_drivelog_id_seq;
+
+ALTER TABLE drive_log_drivelog
+    ADD CONSTRAINT drive_log_drivelog_pkey PRIMARY KEY (id, date),
+    ADD CONSTRAINT drive_log_drivelog_job_site_id_41254f97_fk_drive_log_jobsite_id
+        FOREIGN KEY (job_site_id) REFERENCES drive_log_jobsite (id)
+        DEFERRABLE INITIALLY DEFERRED,
+    ADD CONSTRAINT drive_log_drivelog_vehicle_id_fk_drive_log_vehicle_id
+        FOREIGN KEY (vehicle_id) REFERENCES drive_log_vehicle (id)
+        DEFERRABLE INITIALLY DEFERRED,
+    ADD CONSTRAINT drive_log_drivelog_driver_id_fk_drive_log_user_id
+        FOREIGN KEY (driver_id) REFERENCES drive_log_user (id)
+        ON DELETE SET NULL
+        DEFERRABLE INITIALLY DEFERRED;
+
+-- NOT VALID: as in migration 00004, existing history is not rechecked
+ALTER TABLE drive_log_drivelog
+    ADD CONSTRAINT drive_log_drivelog_end_km_not_below_start_km
+    CHECK (end_km IS NULL OR end_km >= start_km) NOT VALID;
+
+CREATE INDEX drive_log_drivelog_job_site_id_41254f97
+    ON drive_log_drivelog (job_site_id);
+CREATE INDEX drive_log_drivelog_driver_id
+    ON drive_log_drivelog (driver_id);
+-- the latest drives, for the job sites driven to lately
+CREATE INDEX drive_log_drivelog_date_created_at
+    ON drive_log_drivelog (date, created_at);
+-- previous and next drive of a vehicle: start km trigger, odometer state, edits
+CREATE INDEX drive_log_drivelog_vehicle_created_at
+    ON drive_log_drivelog (vehicle_id, created_at);
+-- drive log pages, newest date first: partitions are read in order, the
+-- first page from the current year's alone; reports by date range
+CREATE INDEX drive_log_drivelog_status_date_created_at_id
+    ON drive_log_drivelog (status, date, created_at, id);
+CREATE INDEX drive_log_drivelog_vehicle_status_date_created_at_id
+    ON drive_log_drivelog (vehicle_id, status, date, created_at, id);
+CREATE INDEX drive_log_drivelog_in_progress
+    ON drive_log_drivelog (vehicle_id)
+    WHERE status = 'in_progress';
+
+-- 1. Start km cannot be less than the vehicle's previous drive end km, the
+-- function of migration 00005
+CREATE TRIGGER drive_log_drivelog_check_start_km
+    BEFORE INSERT OR UPDATE OF start_km, created_at, vehicle_id ON drive_log_drivelog
+    FOR EACH ROW EXECUTE FUNCTION drive_log_drivelog_check_start_km();
+
+-- 3. Cannot be more than one drive in progress per vehicle
+-- +goose StatementBegin
+CREATE OR REPLACE FUNCTION drive_log_drivelog_check_one_in_progress() RETURNS trigger AS $$
+BEGIN
+    -- the start km trigger's lock, so concurrent drives cannot both pass the check
+    PERFORM pg_advisory_xact_lock(
+        hashtext('drive_log_drivelog_start_km'), hashtext(NEW.vehicle_id::text)
+    );
+
+    IF EXISTS (
+        SELECT 1 FROM drive_log_drivelog
+        WHERE vehicle_id = NEW.vehicle_id AND status = 'in_progress' AND id <> NEW.id
+    ) THEN
+        RAISE EXCEPTION 'Cannot be more than one drive in progress per vehicle'
+            USING ERRCODE = 'unique_violation',
+                  CONSTRAINT = 'drive_log_drivelog_one_in_progress_per_vehicle';
+    END IF;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+-- +goose StatementEnd
+
+CREATE TRIGGER drive_log_drivelog_check_one_in_progress
+    BEFORE INSERT OR UPDATE OF status, vehicle_id ON drive_log_drivelog
+    FOR EACH ROW
+    WHEN (NEW.status = 'in_progress')
+    EXECUTE FUNCTION drive_log_drivelog_check_one_in_progress();
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS drive_log_daily_rollup AS
+SELECT
+    date,
+    job_site_id,
+    count(*) AS trips,
+    sum(end_km - start_km) AS km
+FROM drive_log_drivelog
+WHERE status = 'completed'
+GROUP BY date, job_site_id;
+
+-- unique index is required by REFRESH MATERIALIZED VIEW CONCURRENTLY
+CREATE UNIQUE INDEX IF NOT EXISTS drive_log_daily_rollup_date_job_site_id
+    ON drive_log_daily_rollup (date, job_site_id);
+
+ALTER TABLE drive_log_vehicle_state
+    ADD COLUMN drive_in_progress_date date,
+    ADD COLUMN last_drive_date date;
+
+UPDATE drive_log_vehicle_state s
+SET drive_in_progress_date = (SELECT date FROM drive_log_drivelog WHERE id = s.drive_in_progress_id),
+    last_drive_date = (SELECT date FROM drive_log_drivelog WHERE id = s.last_drive_id);
+
+-- +goose Down
+ALTER TABLE drive_log_vehicle_state
+    DROP COLUMN IF EXISTS drive_in_progress_date,
+    DROP COLUMN IF EXISTS last_drive_date;
+
+DROP MATERIALIZED VIEW IF EXISTS drive_log_daily_rollup;
+
+ALTER TABLE drive_log_drivelog RENAME TO drive_log_drivelog_partitioned;
+
+CREATE TABLE drive_log_drivelog (
+    id bigint GENERATED BY DEFAULT AS IDENTITY,
+    created_at timestamp with time zone NOT NULL,
+    updated_at timestamp with time zone NOT NULL,
+    date date NOT NULL,
+    start_km integer NOT NULL,
+    status varchar(20) NOT NULL,
+    job_site_id bigint NOT NULL,
+    end_km integer,
+    vehicle_id bigint NOT NULL,
+    driver_id bigint
+);
+
+INSERT INTO drive_log_drivelog (
+    id, created_at, updated_at, date, start_km, status, job_site_id, end_km, vehicle_id, driver_id
+)
+SELECT id, created_at, updated_at, date, start_km, status, job_site_id, end_km, vehicle_id, driver_id
+FROM drive_log_drivelog_partitioned;
+
+SELECT setval(
+    pg_get_serial_sequence('drive_log_drivelog', 'id'),
+    (SELECT coalesce(max(id), 0) + 1 FROM drive_log_drivelog),
+    false
+);
+
+DROP TABLE drive_log_drivelog_partitioned;
+DROP FUNCTION IF EXISTS drive_log_drivelog_check_one_in_progress();
+DROP FUNCTION IF EXISTS drive_log_drivelog_create_partition(integer);
+ALTER SEQUENCE drive_log_drivelog_id_seq1 RENAME TO drive_log_drivelog_id_seq;
+
+ALTER TABLE drive_log_drivelog
+    ADD CONSTRAINT drive_log_drivelog_pkey PRIMARY KEY (id),
+    ADD CONSTRAINT drive_log_drivelog_job_site_id_41254f97_fk_drive_log_jobsite_id
+        FOREIGN KEY (job_site_id) REFERENCES drive_log_jobsite (id)
+        DEFERRABLE INITIALLY DEFERRED,
+    ADD CONSTRAINT drive_log_drivelog_vehicle_id_fk_drive_log_vehicle_id
+        FOREIGN KEY (vehicle_id) REFERENCES drive_log_vehicle (id)
+        DEFERRABLE INITIALLY DEFERRED,
+    ADD CONSTRAINT drive_log_drivelog_driver_id_fk_drive_log_user_id
+        FOREIGN KEY (driver_id) REFERENCES drive_log_user (id)
+        ON DELETE SET NULL
+        DEFERRABLE INITIALLY DEFERRED,
+    ADD CONSTRAINT drive_log_drivelog_end_km_not_below_start_km
+        CHECK (end_km IS NULL OR end_km >= start_km) NOT VALID;
+
+CREATE INDEX drive_log_drivelog_job_site_id_41254f97 ON drive_log_drivelog (job_site_id);
+CREATE INDEX drive_log_drivelog_status_created_at_id ON drive_log_drivelog (status, created_at, id);
+CREATE INDEX drive_log_drivelog_status_date ON drive_log_drivelog (status, date);
+CREATE INDEX drive_log_drivelog_created_at ON drive_log_drivelog (created_at);
+CREATE INDEX drive_log_drivelog_vehicle_created_at ON drive_log_drivelog (vehicle_id, created_at);
+CREATE INDEX drive_log_drivelog_vehicle_status_created_at_id
+    ON drive_log_drivelog (vehicle_id, status, created_at, id);
+CREATE INDEX drive_log_drivelog_driver_id ON drive_log_drivelog (driver_id);
+CREATE UNIQUE INDEX drive_log_drivelog_one_in_progress_per_vehicle
+    ON drive_log_drivelog (vehicle_id)
+    WHERE status = 'in_progress';
+
+CREATE TRIGGER drive_log_drivelog_check_start_km
+    BEFORE INSERT OR UPDATE OF start_km, created_at, vehicle_id ON drive_log_drivelog
+    FOR EACH ROW EXECUTE FUNCTION drive_log_drivelog_check_start_km();
+
+UPDATE drive_log_sync_event e
+SET drive_log_id = NULL
+WHERE NOT EXISTS (SELECT 1 FROM drive_log_drivelog d WHERE d.id = e.drive_log_id);
+
+ALTER TABLE drive_log_sync_event
+    ADD CONSTRAINT drive_log_sync_event_drive_log_id_fk_drive_log_drivelog_id
+        FOREIGN KEY (drive_log_id) REFERENCES drive_log_drivelog (id)
+        ON DELETE SET NULL;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS drive_log_daily_rollup AS
+SELECT
+    date,
+    job_site_id,
+    count(*) AS trips,
+    sum(end_km - start_km) AS km
+FROM drive_log_drivelog
+WHERE status = 'completed'
+GROUP BY date, job_site_id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS drive_log_daily_rollup_date_job_site_id
+    ON drive_log_daily_rollup (date, job_site_id);
@@ -0,0 +1,95 @@
+-- The daily rollup becomes a table, per day, vehicle and job site, kept up to
+-- date by a trigger: a write adds or takes away its own drive's trip and km,
+-- in its transaction. The materialized view was refreshed over the whole
+-- history on every write. Reports read it with REPORTS_USE_ROLLUPS, see
+-- db/reports.py.
+--
+-- Dropping a partition fires no row trigger, db/partitions.py deletes the
+-- year's rows itself when it archives a year.
+
+-- +goose Up
+DROP MATERIALIZED VIEW IF EXISTS drive_log_daily_rollup;
+
+CREATE TABLE drive_log_daily_rollup (
+    vehicle_id bigint NOT NULL,
+    date date NOT NULL,
+    job_site_id bigint NOT NULL,
+    trips bigint NOT NULL,
+    km bigint NOT NULL,
+    CONSTRAINT drive_log_daily_rollup_pkey PRIMARY KEY (vehicle_id, date, job_site_id)
+);
+
+-- the reports of every vehicle filter on date only
+CREATE INDEX drive_log_daily_rollup_date ON drive_log_daily_rollup (date);
+
+INSERT INTO drive_log_daily_rollup (vehicle_id, date, job_site_id, trips, km)
+SELECT vehicle_id, date, job_site_id, count(*), sum(end_km - start_km)
+FROM drive_log_drivelog
+WHERE status = 'completed'
+GROUP BY vehicle_id, date, job_site_id;
+
+-- +goose StatementBegin
+CREATE OR REPLACE FUNCTION drive_log_daily_rollup_add(
+    add_vehicle_id bigint, add_date date, add_job_site_id bigint, add_trips bigint, add_km bigint
+) RETURNS void AS $$
+BEGIN
+    INSERT INTO drive_log_daily_rollup AS r (vehicle_id, date, job_site_id, trips, km)
+    VALUES (add_vehicle_id, add_date, add_job_site_id, add_trips, add_km)
+    ON CONFLICT (vehicle_id, date, job_site_id) DO UPDATE
+        SET trips = r.trips + EXCLUDED.trips,
+            km = r.km + EXCLUDED.km;
+
+    IF add_trips < 0 THEN
+        DELETE FROM drive_log_daily_rollup
+        WHERE vehicle_id = add_vehicle_id
+          AND date = add_date
+          AND job_site_id = add_job_site_id
+          AND trips = 0;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+-- +goose StatementEnd
+
+-- +goose StatementBegin
+CREATE OR REPLACE FUNCTION drive_log_drivelog_roll_up() RETURNS trigger AS $$
+BEGIN
+    -- a drive moved to another year's partition is a delete and an insert
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.status = 'completed' THEN
+        PERFORM drive_log_daily_rollup_add(
+            OLD.vehicle_id, OLD.date, OLD.job_site_id, -1, -(OLD.end_km - OLD.start_km)
+        );
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.status = 'completed' THEN
+        PERFORM drive_log_daily_rollup_add(
+            NEW.vehicle_id, NEW.date, NEW.job_site_id, 1, NEW.end_km - NEW.start_km
+        );
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+-- +goose StatementEnd
+
+CREATE TRIGGER drive_log_drivelog_roll_up
+    AFTER INSERT OR DELETE
+        OR UPDATE OF date, start_km, end_km, status, job_site_id, vehicle_id
+    ON drive_log_drivelog
+    FOR EACH ROW EXECUTE FUNCTION drive_log_drivelog_roll_up();
+
+-- +goose Down
+DROP TRIGGER IF EXISTS drive_log_drivelog_roll_up ON drive_log_drivelog;
+DROP FUNCTION IF EXISTS drive_log_drivelog_roll_up();
+DROP FUNCTION IF EXISTS drive_log_daily_rollup_add(bigint, date, bigint, bigint, bigint);
+DROP TABLE IF EXISTS drive_log_daily_rollup;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS drive_log_daily_rollup AS
+SELECT
+    date,
+    job_site_id,
+    count(*) AS trips,
+    sum(end_km - start_km) AS km
+FROM drive_log_drivelog
+WHERE status = 'completed'
+GROUP BY date, job_site_id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS drive_log_daily_rollup_date_job_site_id
+    ON drive_log_daily_rollup (date, job_site_id);
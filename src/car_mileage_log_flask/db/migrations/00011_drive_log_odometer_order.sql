@@ -0,0 +1,151 @@
+-- A vehicle's drives follow each other in the order the drive log list shows
+-- them: by date, then created_at, then id. Rule 1 of logic_rules.md was
+-- checked in created_at order, which reads every yearly partition.
+--
+-- The start km trigger now finds the drive before and the drive after the
+-- written one on (vehicle_id, date, created_at, id), from the written drive's
+-- date outwards: partitions are scanned in date order and the first drive
+-- found ends the scan, so a drive with a neighbour in its own year reads that
+-- partition alone. It also refuses an end km above the next drive's start km,
+-- which db/writes.py checked after the statement, raised as
+-- drive_log_drivelog_end_km_not_above_next_start_km with the next drive's id,
+-- date and start km as detail.
+--
+-- As in migration 00004, existing history is not rechecked. The odometer
+-- state's last drive is recomputed in the new order.
+
+-- +goose Up
+DROP INDEX IF EXISTS drive_log_drivelog_vehicle_created_at;
+-- previous and next drive of a vehicle: start km trigger, odometer state, edits
+CREATE INDEX IF NOT EXISTS drive_log_drivelog_vehicle_date_created_at_id
+    ON drive_log_drivelog (vehicle_id, date, created_at, id);
+
+-- +goose StatementBegin
+CREATE OR REPLACE FUNCTION drive_log_drivelog_check_start_km() RETURNS trigger AS $$
+DECLARE
+    previous_end_km integer;
+    next_id bigint;
+    next_date date;
+    next_start_km integer;
+BEGIN
+    -- one writer per vehicle at a time, so concurrent drives cannot both pass the check
+    PERFORM pg_advisory_xact_lock(
+        hashtext('drive_log_drivelog_start_km'), hashtext(NEW.vehicle_id::text)
+    );
+
+    -- id <> NEW.id: an update still sees the row's old version
+    IF TG_OP = 'INSERT'
+        OR (NEW.date, NEW.created_at, NEW.vehicle_id, NEW.start_km)
+            IS DISTINCT FROM (OLD.date, OLD.created_at, OLD.vehicle_id, OLD.start_km) THEN
+        SELECT end_km INTO previous_end_km
+        FROM drive_log_drivelog
+        WHERE vehicle_id = NEW.vehicle_id
+          AND date <= NEW.date
+          AND (date, created_at, id) < (NEW.date, NEW.created_at, NEW.id)
+          AND id <> NEW.id
+        ORDER BY date DESC, created_at DESC, id DESC
+        LIMIT 1;
+
+        IF previous_end_km IS NOT NULL AND NEW.start_km < previous_end_km THEN
+            RAISE EXCEPTION 'Start km (%) cannot be lower than previous End km (%)',
+                    NEW.start_km, previous_end_km
+                USING ERRCODE = 'check_violation',
+                      CONSTRAINT = 'drive_log_drivelog_start_km_not_below_previous_end_km',
+                      DETAIL = previous_end_km::text;
+        END IF;
+    END IF;
+
+    IF NEW.end_km IS NOT NULL AND (
+        TG_OP = 'INSERT'
+        OR (NEW.date, NEW.created_at, NEW.vehicle_id, NEW.end_km)
+            IS DISTINCT FROM (OLD.date, OLD.created_at, OLD.vehicle_id, OLD.end_km)
+    ) THEN
+        SELECT id, date, start_km INTO next_id, next_date, next_start_km
+        FROM drive_log_drivelog
+        WHERE vehicle_id = NEW.vehicle_id
+          AND date >= NEW.date
+          AND (date, created_at, id) > (NEW.date, NEW.created_at, NEW.id)
+          AND id <> NEW.id
+        ORDER BY date, created_at, id
+        LIMIT 1;
+
+        IF next_start_km IS NOT NULL AND next_start_km < NEW.end_km THEN
+            RAISE EXCEPTION 'The drive of % would start at % km, below the previous End km (%)',
+                    next_date, next_start_km, NEW.end_km
+                USING ERRCODE = 'check_violation',
+                      CONSTRAINT = 'drive_log_drivelog_end_km_not_above_next_start_km',
+                      DETAIL = format('%s %s %s', next_id, next_date, next_start_km);
+        END IF;
+    END IF;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+-- +goose StatementEnd
+
+DROP TRIGGER IF EXISTS drive_log_drivelog_check_start_km ON drive_log_drivelog;
+CREATE TRIGGER drive_log_drivelog_check_start_km
+    BEFORE INSERT OR UPDATE OF date, start_km, end_km, created_at, vehicle_id
+    ON drive_log_drivelog
+    FOR EACH ROW EXECUTE FUNCTION drive_log_drivelog_check_start_km();
+
+UPDATE drive_log_vehicle_state s
+SET updated_at = clock_timestamp(),
+    last_drive_id = last_drive.id,
+    last_drive_date = last_drive.date,
+    last_job_site_id = last_drive.job_site_id,
+    last_end_km = last_completed.end_km
+FROM drive_log_vehicle v
+LEFT JOIN LATERAL (
+    SELECT id, date, job_site_id FROM drive_log_drivelog
+    WHERE vehicle_id = v.id
+    ORDER BY date DESC, created_at DESC, id DESC
+    LIMIT 1
+) last_drive ON true
+LEFT JOIN LATERAL (
+    SELECT end_km FROM drive_log_drivelog
+    WHERE vehicle_id = v.id AND status = 'completed'
+    ORDER BY date DESC, created_at DESC, id DESC
+    LIMIT 1
+) last_completed ON true
+WHERE s.vehicle_id = v.id;
+
+-- +goose Down
+DROP TRIGGER IF EXISTS drive_log_drivelog_check_start_km ON drive_log_drivelog;
+
+-- +goose StatementBegin
+CREATE OR REPLACE FUNCTION drive_log_drivelog_check_start_km() RETURNS trigger AS $$
+DECLARE
+    previous_end_km integer;
+BEGIN
+    -- one writer per vehicle at a time, so concurrent drives cannot both pass the check
+    PERFORM pg_advisory_xact_lock(
+        hashtext('drive_log_drivelog_start_km'), hashtext(NEW.vehicle_id::text)
+    );
+
+    SELECT end_km INTO previous_end_km
+    FROM drive_log_drivelog
+    WHERE vehicle_id = NEW.vehicle_id AND created_at < NEW.created_at AND id <> NEW.id
+    ORDER BY created_at DESC
+    LIMIT 1;
+
+    IF previous_end_km IS NOT NULL AND NEW.start_km < previous_end_km THEN
+        RAISE EXCEPTION 'Start km (%) cannot be lower than previous End km (%)',
+                NEW.start_km, previous_end_km
+            USING ERRCODE = 'check_violation',
+                  CONSTRAINT = 'drive_log_drivelog_start_km_not_below_previous_end_km',
+                  DETAIL = previous_end_km::text;
+    END IF;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+-- +goose StatementEnd
+
+CREATE TRIGGER drive_log_drivelog_check_start_km
+    BEFORE INSERT OR UPDATE OF start_km, created_at, vehicle_id ON drive_log_drivelog
+    FOR EACH ROW EXECUTE FUNCTION drive_log_drivelog_check_start_km();
+
+DROP INDEX IF EXISTS drive_log_drivelog_vehicle_date_created_at_id;
+CREATE INDEX IF NOT EXISTS drive_log_drivelog_vehicle_created_at
+    ON drive_log_drivelog (vehicle_id, created_at);
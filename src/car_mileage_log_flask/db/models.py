@@ -1,17 +1,24 @@
 from typing import List, Optional
 
-from sqlalchemy import BigInteger, Date, DateTime, ForeignKeyConstraint, Identity, Index, Integer, PrimaryKeyConstraint, String
+from sqlalchemy import BigInteger, CheckConstraint, Date, DateTime, ForeignKeyConstraint, Identity, Index, Integer, PrimaryKeyConstraint, String, Text, UniqueConstraint, Uuid, text
 from sqlalchemy.orm import DeclarativeBase, Mapped, MappedAsDataclass, mapped_column, relationship
 import datetime
+import uuid
 
 class Base(MappedAsDataclass, DeclarativeBase):
     pass
 
 
+# relationships are lazy='raise': load them explicitly with selectinload or
+# joinedload (see db/orm_reads.py), touching an unloaded one raises instead of
+# quietly running a query per object
+
+
 class DriveLogJobsite(Base):
     __tablename__ = 'drive_log_jobsite'
     __table_args__ = (
         PrimaryKeyConstraint('id', name='drive_log_jobsite_pkey'),
+        Index('drive_log_jobsite_search', text("to_tsvector('simple'::regconfig, (((name)::text || ' '::text) || (address)::text))"), postgresql_using='gin')
     )
 
     id: Mapped[int] = mapped_column(BigInteger, Identity(start=1, increment=1, minvalue=1, maxvalue=9223372036854775807, cycle=False, cache=1), primary_key=True)
@@ -20,24 +27,119 @@ class DriveLogJobsite(Base):
     name: Mapped[str] = mapped_column(String(255))
     address: Mapped[str] = mapped_column(String(255))
 
-    drive_log_drivelog: Mapped[List['DriveLogDrivelog']] = relationship('DriveLogDrivelog', back_populates='job_site')
+    drive_log_drivelog: Mapped[List['DriveLogDrivelog']] = relationship('DriveLogDrivelog', back_populates='job_site', lazy='raise')
+
+
+class DriveLogVehicle(Base):
+    __tablename__ = 'drive_log_vehicle'
+    __table_args__ = (
+        PrimaryKeyConstraint('id', name='drive_log_vehicle_pkey'),
+        UniqueConstraint('plate', name='drive_log_vehicle_plate_key')
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, Identity(start=1, increment=1, minvalue=1, maxvalue=9223372036854775807, cycle=False, cache=1), primary_key=True)
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime(True))
+    updated_at: Mapped[datetime.datetime] = mapped_column(DateTime(True))
+    name: Mapped[str] = mapped_column(String(255))
+    plate: Mapped[str] = mapped_column(String(20))
+
+    drive_log_drivelog: Mapped[List['DriveLogDrivelog']] = relationship('DriveLogDrivelog', back_populates='vehicle', lazy='raise')
+    state: Mapped[Optional['DriveLogVehicleState']] = relationship('DriveLogVehicleState', back_populates='vehicle', lazy='raise')
+
+
+class DriveLogVehicleState(Base):
+    __tablename__ = 'drive_log_vehicle_state'
+    __table_args__ = (
+        ForeignKeyConstraint(['vehicle_id'], ['drive_log_vehicle.id'], ondelete='CASCADE', name='drive_log_vehicle_state_vehicle_id_fk_drive_log_vehicle_id'),
+        PrimaryKeyConstraint('vehicle_id', name='drive_log_vehicle_state_pkey')
+    )
+
+    vehicle_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    updated_at: Mapped[datetime.datetime] = mapped_column(DateTime(True))
+    drive_in_progress_id: Mapped[Optional[int]] = mapped_column(BigInteger)
+    last_drive_id: Mapped[Optional[int]] = mapped_column(BigInteger)
+    last_end_km: Mapped[Optional[int]] = mapped_column(Integer)
+    last_job_site_id: Mapped[Optional[int]] = mapped_column(BigInteger)
+    drive_in_progress_date: Mapped[Optional[datetime.date]] = mapped_column(Date)
+    last_drive_date: Mapped[Optional[datetime.date]] = mapped_column(Date)
+
+    vehicle: Mapped['DriveLogVehicle'] = relationship('DriveLogVehicle', back_populates='state', lazy='raise')
+
+
+class DriveLogUser(Base):
+    __tablename__ = 'drive_log_user'
+    __table_args__ = (
+        PrimaryKeyConstraint('id', name='drive_log_user_pkey'),
+        UniqueConstraint('username', name='drive_log_user_username_key')
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, Identity(start=1, increment=1, minvalue=1, maxvalue=9223372036854775807, cycle=False, cache=1), primary_key=True)
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime(True))
+    updated_at: Mapped[datetime.datetime] = mapped_column(DateTime(True))
+    username: Mapped[str] = mapped_column(String(150))
+    password_hash: Mapped[str] = mapped_column(String(255))
+
+    drive_log_drivelog: Mapped[List['DriveLogDrivelog']] = relationship('DriveLogDrivelog', back_populates='driver', lazy='raise')
 
 
 class DriveLogDrivelog(Base):
     __tablename__ = 'drive_log_drivelog'
     __table_args__ = (
         ForeignKeyConstraint(['job_site_id'], ['drive_log_jobsite.id'], deferrable=True, initially='DEFERRED', name='drive_log_drivelog_job_site_id_41254f97_fk_drive_log_jobsite_id'),
-        PrimaryKeyConstraint('id', name='drive_log_drivelog_pkey'),
-        Index('drive_log_drivelog_job_site_id_41254f97', 'job_site_id')
+        ForeignKeyConstraint(['vehicle_id'], ['drive_log_vehicle.id'], deferrable=True, initially='DEFERRED', name='drive_log_drivelog_vehicle_id_fk_drive_log_vehicle_id'),
+        ForeignKeyConstraint(['driver_id'], ['drive_log_user.id'], ondelete='SET NULL', deferrable=True, initially='DEFERRED', name='drive_log_drivelog_driver_id_fk_drive_log_user_id'),
+        PrimaryKeyConstraint('id', 'date', name='drive_log_drivelog_pkey'),
+        Index('drive_log_drivelog_job_site_id_41254f97', 'job_site_id'),
+        Index('drive_log_drivelog_driver_id', 'driver_id'),
+        Index('drive_log_drivelog_date_created_at', 'date', 'created_at'),
+        Index('drive_log_drivelog_vehicle_date_created_at_id', 'vehicle_id', 'date', 'created_at', 'id'),
+        Index('drive_log_drivelog_status_date_created_at_id', 'status', 'date', 'created_at', 'id'),
+        Index('drive_log_drivelog_vehicle_status_date_created_at_id', 'vehicle_id', 'status', 'date', 'created_at', 'id'),
+        Index('drive_log_drivelog_in_progress', 'vehicle_id', postgresql_where=text("status = 'in_progress'")),
+        CheckConstraint('end_km IS NULL OR end_km >= start_km', name='drive_log_drivelog_end_km_not_below_start_km'),
+        {'postgresql_partition_by': 'RANGE (date)'}
     )
 
     id: Mapped[int] = mapped_column(BigInteger, Identity(start=1, increment=1, minvalue=1, maxvalue=9223372036854775807, cycle=False, cache=1), primary_key=True)
     created_at: Mapped[datetime.datetime] = mapped_column(DateTime(True))
     updated_at: Mapped[datetime.datetime] = mapped_column(DateTime(True))
-    date: Mapped[datetime.date] = mapped_column(Date)
+    date: Mapped[datetime.date] = mapped_column(Date, primary_key=True)
     start_km: Mapped[int] = mapped_column(Integer)
     status: Mapped[str] = mapped_column(String(20))
     job_site_id: Mapped[int] = mapped_column(BigInteger)
+    vehicle_id: Mapped[int] = mapped_column(BigInteger)
     end_km: Mapped[Optional[int]] = mapped_column(Integer)
+    driver_id: Mapped[Optional[int]] = mapped_column(BigInteger)
+
+    job_site: Mapped['DriveLogJobsite'] = relationship('DriveLogJobsite', back_populates='drive_log_drivelog', lazy='raise')
+    vehicle: Mapped['DriveLogVehicle'] = relationship('DriveLogVehicle', back_populates='drive_log_drivelog', lazy='raise')
+    driver: Mapped[Optional['DriveLogUser']] = relationship('DriveLogUser', back_populates='drive_log_drivelog', lazy='raise')
+
+
+class DriveLogSyncEvent(Base):
+    __tablename__ = 'drive_log_sync_event'
+    __table_args__ = (
+        ForeignKeyConstraint(['user_id'], ['drive_log_user.id'], ondelete='SET NULL', name='drive_log_sync_event_user_id_fk_drive_log_user_id'),
+        PrimaryKeyConstraint('key', name='drive_log_sync_event_pkey')
+    )
+
+    key: Mapped[uuid.UUID] = mapped_column(Uuid, primary_key=True)
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime(True))
+    kind: Mapped[str] = mapped_column(String(10))
+    user_id: Mapped[Optional[int]] = mapped_column(BigInteger)
+    drive_log_id: Mapped[Optional[int]] = mapped_column(BigInteger)
+    error: Mapped[Optional[str]] = mapped_column(Text)
+
+
+class DriveLogDailyRollup(Base):
+    __tablename__ = 'drive_log_daily_rollup'
+    __table_args__ = (
+        PrimaryKeyConstraint('vehicle_id', 'date', 'job_site_id', name='drive_log_daily_rollup_pkey'),
+        Index('drive_log_daily_rollup_date', 'date')
+    )
 
-    job_site: Mapped['DriveLogJobsite'] = relationship('DriveLogJobsite', back_populates='drive_log_drivelog')
+    vehicle_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    date: Mapped[datetime.date] = mapped_column(Date, primary_key=True)
+    job_site_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    trips: Mapped[int] = mapped_column(BigInteger)
+    km: Mapped[int] = mapped_column(BigInteger)
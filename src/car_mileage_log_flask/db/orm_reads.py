@@ -0,0 +1,108 @@
+"""
+Reads through the ORM models, for object graphs: a row and its related rows.
+
+Every relationship is lazy='raise' (db/models.py), so each query states how
+its relations load:
+
+- selectinload for collections: one extra `WHERE ... IN (...)` query for the
+  whole collection, however many parents
+- joinedload for many-to-one: joined into the parent's query
+
+Results are returned as read models, the ORM objects do not leave the session.
+"""
+
+import datetime as dt
+from dataclasses import dataclass
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import joinedload, selectinload
+
+from car_mileage_log_flask.db.connection import get_read_session
+from car_mileage_log_flask.db.models import DriveLogDrivelog, DriveLogJobsite
+from car_mileage_log_flask.domain import DriveLogStatus, JobSite
+
+# --- JOB SITES --- #
+
+
+@dataclass
+class JobSiteDrive:
+    id: int
+    date: dt.date
+    start_km: int
+    end_km: int | None
+    status: str
+    vehicle_name: str
+    vehicle_plate: str
+    driver_username: str | None
+
+
+@dataclass
+class JobSiteStats:
+    drives: int
+    completed_km: int
+    vehicles: int
+    first_date: dt.date | None
+    last_date: dt.date | None
+
+
+@dataclass
+class JobSiteHistory:
+    job_site: JobSite
+    stats: JobSiteStats
+    drives: list[JobSiteDrive]
+
+
+def _job_site_drive_from_model(drive_log: DriveLogDrivelog) -> JobSiteDrive:
+    return JobSiteDrive(
+        id=drive_log.id,
+        date=drive_log.date,
+        start_km=drive_log.start_km,
+        end_km=drive_log.end_km,
+        status=drive_log.status,
+        vehicle_name=drive_log.vehicle.name,
+        vehicle_plate=drive_log.vehicle.plate,
+        driver_username=drive_log.driver.username if drive_log.driver else None,
+    )
+
+
+def select_job_site_history(id: int, since: dt.date) -> JobSiteHistory | None:
+    """
+    A job site, its drives since `since` with their vehicle and driver, and
+    its all-time stats. Three queries, however many drives.
+    """
+    drives = DriveLogJobsite.drive_log_drivelog.and_(DriveLogDrivelog.date >= since)
+    stmt = (
+        select(DriveLogJobsite)
+        .where(DriveLogJobsite.id == id)
+        .options(
+            selectinload(drives).options(
+                joinedload(DriveLogDrivelog.vehicle, innerjoin=True),
+                joinedload(DriveLogDrivelog.driver),
+            )
+        )
+    )
+    completed_km = func.sum(DriveLogDrivelog.end_km - DriveLogDrivelog.start_km).filter(
+        DriveLogDrivelog.status == DriveLogStatus.COMPLETED.value
+    )
+    stats_stmt = select(
+        func.count().label("drives"),
+        func.coalesce(completed_km, 0).label("completed_km"),
+        func.count(DriveLogDrivelog.vehicle_id.distinct()).label("vehicles"),
+        func.min(DriveLogDrivelog.date).label("first_date"),
+        func.max(DriveLogDrivelog.date).label("last_date"),
+    ).where(DriveLogDrivelog.job_site_id == id)
+
+    with get_read_session() as session:
+        job_site = session.scalars(stmt).one_or_none()
+        if job_site is None:
+            return None
+        stats = session.execute(stats_stmt).mappings().one()
+
+        drive_logs = sorted(
+            job_site.drive_log_drivelog, key=lambda d: (d.date, d.created_at, d.id), reverse=True
+        )
+        return JobSiteHistory(
+            job_site=JobSite(id=job_site.id, name=job_site.name, address=job_site.address),
+            stats=JobSiteStats(**stats),
+            drives=[_job_site_drive_from_model(drive_log) for drive_log in drive_logs],
+        )
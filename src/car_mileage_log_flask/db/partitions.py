@@ -0,0 +1,303 @@
+"""
+Yearly partitions of drive_log_drivelog, see migration 00009.
+
+- `create_partitions` creates this year's partition through `years_ahead`
+  years ahead, and past years from `since` on to backfill. A drive dated in a
+  year without one is refused, so run `flask create-drive-log-partitions`
+  from cron well before the new year
+- `archive_year` exports a closed year to a zstd compressed Parquet file in
+  DRIVE_LOG_ARCHIVE_DIR, `flask archive-drive-logs YEAR`. With `drop` the
+  year's partition is detached and dropped once the file holds all its rows
+- `archived_daily_totals` reads the per day, per vehicle, per job site
+  totals of the archived years back, memory-mapped, for db/reports.py
+
+Parquet needs pyarrow (the `archive` extra). Without it, creating partitions
+and reports without archives still work.
+"""
+
+import datetime as dt
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+from sqlalchemy import Connection, select, text
+
+from car_mileage_log_flask.db.connection import get_read_connection, transaction
+from car_mileage_log_flask.db.tables import drive_logs_table
+from car_mileage_log_flask.domain import DriveLogStatus
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # the `archive` extra
+    pa = None
+
+PARTITION_PREFIX = "drive_log_drivelog_y"
+ARCHIVE_BATCH_SIZE = 10_000
+
+PARTITIONS_SQL = """
+    SELECT c.relname
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'drive_log_drivelog'::regclass;
+    """
+
+CREATE_PARTITION_SQL = "SELECT drive_log_drivelog_create_partition(:year);"
+
+# what still needs the year in the database: a drive in progress, or the
+# last drive of a vehicle, which the next drive's start km is checked against
+ARCHIVE_BLOCKERS_SQL = """
+    SELECT
+        (
+            SELECT count(*) FROM drive_log_drivelog
+            WHERE date >= :start AND date < :end AND status = 'in_progress'
+        ) AS in_progress,
+        (
+            SELECT count(*) FROM drive_log_vehicle_state
+            WHERE last_drive_date >= :start AND last_drive_date < :end
+        ) AS last_drives;
+    """
+
+
+DELETE_ROLLUP_YEAR_SQL = """
+    DELETE FROM drive_log_daily_rollup
+    WHERE date >= :start AND date < :end;
+    """
+
+
+class ArchiveError(Exception):
+    pass
+
+
+@dataclass
+class ArchiveResult:
+    year: int
+    path: Path
+    rows: int
+    dropped: bool
+
+
+def partition_name(year: int) -> str:
+    return f"{PARTITION_PREFIX}{year}"
+
+
+def _partition_years(conn: Connection) -> set[int]:
+    names = conn.execute(text(PARTITIONS_SQL)).scalars()
+    return {
+        int(name.removeprefix(PARTITION_PREFIX))
+        for name in names
+        if name.startswith(PARTITION_PREFIX)
+    }
+
+
+def select_partition_years() -> list[int]:
+    """The years drive logs can be dated in, oldest first."""
+    with get_read_connection() as conn:
+        return sorted(_partition_years(conn))
+
+
+def create_partitions(years_ahead: int = 1, since: int | None = None) -> list[str]:
+    """
+    Create the partitions of this year, or of `since`, through `years_ahead`
+    years ahead. Returns the new ones.
+
+    An archived year is skipped: with its partition back, the reports would
+    count what is in it and no longer the archive.
+    """
+    this_year = dt.date.today().year
+    first = min(since, this_year) if since is not None else this_year
+    archived = archived_years()
+    with transaction() as conn:
+        existing = _partition_years(conn)
+        return [
+            conn.execute(text(CREATE_PARTITION_SQL), {"year": year}).scalar_one()
+            for year in range(first, this_year + years_ahead + 1)
+            if year not in existing and year not in archived
+        ]
+
+
+# ---- ARCHIVE ---- #
+
+
+def archive_dir() -> Path | None:
+    directory = os.getenv("DRIVE_LOG_ARCHIVE_DIR")
+    return Path(directory) if directory else None
+
+
+def archive_path(directory: Path, year: int) -> Path:
+    return directory / f"{partition_name(year)}.parquet"
+
+
+def _archive_paths() -> dict[int, Path]:
+    directory = archive_dir()
+    if directory is None or not directory.is_dir():
+        return {}
+    return {
+        int(path.stem.removeprefix(PARTITION_PREFIX)): path
+        for path in directory.glob(f"{PARTITION_PREFIX}*.parquet")
+    }
+
+
+def archived_years() -> list[int]:
+    """The years with an archive in DRIVE_LOG_ARCHIVE_DIR, dropped or not, oldest first."""
+    return sorted(_archive_paths())
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("Archived drive logs need pyarrow, the `archive` extra")
+
+
+def _archive_schema() -> "pa.Schema":
+    # the drive log columns, in table order
+    return pa.schema(
+        [
+            ("id", pa.int64()),
+            ("created_at", pa.timestamp("us", tz="UTC")),
+            ("updated_at", pa.timestamp("us", tz="UTC")),
+            ("date", pa.date32()),
+            ("start_km", pa.int32()),
+            ("status", pa.string()),
+            ("job_site_id", pa.int64()),
+            ("end_km", pa.int32()),
+            ("vehicle_id", pa.int64()),
+            ("driver_id", pa.int64()),
+        ]
+    )
+
+
+def _write_archive(conn: Connection, year: int, path: Path) -> int:
+    """Write the year's drive logs to `path`, by date, in batches. Returns the rows written."""
+    schema = _archive_schema()
+    d = drive_logs_table
+    stmt = (
+        select(*(d.c[name] for name in schema.names))
+        .where(d.c.date >= dt.date(year, 1, 1), d.c.date < dt.date(year + 1, 1, 1))
+        .order_by(d.c.date, d.c.created_at, d.c.id)
+    )
+
+    # a partial file never takes the archive's name
+    partial = path.with_name(f"{path.name}.partial")
+    rows = 0
+    # on this statement only, the connection goes on to drop the partition
+    result = conn.execute(stmt, execution_options={"yield_per": ARCHIVE_BATCH_SIZE})
+    with pq.ParquetWriter(partial, schema, compression="zstd") as writer:
+        for batch in result.partitions():
+            columns = zip(*batch)
+            arrays = [pa.array(column, type=field.type) for column, field in zip(columns, schema)]
+            writer.write_batch(pa.record_batch(arrays, schema=schema))
+            rows += len(batch)
+    partial.replace(path)
+    return rows
+
+
+def archive_year(year: int, drop: bool = False) -> ArchiveResult:
+    """
+    Export the drive logs of `year` to Parquet, see the module docstring.
+
+    The year must be over and have no drive in progress; to drop it, no
+    vehicle's last drive may be in it either. The partition is locked against
+    writes while it is exported, reads go on. Raises ArchiveError otherwise.
+    """
+    _require_pyarrow()
+    directory = archive_dir()
+    if directory is None:
+        raise ArchiveError("DRIVE_LOG_ARCHIVE_DIR is not set")
+    if year >= dt.date.today().year:
+        raise ArchiveError(f"{year} is not over, only past years are archived")
+
+    partition = partition_name(year)
+    path = archive_path(directory, year)
+    params = {"start": dt.date(year, 1, 1), "end": dt.date(year + 1, 1, 1)}
+    directory.mkdir(parents=True, exist_ok=True)
+
+    with transaction() as conn:
+        if year not in _partition_years(conn):
+            raise ArchiveError(f"{year} has no partition, it is archived or was never created")
+        conn.execute(text(f"LOCK TABLE {partition} IN SHARE MODE"))
+
+        blockers = conn.execute(text(ARCHIVE_BLOCKERS_SQL), params).mappings().one()
+        if blockers["in_progress"]:
+            raise ArchiveError(f"{year} has {blockers['in_progress']} drives in progress")
+        if drop and blockers["last_drives"]:
+            raise ArchiveError(
+                f"{year} has the last drive of {blockers['last_drives']} vehicles,"
+                " their next start km is checked against it"
+            )
+
+        rows = _write_archive(conn, year, path)
+        if drop:
+            archived = pq.ParquetFile(path).metadata.num_rows
+            count = conn.execute(text(f"SELECT count(*) FROM {partition}")).scalar_one()
+            if archived != count:
+                raise ArchiveError(f"{path} has {archived} rows, {partition} {count}, not dropped")
+            conn.execute(text(f"ALTER TABLE drive_log_drivelog DETACH PARTITION {partition}"))
+            conn.execute(text(f"DROP TABLE {partition}"))
+            # no row trigger fires on a dropped partition; the reports add the
+            # year from its archive, the rollup must not count it too
+            conn.execute(text(DELETE_ROLLUP_YEAR_SQL), params)
+
+    return ArchiveResult(year=year, path=path, rows=rows, dropped=drop)
+
+
+@dataclass
+class DailyTotals:
+    """Completed trips and km per day, vehicle and job site, as parallel lists."""
+
+    vehicle_id: list[int]
+    date: list[dt.date]
+    job_site_id: list[int]
+    trips: list[int]
+    km: list[int]
+
+
+@lru_cache(maxsize=32)
+def _read_daily_totals(path: str, mtime_ns: int) -> DailyTotals:
+    # memory-mapped, only the columns the totals need are read
+    table = pq.read_table(
+        path,
+        columns=["vehicle_id", "date", "job_site_id", "start_km", "end_km"],
+        filters=[("status", "=", DriveLogStatus.COMPLETED.value)],
+        memory_map=True,
+    )
+    table = table.append_column("km", pc.subtract(table["end_km"], table["start_km"]))
+    totals = table.group_by(["vehicle_id", "date", "job_site_id"]).aggregate(
+        [("km", "count"), ("km", "sum")]
+    )
+    return DailyTotals(
+        vehicle_id=totals["vehicle_id"].to_pylist(),
+        date=totals["date"].to_pylist(),
+        job_site_id=totals["job_site_id"].to_pylist(),
+        trips=totals["km_count"].to_pylist(),
+        km=totals["km_sum"].to_pylist(),
+    )
+
+
+def archived_daily_totals() -> DailyTotals | None:
+    """
+    Daily totals of the years archived and no longer in the database, None
+    when there are none. A year archived but not dropped is in the database
+    still and counted from there.
+    """
+    paths = _archive_paths()
+    if not paths:
+        return None
+
+    with get_read_connection() as conn:
+        in_database = _partition_years(conn)
+    archived = [path for year, path in sorted(paths.items()) if year not in in_database]
+    if not archived:
+        return None
+
+    _require_pyarrow()
+    totals = DailyTotals(vehicle_id=[], date=[], job_site_id=[], trips=[], km=[])
+    for path in archived:
+        year_totals = _read_daily_totals(str(path), path.stat().st_mtime_ns)
+        totals.vehicle_id += year_totals.vehicle_id
+        totals.date += year_totals.date
+        totals.job_site_id += year_totals.job_site_id
+        totals.trips += year_totals.trips
+        totals.km += year_totals.km
+    return totals
@@ -1,67 +1,215 @@
+import base64
 import datetime as dt
+import re
+from collections.abc import Iterator
 from dataclasses import dataclass
 
-from sqlalchemy import bindparam, desc, select, text
-
-from car_mileage_log_flask.db.connection import db, engine
-from car_mileage_log_flask.db.tables import drive_logs_table, job_sites_table
-from car_mileage_log_flask.domain import DriveLogStatus, JobSite
+from sqlalchemy import Select, bindparam, select, text, tuple_
+
+from car_mileage_log_flask.db.cache import job_site_cache
+from car_mileage_log_flask.db.connection import (
+    get_connection,
+    get_read_connection,
+    get_read_engine,
+)
+from car_mileage_log_flask.db.rows import (
+    check_columns,
+    first_model_row,
+    iter_model_rows,
+    model_rows,
+    one_model_row,
+)
+from car_mileage_log_flask.db.tables import (
+    drive_logs_table,
+    job_sites_table,
+    users_table,
+    vehicle_states_table,
+    vehicles_table,
+)
+from car_mileage_log_flask.domain import DriveLogStatus, JobSite, User, Vehicle
 
 # --- JOB SITES --- #
 
 
 def select_all_job_sites() -> list[JobSite]:
-    stmt = select(job_sites_table)
-    with engine.connect() as conn:
-        result = conn.execute(stmt)
+    return list(job_site_cache.get_or_load("all", _select_all_job_sites))
+
+
+# read models are built by position (db/rows.py), columns in the order of their fields
+def job_sites_stmt() -> Select:
+    return select(job_sites_table.c.id, job_sites_table.c.name, job_sites_table.c.address)
 
-    job_sites = [
-        JobSite(id=row["id"], name=row["name"], address=row["address"])
-        for row in result.mappings()
-    ]
-    return job_sites
+
+def _select_all_job_sites() -> list[JobSite]:
+    with get_connection() as conn:
+        result = conn.execute(job_sites_stmt())
+
+    return model_rows(result, JobSite)
 
 
 def select_job_site_by_id(id: int) -> JobSite:
-    stmt = select(job_sites_table).where(job_sites_table.c.id == id)
-    with engine.connect() as conn:
+    return job_site_cache.get_or_load(("id", id), lambda: _select_job_site_by_id(id))
+
+
+def _select_job_site_by_id(id: int) -> JobSite:
+    stmt = job_sites_stmt().where(job_sites_table.c.id == id)
+    with get_connection() as conn:
         result = conn.execute(stmt)
 
-    row = result.mappings().one()
-    return JobSite(id=row["id"], name=row["name"], address=row["address"])
+    return one_model_row(result, JobSite)
+
+
+# job sites driven to lately, from a bounded scan of the latest drives; looking
+# up the last drive of every job site would be one probe per job site
+# date first, the partition key: the newest drives are read from the newest partition
+LATEST_JOB_SITES_CTE = """
+    latest AS (
+        SELECT job_site_id AS id, max(created_at) AS last_used
+        FROM (
+            SELECT job_site_id, created_at
+            FROM drive_log_drivelog
+            ORDER BY date DESC, created_at DESC
+            LIMIT 500
+        ) d
+        GROUP BY job_site_id
+    )
+    """
+
+# the WHERE matches the drive_log_jobsite_search index (migration 00007).
+# Name matches first, then job sites driven to lately, then the newest.
+SEARCH_JOB_SITES_SQL = f"""
+    WITH {LATEST_JOB_SITES_CTE}
+    SELECT j.id, j.name, j.address
+    FROM drive_log_jobsite j
+    LEFT JOIN latest USING (id)
+    WHERE to_tsvector('simple', j.name || ' ' || j.address) @@ to_tsquery('simple', :tsquery)
+    ORDER BY
+        to_tsvector('simple', j.name) @@ to_tsquery('simple', :tsquery) DESC,
+        latest.last_used DESC NULLS LAST,
+        j.id DESC
+    LIMIT :job_sites_limit;
+    """
+
+RECENT_JOB_SITES_SUBQUERY = """
+    SELECT j.id, j.name, j.address
+    FROM (
+        SELECT id, last_used FROM latest
+        UNION ALL
+        (
+            SELECT id, NULL
+            FROM drive_log_jobsite
+            ORDER BY id DESC
+            LIMIT :job_sites_limit
+        )
+    ) candidates
+    JOIN drive_log_jobsite j USING (id)
+    GROUP BY j.id
+    ORDER BY max(candidates.last_used) DESC NULLS LAST, j.id DESC
+    LIMIT :job_sites_limit
+    """
+
+RECENT_JOB_SITES_SQL = f"""
+    WITH {LATEST_JOB_SITES_CTE}
+    {RECENT_JOB_SITES_SUBQUERY};
+    """
+
+
+def job_sites_tsquery(query: str) -> str | None:
+    # every word as a prefix: "main st" finds "12 Main Street"
+    words = re.findall(r"[^\W_]+", query.lower())
+    if not words:
+        return None
+    return " & ".join(f"{word}:*" for word in words)
+
 
+def search_job_sites(query: str, limit: int) -> list[JobSite]:
+    """
+    The `limit` job sites matching every word of `query` as a prefix of a word
+    of their name or address. Name matches come first, then the job sites
+    driven to lately. An empty query returns the job sites driven to lately,
+    then the newest.
+    """
+    tsquery = job_sites_tsquery(query)
+    sql = SEARCH_JOB_SITES_SQL if tsquery else RECENT_JOB_SITES_SQL
+    params = {"tsquery": tsquery, "job_sites_limit": limit}
+    with get_read_connection() as conn:
+        result = conn.execute(text(sql), params)
 
-def job_site_select_most_recent() -> JobSite | None:
+    return model_rows(result, JobSite)
+
+
+def job_site_select_most_recent(vehicle_id: int) -> JobSite | None:
+    """Job site of the vehicle's last drive."""
     stmt = (
-        select(
-            drive_logs_table.c.job_site_id,
-            job_sites_table.c.address.label("job_site_address"),
-            job_sites_table.c.name.label("job_site_name"),
+        job_sites_stmt()
+        .join_from(drive_logs_table, job_sites_table)
+        .where(drive_logs_table.c.vehicle_id == vehicle_id)
+        .order_by(
+            drive_logs_table.c.date.desc(),
+            drive_logs_table.c.created_at.desc(),
+            drive_logs_table.c.id.desc(),
         )
-        .join(job_sites_table)
-        .order_by(desc(drive_logs_table.c.created_at))
         .limit(bindparam("limit"))
     )
 
-    with engine.connect() as conn:
+    with get_connection() as conn:
         result = conn.execute(stmt, {"limit": 1})
 
-    row = result.mappings().first()
+    return first_model_row(result, JobSite)
 
-    if row is None:
-        return None
 
-    return JobSite(
-        id=row["job_site_id"],
-        address=row["job_site_address"],
-        name=row["job_site_name"],
+# ---- VEHICLES ---- #
+
+
+def vehicles_stmt() -> Select:
+    return select(vehicles_table.c.id, vehicles_table.c.name, vehicles_table.c.plate)
+
+
+def select_all_vehicles() -> list[Vehicle]:
+    stmt = vehicles_stmt().order_by(vehicles_table.c.id)
+    with get_connection() as conn:
+        result = conn.execute(stmt)
+
+    return model_rows(result, Vehicle)
+
+
+def select_vehicle_by_id(id: int) -> Vehicle | None:
+    stmt = vehicles_stmt().where(vehicles_table.c.id == id)
+    with get_connection() as conn:
+        return first_model_row(conn.execute(stmt), Vehicle)
+
+
+def select_first_vehicle() -> Vehicle | None:
+    stmt = vehicles_stmt().order_by(vehicles_table.c.id).limit(1)
+    with get_connection() as conn:
+        return first_model_row(conn.execute(stmt), Vehicle)
+
+
+# ---- USERS ---- #
+
+
+@dataclass
+class UserCredentials:
+    user: User
+    password_hash: str
+
+
+def select_user_by_username(username: str) -> UserCredentials | None:
+    stmt = select(users_table.c.id, users_table.c.username, users_table.c.password_hash).where(
+        users_table.c.username == username
     )
+    with get_connection() as conn:
+        row = conn.execute(stmt).first()
+
+    if row is None:
+        return None
+    return UserCredentials(user=User(row.id, row.username), password_hash=row.password_hash)
 
 
 # ---- DRIVE LOGS ---- #
 
 
-@dataclass
+@dataclass(slots=True)
 class DriveLog:
     id: int
     date: dt.date
@@ -71,9 +219,10 @@ class DriveLog:
     job_site_id: int
     job_site_name: str
     job_site_address: str
+    vehicle_id: int
 
 
-@dataclass
+@dataclass(slots=True)
 class DriveLogCompleted:
     id: int
     date: dt.date
@@ -83,10 +232,43 @@ class DriveLogCompleted:
     job_site_id: int
     job_site_name: str
     job_site_address: str
+    vehicle_id: int
 
 
-def select_completed_drive_logs() -> list[DriveLogCompleted]:
-    stmt = (
+@dataclass
+class DriveLogCursor:
+    """Position of the last row of a drive log page, ordered by (date, created_at, id)."""
+
+    date: dt.date
+    created_at: dt.datetime
+    id: int
+
+    def encode(self) -> str:
+        raw = f"{self.date.isoformat()}|{self.created_at.isoformat()}|{self.id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    @classmethod
+    def decode(cls, token: str) -> "DriveLogCursor":
+        """Raises ValueError when the token is not a cursor made by `encode`."""
+        raw = base64.urlsafe_b64decode(token.encode()).decode()
+        date, created_at, id = raw.split("|")
+        return cls(
+            date=dt.date.fromisoformat(date),
+            created_at=dt.datetime.fromisoformat(created_at),
+            id=int(id),
+        )
+
+
+@dataclass
+class DriveLogPage:
+    drive_logs: list[DriveLogCompleted]
+    next_cursor: DriveLogCursor | None
+
+
+def completed_drive_logs_stmt() -> Select:
+    # date first: the partition key, so newest first reads the partitions in
+    # order and a page stops in the newest one that has enough drives
+    return (
         select(
             drive_logs_table.c.id,
             drive_logs_table.c.date,
@@ -96,122 +278,478 @@ def select_completed_drive_logs() -> list[DriveLogCompleted]:
             drive_logs_table.c.job_site_id,
             job_sites_table.c.name.label("job_site_name"),
             job_sites_table.c.address.label("job_site_address"),
+            drive_logs_table.c.vehicle_id,
         )
         .join(job_sites_table)
         .where(drive_logs_table.c.status == DriveLogStatus.COMPLETED.value)
-        .order_by(drive_logs_table.c.created_at.desc())
+        .order_by(
+            drive_logs_table.c.date.desc(),
+            drive_logs_table.c.created_at.desc(),
+            drive_logs_table.c.id.desc(),
+        )
     )
 
-    with engine.connect() as conn:
+
+# the columns of DriveLog and DriveLogCompleted, in the order of their fields,
+# for the SQL below joining drive_log_drivelog d and drive_log_jobsite j
+DRIVE_LOG_COLUMNS = (
+    "d.id, d.date, d.start_km, d.end_km, d.status, d.job_site_id, "
+    "j.name AS job_site_name, j.address AS job_site_address, d.vehicle_id"
+)
+
+
+def select_completed_drive_logs() -> list[DriveLogCompleted]:
+    stmt = completed_drive_logs_stmt()
+
+    with get_read_connection() as conn:
         result = conn.execute(stmt)
 
-    drive_logs = [
-        DriveLogCompleted(
-            id=row["id"],
-            date=row["date"],
-            start_km=row["start_km"],
-            end_km=row["end_km"],
-            status=row["status"],
-            job_site_id=row["job_site_id"],
-            job_site_name=row["job_site_name"],
-            job_site_address=row["job_site_address"],
+    return model_rows(result, DriveLogCompleted)
+
+
+def iter_completed_drive_logs(
+    start: dt.date | None = None,
+    end: dt.date | None = None,
+    job_site_id: int | None = None,
+    vehicle_id: int | None = None,
+    batch_size: int = 1000,
+) -> Iterator[DriveLogCompleted]:
+    """
+    Completed drive logs, oldest first, streamed through a server-side cursor.
+
+    Only `batch_size` rows are held in memory at a time. The generator keeps
+    its own connection until it is exhausted or closed, so it can outlive the
+    request that started it (streamed responses).
+    """
+    stmt = (
+        completed_drive_logs_stmt()
+        .order_by(None)
+        .order_by(
+            drive_logs_table.c.date,
+            drive_logs_table.c.created_at,
+            drive_logs_table.c.id,
         )
-        for row in result.mappings()
-    ]
-    return drive_logs
+    )
+    if start is not None:
+        stmt = stmt.where(drive_logs_table.c.date >= start)
+    if end is not None:
+        stmt = stmt.where(drive_logs_table.c.date <= end)
+    if job_site_id is not None:
+        stmt = stmt.where(drive_logs_table.c.job_site_id == job_site_id)
+    if vehicle_id is not None:
+        stmt = stmt.where(drive_logs_table.c.vehicle_id == vehicle_id)
+
+    with get_read_engine().connect() as conn:
+        result = conn.execution_options(yield_per=batch_size).execute(stmt)
+        yield from iter_model_rows(result, DriveLogCompleted)
+
+
+def completed_drive_logs_page_stmt(
+    limit: int, after: DriveLogCursor | None, vehicle_id: int | None
+) -> Select:
+    # one row more than the page, to know whether there is a next page
+    stmt = (
+        completed_drive_logs_stmt()
+        .add_columns(drive_logs_table.c.created_at)
+        .limit(limit + 1)
+    )
+    if after is not None:
+        stmt = stmt.where(
+            tuple_(drive_logs_table.c.date, drive_logs_table.c.created_at, drive_logs_table.c.id)
+            < tuple_(after.date, after.created_at, after.id)
+        )
+    if vehicle_id is not None:
+        stmt = stmt.where(drive_logs_table.c.vehicle_id == vehicle_id)
+    return stmt
+
+
+def select_completed_drive_logs_page(
+    limit: int, after: DriveLogCursor | None = None, vehicle_id: int | None = None
+) -> DriveLogPage:
+    """
+    One page of completed drive logs, newest first, of one vehicle or all.
+
+    Keyset pagination: the page starts right after `after` and is read from
+    the (status, date, created_at, id) index, or (vehicle_id, status, date,
+    created_at, id) for one vehicle, so every page costs the same no matter
+    how deep it is or how big the table grows. Partitions older than the
+    page are not read.
+    """
+    stmt = completed_drive_logs_page_stmt(limit, after, vehicle_id)
+
+    with get_read_connection() as conn:
+        result = conn.execute(stmt)
 
+    return drive_log_page_from_result(result, limit)
 
-def drive_log_select_earliest_in_progress() -> DriveLogCompleted | None:
-    sql = """
-            SELECT d.*, j.name AS job_site_name, j.address as job_site_address
-            FROM drive_log_drivelog d
-            JOIN drive_log_jobsite j ON d.job_site_id = j.id
-            WHERE status = 'in_progress'
-            ORDER BY created_at ASC
-            LIMIT 1;
-        """
-    with engine.connect() as conn:
-        result = conn.execute(text(sql))
-        row = result.mappings().first()
 
-    if row is None:
-        return None
+def drive_log_page_from_result(result, limit: int) -> DriveLogPage:
+    # each row is the drive log's fields, then its created_at for the cursor
+    width = check_columns(result, DriveLogCompleted)
+    rows = result.all()
 
-    return DriveLogCompleted(
-        id=row["id"],
-        date=row["date"],
-        start_km=row["start_km"],
-        end_km=row["end_km"],
-        status=row["status"],
-        job_site_id=row["job_site_id"],
-        job_site_name=row["job_site_name"],
-        job_site_address=row["job_site_address"],
-    )
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = DriveLogCursor(date=last.date, created_at=last.created_at, id=last.id)
 
+    drive_logs = [DriveLogCompleted(*row[:width]) for row in rows]
+    return DriveLogPage(drive_logs=drive_logs, next_cursor=next_cursor)
 
-def drive_log_select_last_completed() -> DriveLogCompleted | None:
-    sql = """
-        SELECT d.*, j.name AS job_site_name, j.address as job_site_address
-        FROM drive_log_drivelog d
+
+# both through the vehicle's odometer state row, see select_odometer_state;
+# its dates are the partition key, only the drive's partition is read
+EARLIEST_IN_PROGRESS_SQL = f"""
+    SELECT {DRIVE_LOG_COLUMNS}
+    FROM drive_log_vehicle_state s
+    JOIN drive_log_drivelog d
+        ON d.id = s.drive_in_progress_id AND d.date = s.drive_in_progress_date
+    JOIN drive_log_jobsite j ON d.job_site_id = j.id
+    WHERE s.vehicle_id = :vehicle_id;
+    """
+
+
+def drive_log_select_earliest_in_progress(vehicle_id: int) -> DriveLogCompleted | None:
+    with get_connection() as conn:
+        result = conn.execute(text(EARLIEST_IN_PROGRESS_SQL), {"vehicle_id": vehicle_id})
+        return first_model_row(result, DriveLogCompleted)
+
+
+def drive_log_select_last_completed(vehicle_id: int) -> DriveLogCompleted | None:
+    sql = f"""
+        SELECT {DRIVE_LOG_COLUMNS}
+        FROM drive_log_vehicle_state s
+        JOIN drive_log_drivelog d ON d.id = s.last_drive_id AND d.date = s.last_drive_date
         JOIN drive_log_jobsite j ON d.job_site_id = j.id
-        ORDER BY created_at DESC
-        LIMIT 1;
+        WHERE s.vehicle_id = :vehicle_id;
         """
-    with engine.connect() as conn:
-        res = conn.execute(text(sql))
-        row = res.mappings().first()
+    with get_connection() as conn:
+        res = conn.execute(text(sql), {"vehicle_id": vehicle_id})
+        return first_model_row(res, DriveLogCompleted)
 
-    if row is None:
-        return None
 
-    return DriveLogCompleted(
-        id=row["id"],
-        date=row["date"],
-        start_km=row["start_km"],
-        end_km=row["end_km"],
-        status=row["status"],
-        job_site_id=row["job_site_id"],
-        job_site_name=row["job_site_name"],
-        job_site_address=row["job_site_address"],
+@dataclass
+class StartDriveContext:
+    drive_in_progress: DriveLogCompleted | None
+    job_sites: list[JobSite]
+    last_job_site: JobSite | None
+    previous_drive_log: DriveLogCompleted | None
+
+
+def _drive_log_completed_from_json(obj: dict) -> DriveLogCompleted:
+    # row_to_json of DRIVE_LOG_COLUMNS: the fields in order, the date as text
+    drive_log = DriveLogCompleted(*obj.values())
+    drive_log.date = dt.date.fromisoformat(obj["date"])
+    return drive_log
+
+
+START_DRIVE_CONTEXT_SQL = f"""
+    WITH {LATEST_JOB_SITES_CTE},
+    state AS (
+        SELECT s.drive_in_progress_id, s.drive_in_progress_date, s.last_drive_id, s.last_drive_date
+        FROM (VALUES (CAST(:vehicle_id AS bigint))) AS v (vehicle_id)
+        LEFT JOIN drive_log_vehicle_state s ON s.vehicle_id = v.vehicle_id
+    ),
+    in_progress AS (
+        SELECT {DRIVE_LOG_COLUMNS}
+        FROM state
+        JOIN drive_log_drivelog d
+            ON d.id = state.drive_in_progress_id AND d.date = state.drive_in_progress_date
+        JOIN drive_log_jobsite j ON d.job_site_id = j.id
+    ),
+    last_drive AS (
+        SELECT {DRIVE_LOG_COLUMNS}
+        FROM state
+        JOIN drive_log_drivelog d
+            ON d.id = state.last_drive_id AND d.date = state.last_drive_date
+        JOIN drive_log_jobsite j ON d.job_site_id = j.id
     )
+    SELECT
+        (SELECT row_to_json(in_progress) FROM in_progress) AS drive_in_progress,
+        (SELECT row_to_json(last_drive) FROM last_drive) AS last_drive,
+        (
+            SELECT coalesce(
+                json_agg(json_build_object('id', id, 'name', name, 'address', address)),
+                '[]'::json
+            )
+            FROM ({RECENT_JOB_SITES_SUBQUERY}) recent
+        ) AS job_sites;
+    """
+
+
+def select_start_drive_context(vehicle_id: int, job_sites_limit: int = 10) -> StartDriveContext:
+    """
+    Everything the start drive page needs for a vehicle, in a single round trip.
+
+    Same data as `drive_log_select_earliest_in_progress`, `search_job_sites`
+    with an empty query, `job_site_select_most_recent` and
+    `drive_log_select_last_completed`.
+    The most recent job site is the job site of the vehicle's last drive.
+    The drives are found through the vehicle's odometer state row, by primary key.
+    """
+    params = {"vehicle_id": vehicle_id, "job_sites_limit": job_sites_limit}
+    with get_connection() as conn:
+        row = conn.execute(text(START_DRIVE_CONTEXT_SQL), params).mappings().one()
+
+    return start_drive_context_from_row(row)
+
+
+def start_drive_context_from_row(row) -> StartDriveContext:
+    drive_in_progress = None
+    if row["drive_in_progress"] is not None:
+        drive_in_progress = _drive_log_completed_from_json(row["drive_in_progress"])
+
+    last_job_site = None
+    previous_drive_log = None
+    if row["last_drive"] is not None:
+        previous_drive_log = _drive_log_completed_from_json(row["last_drive"])
+        last_job_site = JobSite(
+            id=previous_drive_log.job_site_id,
+            name=previous_drive_log.job_site_name,
+            address=previous_drive_log.job_site_address,
+        )
 
+    job_sites = [JobSite(*obj.values()) for obj in row["job_sites"]]
 
-def drive_log_select_by_id(id: int) -> DriveLog | None:
-    sql = """
-        SELECT d.*, j.name AS job_site_name, j.address as job_site_address
+    return StartDriveContext(
+        drive_in_progress=drive_in_progress,
+        job_sites=job_sites,
+        last_job_site=last_job_site,
+        previous_drive_log=previous_drive_log,
+    )
+
+
+@dataclass(slots=True)
+class OdometerState:
+    vehicle_id: int
+    updated_at: dt.datetime
+    drive_in_progress_id: int | None
+    last_drive_id: int | None
+    last_end_km: int | None
+    last_job_site_id: int | None
+    drive_in_progress_date: dt.date | None
+    last_drive_date: dt.date | None
+
+
+def select_odometer_state(vehicle_id: int) -> OdometerState | None:
+    """The vehicle's drive in progress, last drive and last end km, kept by db/writes.py."""
+    stmt = select(vehicle_states_table).where(vehicle_states_table.c.vehicle_id == vehicle_id)
+    with get_connection() as conn:
+        return first_model_row(conn.execute(stmt), OdometerState)
+
+
+def drive_log_select_last_before(
+    vehicle_id: int, date: dt.date, created_at: dt.datetime
+) -> DriveLogCompleted | None:
+    """The vehicle's drive right before (date, created_at), see logic_rules.md."""
+    # date <= :date lets the ordered scan skip the partitions after it
+    sql = f"""
+        SELECT {DRIVE_LOG_COLUMNS}
         FROM drive_log_drivelog d
         JOIN drive_log_jobsite j ON d.job_site_id = j.id
-        WHERE d.id = :id
+        WHERE d.vehicle_id = :vehicle_id
+          AND d.date <= :date
+          AND (d.date, d.created_at) < (:date, :created_at)
+        ORDER BY d.date DESC, d.created_at DESC, d.id DESC
         LIMIT 1;
         """
+    params = {"vehicle_id": vehicle_id, "date": date, "created_at": created_at}
+    with get_connection() as conn:
+        res = conn.execute(text(sql), params)
+        return first_model_row(res, DriveLogCompleted)
+
+
+# the date of drive log :id, its partition key. The caller may know it, the
+# drive log list links with it, as :drive_log_date, NULL if not. A vehicle's
+# drive in progress or last drive has it in the odometer state. Then a query
+# filtering on it reads that partition only (run-time pruning); any other
+# drive log is looked up in every partition.
+DRIVE_LOG_DATE_BY_ID_SQL = """
+    coalesce(
+        CAST(:drive_log_date AS date),
+        (SELECT drive_in_progress_date FROM drive_log_vehicle_state
+         WHERE drive_in_progress_id = :id LIMIT 1),
+        (SELECT last_drive_date FROM drive_log_vehicle_state
+         WHERE last_drive_id = :id LIMIT 1),
+        (SELECT date FROM drive_log_drivelog WHERE id = :id LIMIT 1)
+    )"""
+
+DRIVE_LOG_BY_ID_SQL = f"""
+    SELECT {DRIVE_LOG_COLUMNS}
+    FROM drive_log_drivelog d
+    JOIN drive_log_jobsite j ON d.job_site_id = j.id
+    WHERE d.id = :id AND d.date = {DRIVE_LOG_DATE_BY_ID_SQL}
+    LIMIT 1;
+    """
+
+
+def drive_log_select_by_id(id: int, date: dt.date | None = None) -> DriveLog | None:
+    """`date` is the drive's date when the caller knows it, a stale one is looked up again."""
+    with get_connection() as conn:
+        result = conn.execute(text(DRIVE_LOG_BY_ID_SQL), {"id": id, "drive_log_date": date})
+        drive_log = first_model_row(result, DriveLog)
+        if drive_log is None and date is not None:
+            result = conn.execute(text(DRIVE_LOG_BY_ID_SQL), {"id": id, "drive_log_date": None})
+            drive_log = first_model_row(result, DriveLog)
+        return drive_log
 
-    with engine.connect() as conn:
-        result = conn.execute(text(sql), {"id": id})
-        row = result.mappings().first()
+
+@dataclass
+class DriveLogEdit:
+    drive_log: DriveLog
+    # the version the edit is made against, see db/writes.py edit_drive_log
+    updated_at: dt.datetime
+    # the km range the drive has to stay within
+    previous_end_km: int | None
+    next_start_km: int | None
+
+
+# the drives before and after it in the order of logic_rules.md, from its date
+# outwards, as the start km trigger finds them (migration 00011)
+DRIVE_LOG_EDIT_SQL = f"""
+    SELECT {DRIVE_LOG_COLUMNS},
+        d.updated_at, previous.end_km AS previous_end_km, next.start_km AS next_start_km
+    FROM drive_log_drivelog d
+    JOIN drive_log_jobsite j ON d.job_site_id = j.id
+    LEFT JOIN LATERAL (
+        SELECT end_km FROM drive_log_drivelog
+        WHERE vehicle_id = d.vehicle_id
+          AND date <= d.date
+          AND (date, created_at, id) < (d.date, d.created_at, d.id)
+        ORDER BY date DESC, created_at DESC, id DESC
+        LIMIT 1
+    ) previous ON true
+    LEFT JOIN LATERAL (
+        SELECT start_km FROM drive_log_drivelog
+        WHERE vehicle_id = d.vehicle_id
+          AND date >= d.date
+          AND (date, created_at, id) > (d.date, d.created_at, d.id)
+        ORDER BY date, created_at, id
+        LIMIT 1
+    ) next ON true
+    WHERE d.id = :id AND d.date = {DRIVE_LOG_DATE_BY_ID_SQL};
+    """
+
+
+def drive_log_select_for_edit(id: int, date: dt.date | None = None) -> DriveLogEdit | None:
+    """
+    The drive log with its version and the drives before and after it.
+    `date` is the drive's date when the caller knows it, a stale one is looked up again.
+    """
+    with get_connection() as conn:
+        result = conn.execute(text(DRIVE_LOG_EDIT_SQL), {"id": id, "drive_log_date": date})
+        width = check_columns(result, DriveLog)
+        row = result.first()
+        if row is None and date is not None:
+            result = conn.execute(text(DRIVE_LOG_EDIT_SQL), {"id": id, "drive_log_date": None})
+            row = result.first()
 
     if row is None:
         return None
 
-    return DriveLog(
-        id=row["id"],
-        date=row["date"],
-        start_km=row["start_km"],
-        end_km=row["end_km"],
-        status=row["status"],
-        job_site_id=row["job_site_id"],
-        job_site_name=row["job_site_name"],
-        job_site_address=row["job_site_address"],
+    return DriveLogEdit(
+        drive_log=DriveLog(*row[:width]),
+        updated_at=row.updated_at,
+        previous_end_km=row.previous_end_km,
+        next_start_km=row.next_start_km,
     )
 
 
-def drive_logs_select_count_in_progress():
+def drive_logs_select_count_in_progress(vehicle_id: int):
     sql = """
             SELECT count(*)
             FROM drive_log_drivelog
-            WHERE status = 'in_progress';
+            WHERE vehicle_id = :vehicle_id AND status = 'in_progress';
             """
-    with engine.connect() as conn:
-        result = conn.execute(text(sql))
+    with get_connection() as conn:
+        result = conn.execute(text(sql), {"vehicle_id": vehicle_id})
         count = result.scalar() or 0
 
     return int(count)
+
+
+# --- VERSIONS --- #
+
+
+@dataclass
+class ContentVersion:
+    """What a page is rendered from, for its ETag and Last-Modified headers."""
+
+    last_modified: dt.datetime | None
+    token: str
+
+
+# deleting a job site does not move max(updated_at), the count does
+JOB_SITES_VERSION_SQL = """
+    SELECT max(updated_at) AS job_sites_updated_at, count(*) AS job_sites
+    FROM drive_log_jobsite;
+    """
+
+# the details page shows the job site's drives too, of any vehicle
+JOB_SITE_VERSION_SQL = """
+    SELECT
+        updated_at AS job_site_updated_at,
+        (SELECT max(updated_at) FROM drive_log_vehicle_state) AS drive_logs_updated_at
+    FROM drive_log_jobsite
+    WHERE id = :id;
+    """
+
+# every drive log write of a vehicle moves its odometer state's updated_at,
+# deletes included; the pages also show job site addresses
+DRIVE_LOGS_VERSION_SQL = """
+    SELECT s.updated_at AS drive_logs_updated_at, j.*
+    FROM (
+        SELECT max(updated_at) AS job_sites_updated_at, count(*) AS job_sites
+        FROM drive_log_jobsite
+    ) j
+    LEFT JOIN drive_log_vehicle_state s ON s.vehicle_id = :vehicle_id;
+    """
+
+# pages over every vehicle's drive logs; a vehicle added or deleted changes the count
+FLEET_VERSION_SQL = """
+    SELECT s.*, j.*
+    FROM (
+        SELECT max(updated_at) AS drive_logs_updated_at, count(*) AS vehicles
+        FROM drive_log_vehicle_state
+    ) s,
+    (
+        SELECT max(updated_at) AS job_sites_updated_at, count(*) AS job_sites
+        FROM drive_log_jobsite
+    ) j;
+    """
+
+
+def content_version_from_row(row) -> ContentVersion | None:
+    if row is None:
+        return None
+    timestamps = [value for value in row.values() if isinstance(value, dt.datetime)]
+    return ContentVersion(
+        last_modified=max(timestamps, default=None),
+        token="-".join(str(value) for value in row.values()),
+    )
+
+
+def select_job_sites_version() -> ContentVersion:
+    with get_read_connection() as conn:
+        row = conn.execute(text(JOB_SITES_VERSION_SQL)).mappings().one()
+    return content_version_from_row(row)
+
+
+def select_job_site_version(id: int) -> ContentVersion | None:
+    with get_read_connection() as conn:
+        row = conn.execute(text(JOB_SITE_VERSION_SQL), {"id": id}).mappings().first()
+    return content_version_from_row(row)
+
+
+def select_drive_logs_version(vehicle_id: int) -> ContentVersion:
+    params = {"vehicle_id": vehicle_id}
+    with get_read_connection() as conn:
+        row = conn.execute(text(DRIVE_LOGS_VERSION_SQL), params).mappings().one()
+    return content_version_from_row(row)
+
+
+def select_fleet_version() -> ContentVersion:
+    with get_read_connection() as conn:
+        row = conn.execute(text(FLEET_VERSION_SQL)).mappings().one()
+    return content_version_from_row(row)
@@ -0,0 +1,201 @@
+"""
+Mileage totals for tax and reimbursement.
+
+Everything is aggregated in SQL. Totals are built on per day, per vehicle,
+per job site rows: either the `drive_log_daily_rollup` table (when
+REPORTS_USE_ROLLUPS is on), which a trigger keeps up to date with every write
+(migration 00010), or the same rows grouped on the fly from
+`drive_log_drivelog`. Years archived to Parquet and dropped from the
+database add their rows from the archive, see db/partitions.py.
+"""
+
+import datetime as dt
+from dataclasses import dataclass
+from enum import Enum
+
+from sqlalchemy import (
+    BigInteger,
+    Date,
+    FromClause,
+    bindparam,
+    func,
+    literal_column,
+    select,
+    union_all,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from car_mileage_log_flask.db.connection import env_flag, get_read_connection
+from car_mileage_log_flask.db.partitions import archived_daily_totals
+from car_mileage_log_flask.db.tables import (
+    daily_rollup_table,
+    drive_logs_table,
+    job_sites_table,
+)
+from car_mileage_log_flask.domain import DriveLogStatus
+
+
+class ReportPeriod(Enum):
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+    YEAR = "year"
+
+
+@dataclass
+class PeriodTotal:
+    period_start: dt.date
+    trips: int
+    km: int
+    cumulative_km: int
+
+
+@dataclass
+class JobSiteTotal:
+    job_site_id: int
+    job_site_name: str
+    job_site_address: str
+    trips: int
+    km: int
+    share: float
+
+
+def rollups_enabled() -> bool:
+    return env_flag("REPORTS_USE_ROLLUPS", False)
+
+
+def _database_daily_totals() -> FromClause:
+    if rollups_enabled():
+        return daily_rollup_table
+
+    d = drive_logs_table
+    return (
+        select(
+            d.c.vehicle_id,
+            d.c.date,
+            d.c.job_site_id,
+            func.count().label("trips"),
+            func.sum(d.c.end_km - d.c.start_km).label("km"),
+        )
+        .where(d.c.status == DriveLogStatus.COMPLETED.value)
+        .group_by(d.c.vehicle_id, d.c.date, d.c.job_site_id)
+        .subquery("daily_totals")
+    )
+
+
+def _daily_totals() -> FromClause:
+    daily = _database_daily_totals()
+    archived = archived_daily_totals()
+    if archived is None:
+        return daily
+
+    # the archive's rows as arrays, unnest() turns them back into rows; the
+    # date filters of the reports still prune the partitions of the other side
+    archived_rows = func.unnest(
+        bindparam("archived_vehicle_id", archived.vehicle_id, type_=ARRAY(BigInteger)),
+        bindparam("archived_date", archived.date, type_=ARRAY(Date)),
+        bindparam("archived_job_site_id", archived.job_site_id, type_=ARRAY(BigInteger)),
+        bindparam("archived_trips", archived.trips, type_=ARRAY(BigInteger)),
+        bindparam("archived_km", archived.km, type_=ARRAY(BigInteger)),
+    ).table_valued("vehicle_id", "date", "job_site_id", "trips", "km").render_derived()
+    columns = ("vehicle_id", "date", "job_site_id", "trips", "km")
+    return union_all(
+        select(*(daily.c[name] for name in columns)),
+        select(archived_rows),
+    ).subquery("daily_totals")
+
+
+def select_totals_by_period(
+    period: ReportPeriod,
+    start: dt.date | None = None,
+    end: dt.date | None = None,
+    job_site_id: int | None = None,
+    vehicle_id: int | None = None,
+) -> list[PeriodTotal]:
+    """Trips and km per period, newest first, with a running total of km."""
+    daily = _daily_totals()
+    # period comes from the enum, safe to inline; a bind parameter would be
+    # rendered twice and Postgres could not match SELECT to GROUP BY
+    period_start = func.date_trunc(
+        literal_column(f"'{period.value}'"), daily.c.date
+    ).cast(Date)
+    km = func.sum(daily.c.km)
+
+    stmt = (
+        select(
+            period_start.label("period_start"),
+            func.sum(daily.c.trips).label("trips"),
+            km.label("km"),
+            func.sum(km).over(order_by=period_start).label("cumulative_km"),
+        )
+        .group_by(period_start)
+        .order_by(period_start.desc())
+    )
+    if start is not None:
+        stmt = stmt.where(daily.c.date >= start)
+    if end is not None:
+        stmt = stmt.where(daily.c.date <= end)
+    if job_site_id is not None:
+        stmt = stmt.where(daily.c.job_site_id == job_site_id)
+    if vehicle_id is not None:
+        stmt = stmt.where(daily.c.vehicle_id == vehicle_id)
+
+    with get_read_connection() as conn:
+        result = conn.execute(stmt)
+
+    totals = [
+        PeriodTotal(
+            period_start=row["period_start"],
+            trips=int(row["trips"]),
+            km=int(row["km"]),
+            cumulative_km=int(row["cumulative_km"]),
+        )
+        for row in result.mappings()
+    ]
+    return totals
+
+
+def select_totals_by_job_site(
+    start: dt.date | None = None,
+    end: dt.date | None = None,
+    vehicle_id: int | None = None,
+) -> list[JobSiteTotal]:
+    """Trips and km per job site, most km first, with each site's share of all km."""
+    daily = _daily_totals()
+    km = func.sum(daily.c.km)
+
+    stmt = (
+        select(
+            job_sites_table.c.id.label("job_site_id"),
+            job_sites_table.c.name.label("job_site_name"),
+            job_sites_table.c.address.label("job_site_address"),
+            func.sum(daily.c.trips).label("trips"),
+            km.label("km"),
+            (km * 100.0 / func.nullif(func.sum(km).over(), 0)).label("share"),
+        )
+        .join(job_sites_table, job_sites_table.c.id == daily.c.job_site_id)
+        .group_by(job_sites_table.c.id)
+        .order_by(km.desc())
+    )
+    if start is not None:
+        stmt = stmt.where(daily.c.date >= start)
+    if end is not None:
+        stmt = stmt.where(daily.c.date <= end)
+    if vehicle_id is not None:
+        stmt = stmt.where(daily.c.vehicle_id == vehicle_id)
+
+    with get_read_connection() as conn:
+        result = conn.execute(stmt)
+
+    totals = [
+        JobSiteTotal(
+            job_site_id=row["job_site_id"],
+            job_site_name=row["job_site_name"],
+            job_site_address=row["job_site_address"],
+            trips=int(row["trips"]),
+            km=int(row["km"]),
+            share=float(row["share"] or 0),
+        )
+        for row in result.mappings()
+    ]
+    return totals
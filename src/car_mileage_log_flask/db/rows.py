@@ -0,0 +1,62 @@
+"""
+Read models built from result rows by position.
+
+A read model's statement selects its columns in the order of the model's
+fields, so each row maps with `Model(*row)`: no dict per row as with
+`.mappings()` and no lookup by column name. Read models are slotted
+dataclasses, so there is no `__dict__` per instance either.
+
+The columns are checked against the fields once per result, so a statement
+and its model cannot drift apart without an error. Columns after the fields
+are allowed and left out, e.g. a page's cursor column.
+"""
+
+from collections.abc import Iterator
+from dataclasses import fields
+from functools import cache
+from itertools import starmap
+from typing import TypeVar
+
+from sqlalchemy import Result
+
+T = TypeVar("T")
+
+
+@cache
+def field_names(model: type) -> tuple[str, ...]:
+    return tuple(field.name for field in fields(model))
+
+
+def check_columns(result: Result, model: type) -> int:
+    """The number of the model's fields. Raises TypeError unless they are the first columns."""
+    names = field_names(model)
+    columns = tuple(result.keys())[: len(names)]
+    if columns != names:
+        raise TypeError(f"{model.__name__} needs the columns {names}, the result has {columns}")
+    return len(names)
+
+
+def iter_model_rows(result: Result, model: type[T]) -> Iterator[T]:
+    width = check_columns(result, model)
+    if width == len(result.keys()):
+        return starmap(model, result)
+    return (model(*row[:width]) for row in result)
+
+
+def model_rows(result: Result, model: type[T]) -> list[T]:
+    return list(iter_model_rows(result, model))
+
+
+def one_model_row(result: Result, model: type[T]) -> T:
+    """The only row as a model. Raises NoResultFound or MultipleResultsFound otherwise."""
+    width = check_columns(result, model)
+    return model(*result.one()[:width])
+
+
+def first_model_row(result: Result, model: type[T]) -> T | None:
+    """The first row as a model, or None when there are no rows. Closes the result."""
+    width = check_columns(result, model)
+    row = result.first()
+    if row is None:
+        return None
+    return model(*row[:width])
@@ -1,9 +1,31 @@
-from sqlalchemy import MetaData, Table
+from typing import cast
 
-from car_mileage_log_flask.db.connection import engine
+from sqlalchemy import Table
 
-metadata_obj = MetaData()
+from car_mileage_log_flask.db.models import (
+    Base,
+    DriveLogDailyRollup,
+    DriveLogDrivelog,
+    DriveLogJobsite,
+    DriveLogSyncEvent,
+    DriveLogUser,
+    DriveLogVehicle,
+    DriveLogVehicleState,
+)
 
-job_sites_table = Table("drive_log_jobsite", metadata_obj, autoload_with=engine)
+# static definitions from the models, no reflection round trips at import time
+metadata_obj = Base.metadata
 
-drive_logs_table = Table("drive_log_drivelog", metadata_obj, autoload_with=engine)
+job_sites_table = cast(Table, DriveLogJobsite.__table__)
+
+drive_logs_table = cast(Table, DriveLogDrivelog.__table__)
+
+vehicles_table = cast(Table, DriveLogVehicle.__table__)
+
+vehicle_states_table = cast(Table, DriveLogVehicleState.__table__)
+
+users_table = cast(Table, DriveLogUser.__table__)
+
+sync_events_table = cast(Table, DriveLogSyncEvent.__table__)
+
+daily_rollup_table = cast(Table, DriveLogDailyRollup.__table__)
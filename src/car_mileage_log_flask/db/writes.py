@@ -1,14 +1,175 @@
 import datetime as dt
+import logging
+from collections.abc import Iterable
 from dataclasses import dataclass
 from datetime import datetime, timezone
+from uuid import UUID
 
-from sqlalchemy import delete, insert, text, update
+from sqlalchemy import Connection, Insert, Select, delete, insert, select, text, update
+from sqlalchemy.exc import DataError, IntegrityError
 
-from car_mileage_log_flask.db.connection import engine
+from car_mileage_log_flask.db.cache import job_site_cache
+from car_mileage_log_flask.db.connection import transaction
 from car_mileage_log_flask.db.models import DriveLogDrivelog
-from car_mileage_log_flask.db.reads import drive_log_select_last_completed
-from car_mileage_log_flask.db.tables import drive_logs_table, job_sites_table
-from car_mileage_log_flask.domain import DriveLogStatus, JobSite
+from car_mileage_log_flask.db.reads import (
+    DRIVE_LOG_BY_ID_SQL,
+    DRIVE_LOG_DATE_BY_ID_SQL,
+    DriveLog,
+    drive_log_select_by_id,
+)
+from car_mileage_log_flask.db.rows import first_model_row, one_model_row
+from car_mileage_log_flask.db.tables import (
+    drive_logs_table,
+    job_sites_table,
+    users_table,
+    vehicles_table,
+)
+from car_mileage_log_flask.domain import (
+    DriveDateOutOfRangeError,
+    DriveInProgressError,
+    DriveLogChangedError,
+    DriveLogNotSavedError,
+    DriveLogStatus,
+    DriveNotInProgressError,
+    EndKmTooLowError,
+    JobSite,
+    OdometerConflict,
+    OdometerConflictError,
+    StartKmTooLowError,
+    Vehicle,
+)
+
+# names of the constraints enforcing logic_rules.md, see migrations 00004, 00005, 00009 and 00011
+START_KM_CONSTRAINT = "drive_log_drivelog_start_km_not_below_previous_end_km"
+NEXT_START_KM_CONSTRAINT = "drive_log_drivelog_end_km_not_above_next_start_km"
+END_KM_CONSTRAINT = "drive_log_drivelog_end_km_not_below_start_km"
+ONE_IN_PROGRESS_CONSTRAINT = "drive_log_drivelog_one_in_progress_per_vehicle"
+# check_violation without a constraint: no partition for the drive's date
+CHECK_VIOLATION = "23514"
+FOREIGN_KEY_VIOLATION = "23503"
+
+logger = logging.getLogger(__name__)
+
+
+def _violated_constraint(e: IntegrityError) -> str | None:
+    diag = getattr(e.orig, "diag", None)
+    return diag.constraint_name if diag else None
+
+
+def raise_drive_log_rule_error(
+    e: IntegrityError, start_km: int, end_km: int | None, date: dt.date | None = None
+):
+    """Turn a violated odometer rule into its domain error, re-raise anything else."""
+    constraint = _violated_constraint(e)
+    sqlstate = getattr(e.orig, "sqlstate", None)
+    if constraint is None and sqlstate == CHECK_VIOLATION and date is not None:
+        raise DriveDateOutOfRangeError(date) from e
+    if constraint == START_KM_CONSTRAINT:
+        previous_end_km = int(e.orig.diag.message_detail)
+        raise StartKmTooLowError(start_km=start_km, previous_end_km=previous_end_km) from e
+    if constraint == NEXT_START_KM_CONSTRAINT and end_km is not None:
+        # the next drive's id, date and start km
+        next_id, next_date, next_start_km = e.orig.diag.message_detail.split()
+        conflict = OdometerConflict(
+            drive_log_id=int(next_id),
+            date=dt.date.fromisoformat(next_date),
+            start_km=int(next_start_km),
+            previous_end_km=end_km,
+        )
+        raise OdometerConflictError([conflict]) from e
+    if constraint == END_KM_CONSTRAINT and end_km is not None:
+        raise EndKmTooLowError(end_km=end_km, start_km=start_km) from e
+    if constraint == ONE_IN_PROGRESS_CONSTRAINT:
+        raise DriveInProgressError() from e
+    raise e
+
+
+def _not_saved_error(e: IntegrityError | DataError) -> DriveLogNotSavedError:
+    """
+    A drive log the database refused for no rule of logic_rules.md, as the
+    user sees it; Postgres' own message only goes to the log.
+    """
+    logger.warning("drive log not saved: %s", e.orig)
+    if getattr(e.orig, "sqlstate", None) == FOREIGN_KEY_VIOLATION:
+        return DriveLogNotSavedError("its job site or vehicle does not exist")
+    if isinstance(e, DataError):
+        return DriveLogNotSavedError("a value is out of range")
+    return DriveLogNotSavedError("the database refused it")
+
+
+# ---- ODOMETER STATE ---- #
+
+# the start km trigger's per vehicle lock (migration 00005); whoever refreshes
+# a vehicle's state last holds it, so it sees every write committed before
+ODOMETER_STATE_LOCK_SQL = """
+    SELECT pg_advisory_xact_lock(
+        hashtext('drive_log_drivelog_start_km'), hashtext(id::text)
+    )
+    FROM unnest(CAST(:vehicle_ids AS bigint[])) AS id
+    ORDER BY id;
+    """
+
+# same as the backfill in migration 00006, in the drive log order of migration
+# 00011: the scans go from the newest partition back and stop at the first
+# drive found, most often in the current year's; only a vehicle without a
+# drive in progress reads an index page per partition for it. clock_timestamp()
+# so updated_at only moves forward, it versions the drive log pages. The dates
+# let reads of the drives go to their partition.
+REFRESH_ODOMETER_STATE_SQL = """
+    INSERT INTO drive_log_vehicle_state (
+        vehicle_id, updated_at, drive_in_progress_id, drive_in_progress_date,
+        last_drive_id, last_drive_date, last_end_km, last_job_site_id
+    )
+    SELECT
+        v.id, clock_timestamp(), in_progress.id, in_progress.date,
+        last_drive.id, last_drive.date, last_completed.end_km, last_drive.job_site_id
+    FROM drive_log_vehicle v
+    LEFT JOIN LATERAL (
+        -- at most one (migration 00009); ordered, the scan stops at its partition
+        SELECT id, date FROM drive_log_drivelog
+        WHERE vehicle_id = v.id AND status = 'in_progress'
+        ORDER BY date DESC
+        LIMIT 1
+    ) in_progress ON true
+    LEFT JOIN LATERAL (
+        SELECT id, date, job_site_id FROM drive_log_drivelog
+        WHERE vehicle_id = v.id
+        ORDER BY date DESC, created_at DESC, id DESC
+        LIMIT 1
+    ) last_drive ON true
+    LEFT JOIN LATERAL (
+        SELECT end_km FROM drive_log_drivelog
+        WHERE vehicle_id = v.id AND status = 'completed'
+        ORDER BY date DESC, created_at DESC, id DESC
+        LIMIT 1
+    ) last_completed ON true
+    WHERE v.id = ANY(CAST(:vehicle_ids AS bigint[]))
+    ON CONFLICT (vehicle_id) DO UPDATE SET
+        updated_at = EXCLUDED.updated_at,
+        drive_in_progress_id = EXCLUDED.drive_in_progress_id,
+        drive_in_progress_date = EXCLUDED.drive_in_progress_date,
+        last_drive_id = EXCLUDED.last_drive_id,
+        last_drive_date = EXCLUDED.last_drive_date,
+        last_end_km = EXCLUDED.last_end_km,
+        last_job_site_id = EXCLUDED.last_job_site_id;
+    """
+
+
+def _refresh_odometer_state(conn: Connection, vehicle_ids: Iterable[int]):
+    """Recompute the odometer state of the vehicles, inside the caller's transaction."""
+    params = {"vehicle_ids": sorted(set(vehicle_ids))}
+    conn.execute(text(ODOMETER_STATE_LOCK_SQL), params)
+    # a new statement, so under READ COMMITTED it reads after the lock is held
+    conn.execute(text(REFRESH_ODOMETER_STATE_SQL), params)
+
+
+def rebuild_odometer_state() -> int:
+    """Recompute every vehicle's odometer state from history. Returns the number of vehicles."""
+    with transaction() as conn:
+        vehicle_ids = conn.execute(select(vehicles_table.c.id)).scalars().all()
+        _refresh_odometer_state(conn, vehicle_ids)
+    return len(vehicle_ids)
+
 
 # --- APP --- #
 
@@ -18,21 +179,55 @@ class StartDriveInput:
     date: dt.date
     start_km: int
     job_site_id: int
+    vehicle_id: int
+    driver_id: int | None = None
 
 
-def start_drive(input: StartDriveInput):
+def _start_drive_stmt(input: StartDriveInput) -> Insert:
     now = dt.datetime.now(timezone.utc)
-    stmt = insert(drive_logs_table).values(
+    return insert(drive_logs_table).values(
         date=input.date,
         start_km=input.start_km,
         job_site_id=input.job_site_id,
+        vehicle_id=input.vehicle_id,
+        driver_id=input.driver_id,
         status=DriveLogStatus.IN_PROGRESS.value,
         created_at=now,
         updated_at=now,
     )
-    with engine.connect() as conn:
-        conn.execute(stmt)
-        conn.commit()
+
+
+def started_drive_log_stmt(input: StartDriveInput) -> Select:
+    # the inserted row as a DriveLog, its job site joined in the same statement
+    d = _start_drive_stmt(input).returning(*drive_logs_table.c).cte("d")
+    j = job_sites_table
+    return select(
+        d.c.id,
+        d.c.date,
+        d.c.start_km,
+        d.c.end_km,
+        d.c.status,
+        d.c.job_site_id,
+        j.c.name.label("job_site_name"),
+        j.c.address.label("job_site_address"),
+        d.c.vehicle_id,
+    ).join_from(d, j, d.c.job_site_id == j.c.id)
+
+
+def start_drive(input: StartDriveInput) -> DriveLog:
+    """
+    Returns the started drive log, for the end drive screen without reading it back.
+    Raises StartKmTooLowError or DriveInProgressError when a rule is broken,
+    DriveDateOutOfRangeError when its year has no partition.
+    """
+    stmt = started_drive_log_stmt(input)
+    try:
+        with transaction() as conn:
+            drive_log = one_model_row(conn.execute(stmt), DriveLog)
+            _refresh_odometer_state(conn, [input.vehicle_id])
+    except IntegrityError as e:
+        raise_drive_log_rule_error(e, start_km=input.start_km, end_km=None, date=input.date)
+    return drive_log
 
 
 @dataclass
@@ -41,26 +236,46 @@ class EndDriveInput:
     end_km: int
 
 
-def end_drive(input: EndDriveInput):
-    sql = """
-        UPDATE drive_log_drivelog
-        SET end_km = :end_km,
-            updated_at = :updated_at,
-            status = :status
-        WHERE id = :id;
-        """
-    now = dt.datetime.now(timezone.utc)
-    with engine.connect() as conn:
-        conn.execute(
-            text(sql),
-            {
-                "end_km": input.end_km,
-                "updated_at": now,
-                "id": input.id,
-                "status": DriveLogStatus.COMPLETED.value,
-            },
-        )
-        conn.commit()
+END_DRIVE_SQL = f"""
+    UPDATE drive_log_drivelog
+    SET end_km = :end_km,
+        updated_at = :updated_at,
+        status = :status
+    WHERE id = :id AND date = {DRIVE_LOG_DATE_BY_ID_SQL}
+    RETURNING vehicle_id;
+    """
+
+
+def end_drive_params(input: EndDriveInput) -> dict:
+    return {
+        "end_km": input.end_km,
+        "updated_at": dt.datetime.now(timezone.utc),
+        "id": input.id,
+        "drive_log_date": None,
+        "status": DriveLogStatus.COMPLETED.value,
+    }
+
+
+def end_drive(input: EndDriveInput) -> bool:
+    """
+    Returns False when there is no drive log with that id.
+    Raises EndKmTooLowError when end km is below the drive's start km,
+    OdometerConflictError when a drive after it starts below it.
+    """
+    try:
+        with transaction() as conn:
+            result = conn.execute(text(END_DRIVE_SQL), end_drive_params(input))
+            vehicle_id = result.scalar_one_or_none()
+            if vehicle_id is not None:
+                _refresh_odometer_state(conn, [vehicle_id])
+    except IntegrityError as e:
+        # only the failing path pays for reading the start km
+        drive_log = drive_log_select_by_id(id=input.id)
+        if drive_log is None:
+            raise
+        raise_drive_log_rule_error(e, start_km=drive_log.start_km, end_km=input.end_km)
+
+    return vehicle_id is not None
 
 
 # ---- JOB SITES ---- #
@@ -71,16 +286,16 @@ def insert_job_site(job_site: JobSite):
     stmt = insert(job_sites_table).values(
         name=job_site.name, address=job_site.address, created_at=now, updated_at=now
     )
-    with engine.connect() as conn:
+    with transaction() as conn:
         conn.execute(stmt)
-        conn.commit()
+    job_site_cache.invalidate()
 
 
 def delete_job_site(id: int):
     stmt = delete(job_sites_table).where(job_sites_table.c.id == id)
-    with engine.connect() as conn:
+    with transaction() as conn:
         conn.execute(stmt)
-        conn.commit()
+    job_site_cache.invalidate()
 
 
 def update_job_site(job_site: JobSite):
@@ -90,17 +305,63 @@ def update_job_site(job_site: JobSite):
         .where(job_sites_table.c.id == job_site.id)
         .values(name=job_site.name, address=job_site.address, updated_at=now)
     )
-    with engine.connect() as conn:
+    with transaction() as conn:
         conn.execute(stmt)
-        conn.commit()
+    job_site_cache.invalidate()
+
+
+# ---- VEHICLES ---- #
+
+
+def insert_vehicle(vehicle: Vehicle) -> int:
+    now = datetime.now(timezone.utc)
+    stmt = (
+        insert(vehicles_table)
+        .values(name=vehicle.name, plate=vehicle.plate, created_at=now, updated_at=now)
+        .returning(vehicles_table.c.id)
+    )
+    with transaction() as conn:
+        id = conn.execute(stmt).scalar_one()
+        _refresh_odometer_state(conn, [id])
+    return id
+
+
+# ---- USERS ---- #
+
+
+def insert_user(username: str, password_hash: str) -> int:
+    now = datetime.now(timezone.utc)
+    stmt = (
+        insert(users_table)
+        .values(
+            username=username,
+            password_hash=password_hash,
+            created_at=now,
+            updated_at=now,
+        )
+        .returning(users_table.c.id)
+    )
+    with transaction() as conn:
+        return conn.execute(stmt).scalar_one()
 
 
 # ---- DRIVE LOGS ---- #
 
 
 def drive_log_insert(
-    date: dt.date, start_km: int, end_km: int, status: str, job_site_id: int
+    date: dt.date,
+    start_km: int,
+    end_km: int,
+    status: str,
+    job_site_id: int,
+    vehicle_id: int,
+    driver_id: int | None = None,
 ):
+    """
+    Raises StartKmTooLowError, EndKmTooLowError, OdometerConflictError or
+    DriveInProgressError when a rule is broken, DriveDateOutOfRangeError when
+    its year has no partition.
+    """
     now = datetime.now(timezone.utc)
     stmt = insert(drive_logs_table).values(
         created_at=now,
@@ -110,17 +371,329 @@ def drive_log_insert(
         end_km=end_km,
         status=status,
         job_site_id=job_site_id,
+        vehicle_id=vehicle_id,
+        driver_id=driver_id,
     )
-    with engine.connect() as conn:
-        conn.execute(stmt)
-        conn.commit()
+    try:
+        with transaction() as conn:
+            conn.execute(stmt)
+            _refresh_odometer_state(conn, [vehicle_id])
+    except IntegrityError as e:
+        raise_drive_log_rule_error(e, start_km=start_km, end_km=end_km, date=date)
+
+
+def _insert_drive_logs(conn: Connection, rows: list[dict]):
+    # backdated rows go before existing drives, the start km trigger checks
+    # them against the drive after them too (migration 00011)
+    conn.execute(insert(drive_logs_table), rows)
+
+
+def drive_logs_insert_many(rows: list[dict]) -> list[str | None]:
+    """
+    Insert many drive logs in one transaction, as a single executemany.
 
+    Each row needs date, start_km, end_km, status, job_site_id, vehicle_id and
+    created_at, and may have driver_id. They may be dated before existing
+    drives, which are checked against them too.
 
-def drive_log_delete(id: int):
-    sql = """
-        DELETE FROM drive_log_drivelog
-        WHERE id = :id
+    Returns an error per row, None for the inserted ones. When the batch is
+    refused it is retried row by row, each in a savepoint, and only the rows
+    breaking a rule are left out.
+    """
+    now = datetime.now(timezone.utc)
+    rows = [{**row, "updated_at": now} for row in rows]
+    try:
+        with transaction() as conn:
+            _insert_drive_logs(conn, rows)
+            _refresh_odometer_state(conn, {row["vehicle_id"] for row in rows})
+    except (IntegrityError, DataError):
+        pass
+    else:
+        return [None] * len(rows)
+
+    errors = []
+    with transaction() as conn:
+        # a deferred foreign key would fail every row at commit
+        conn.execute(text("SET CONSTRAINTS ALL IMMEDIATE"))
+        for row in rows:
+            errors.append(_insert_drive_log_savepoint(conn, row))
+        inserted = {row["vehicle_id"] for row, error in zip(rows, errors) if error is None}
+        if inserted:
+            _refresh_odometer_state(conn, inserted)
+    return errors
+
+
+def _insert_drive_log_savepoint(conn: Connection, row: dict) -> str | None:
+    try:
+        with conn.begin_nested():
+            try:
+                _insert_drive_logs(conn, [row])
+            except IntegrityError as e:
+                raise_drive_log_rule_error(
+                    e, start_km=row["start_km"], end_km=row["end_km"], date=row["date"]
+                )
+    except (
+        StartKmTooLowError,
+        EndKmTooLowError,
+        DriveInProgressError,
+        OdometerConflictError,
+        DriveDateOutOfRangeError,
+    ) as e:
+        return str(e)
+    except (IntegrityError, DataError) as e:
+        return str(_not_saved_error(e))
+    return None
+
+
+@dataclass
+class EditDriveLogInput:
+    id: int
+    # when the drive log was read for editing, the edit is refused if it changed since
+    updated_at: datetime
+    date: dt.date
+    start_km: int
+    # ignored for a drive in progress
+    end_km: int | None
+    job_site_id: int
+    # the drive's date when it was read, its partition; None looks it up
+    read_date: dt.date | None = None
+
+
+# the start km trigger fires on every update, start_km is always set, and takes
+# the vehicle's lock (migration 00005), so no drive is added next to this one
+# before the commit. It checks the drives right before and after this one
+# (migration 00011), the rest of the history cannot break.
+EDIT_DRIVE_LOG_SQL = f"""
+    UPDATE drive_log_drivelog
+    SET date = :date,
+        start_km = :start_km,
+        end_km = CASE WHEN status = 'completed' THEN :end_km ELSE end_km END,
+        job_site_id = :job_site_id,
+        updated_at = :now
+    WHERE id = :id AND date = {DRIVE_LOG_DATE_BY_ID_SQL} AND updated_at = :updated_at
+    RETURNING vehicle_id;
+    """
+
+def edit_drive_log(input: EditDriveLogInput) -> bool:
+    """
+    Returns False when there is no drive log with that id.
+    Raises DriveLogChangedError when it changed since `input.updated_at`,
+    StartKmTooLowError or EndKmTooLowError when a rule is broken,
+    OdometerConflictError when the next drive would start below its end km,
+    and DriveDateOutOfRangeError when the new date's year has no partition.
+    """
+    params = {
+        "id": input.id,
+        "drive_log_date": input.read_date,
+        "updated_at": input.updated_at,
+        "date": input.date,
+        "start_km": input.start_km,
+        "end_km": input.end_km,
+        "job_site_id": input.job_site_id,
+        "now": datetime.now(timezone.utc),
+    }
+    try:
+        with transaction() as conn:
+            vehicle_id = conn.execute(text(EDIT_DRIVE_LOG_SQL), params).scalar_one_or_none()
+            if vehicle_id is None:
+                exists = conn.execute(
+                    select(drive_logs_table.c.id).where(drive_logs_table.c.id == input.id)
+                ).first()
+                if exists is None:
+                    return False
+                # edited since, its date too if `input.read_date` missed it
+                raise DriveLogChangedError()
+
+            _refresh_odometer_state(conn, [vehicle_id])
+    except IntegrityError as e:
+        raise_drive_log_rule_error(
+            e, start_km=input.start_km, end_km=input.end_km, date=input.date
+        )
+
+    return True
+
+
+DELETE_DRIVE_LOG_SQL = f"""
+    DELETE FROM drive_log_drivelog
+    WHERE id = :id AND date = {DRIVE_LOG_DATE_BY_ID_SQL}
+    RETURNING vehicle_id;
+    """
+
+
+def drive_log_delete(id: int, date: dt.date | None = None):
+    """`date` is the drive's date when the caller knows it, a stale one is looked up again."""
+    # drive_log_sync_event.drive_log_id has no foreign key since the drive
+    # logs are partitioned (migration 00009), this is its ON DELETE SET NULL
+    sync_sql = """
+        UPDATE drive_log_sync_event
+        SET drive_log_id = NULL
+        WHERE drive_log_id = :id
         """
-    with engine.connect() as conn:
-        conn.execute(text(sql), {"id": id})
-        conn.commit()
+    with transaction() as conn:
+        params = {"id": id, "drive_log_date": date}
+        vehicle_id = conn.execute(text(DELETE_DRIVE_LOG_SQL), params).scalar_one_or_none()
+        if vehicle_id is None and date is not None:
+            params = {"id": id, "drive_log_date": None}
+            vehicle_id = conn.execute(text(DELETE_DRIVE_LOG_SQL), params).scalar_one_or_none()
+        if vehicle_id is not None:
+            conn.execute(text(sync_sql), {"id": id})
+            _refresh_odometer_state(conn, [vehicle_id])
+
+
+# ---- SYNC ---- #
+
+
+@dataclass
+class SyncStartEvent:
+    key: UUID
+    input: StartDriveInput
+
+
+@dataclass
+class SyncEndEvent:
+    key: UUID
+    end_km: int
+    drive_log_id: int | None = None
+    # a drive started offline has no id yet, its start event's key stands in
+    start_key: UUID | None = None
+
+
+@dataclass
+class SyncEventOutcome:
+    key: UUID
+    applied: bool
+    drive_log_id: int | None = None
+    vehicle_id: int | None = None
+    error: str | None = None
+    # the key was seen before, this is the outcome recorded then
+    replayed: bool = False
+
+
+SYNC_EVENT_CLAIM_SQL = """
+    INSERT INTO drive_log_sync_event (key, created_at, kind, user_id)
+    VALUES (:key, :created_at, :kind, :user_id)
+    ON CONFLICT (key) DO NOTHING
+    RETURNING key;
+    """
+
+SYNC_EVENT_SELECT_SQL = """
+    SELECT e.drive_log_id, e.error, d.vehicle_id
+    FROM drive_log_sync_event e
+    LEFT JOIN drive_log_drivelog d ON d.id = e.drive_log_id
+    WHERE e.key = :key;
+    """
+
+SYNC_EVENT_RECORD_SQL = """
+    UPDATE drive_log_sync_event
+    SET drive_log_id = :drive_log_id, error = :error
+    WHERE key = :key;
+    """
+
+
+def apply_sync_events(
+    events: list[SyncStartEvent | SyncEndEvent], user_id: int | None
+) -> list[SyncEventOutcome]:
+    """
+    Apply start and end drive events in order, in one transaction.
+
+    Each event runs in a savepoint: one that breaks a rule is rejected with
+    the rule's message and the rest still apply. Outcomes are recorded by
+    key, an event sent again gets its first outcome back. The odometer state
+    is refreshed once per vehicle at the end.
+    """
+    outcomes = []
+    with transaction() as conn:
+        # a deferred foreign key would fail the whole batch at commit
+        conn.execute(text("SET CONSTRAINTS ALL IMMEDIATE"))
+        for event in events:
+            outcomes.append(_apply_sync_event(conn, event, user_id))
+
+        vehicle_ids = {
+            outcome.vehicle_id
+            for outcome in outcomes
+            if outcome.applied and not outcome.replayed and outcome.vehicle_id is not None
+        }
+        if vehicle_ids:
+            _refresh_odometer_state(conn, vehicle_ids)
+    return outcomes
+
+
+def _apply_sync_event(
+    conn: Connection, event: SyncStartEvent | SyncEndEvent, user_id: int | None
+) -> SyncEventOutcome:
+    claim = {
+        "key": event.key,
+        "created_at": datetime.now(timezone.utc),
+        "kind": "start" if isinstance(event, SyncStartEvent) else "end",
+        "user_id": user_id,
+    }
+    # waits for a concurrent batch holding the same key, then sees its outcome
+    if conn.execute(text(SYNC_EVENT_CLAIM_SQL), claim).first() is None:
+        row = conn.execute(text(SYNC_EVENT_SELECT_SQL), {"key": event.key}).mappings().one()
+        return SyncEventOutcome(
+            key=event.key,
+            applied=row["error"] is None,
+            drive_log_id=row["drive_log_id"],
+            vehicle_id=row["vehicle_id"],
+            error=row["error"],
+            replayed=True,
+        )
+
+    try:
+        with conn.begin_nested():
+            if isinstance(event, SyncStartEvent):
+                drive_log_id, vehicle_id = _apply_sync_start(conn, event)
+            else:
+                drive_log_id, vehicle_id = _apply_sync_end(conn, event)
+    except (
+        StartKmTooLowError,
+        EndKmTooLowError,
+        DriveInProgressError,
+        DriveNotInProgressError,
+        OdometerConflictError,
+        DriveDateOutOfRangeError,
+    ) as e:
+        outcome = SyncEventOutcome(key=event.key, applied=False, error=str(e))
+    except (IntegrityError, DataError) as e:
+        outcome = SyncEventOutcome(key=event.key, applied=False, error=str(_not_saved_error(e)))
+    else:
+        outcome = SyncEventOutcome(
+            key=event.key, applied=True, drive_log_id=drive_log_id, vehicle_id=vehicle_id
+        )
+
+    params = {"key": event.key, "drive_log_id": outcome.drive_log_id, "error": outcome.error}
+    conn.execute(text(SYNC_EVENT_RECORD_SQL), params)
+    return outcome
+
+
+def _apply_sync_start(conn: Connection, event: SyncStartEvent) -> tuple[int, int]:
+    stmt = _start_drive_stmt(event.input).returning(drive_logs_table.c.id)
+    try:
+        drive_log_id = conn.execute(stmt).scalar_one()
+    except IntegrityError as e:
+        raise_drive_log_rule_error(
+            e, start_km=event.input.start_km, end_km=None, date=event.input.date
+        )
+    return drive_log_id, event.input.vehicle_id
+
+
+def _apply_sync_end(conn: Connection, event: SyncEndEvent) -> tuple[int, int]:
+    drive_log_id = event.drive_log_id
+    if event.start_key is not None:
+        row = conn.execute(text(SYNC_EVENT_SELECT_SQL), {"key": event.start_key}).first()
+        drive_log_id = row.drive_log_id if row else None
+
+    drive_log = None
+    if drive_log_id is not None:
+        params = {"id": drive_log_id, "drive_log_date": None}
+        result = conn.execute(text(DRIVE_LOG_BY_ID_SQL), params)
+        drive_log = first_model_row(result, DriveLog)
+    if drive_log is None or drive_log.status != DriveLogStatus.IN_PROGRESS.value:
+        raise DriveNotInProgressError()
+
+    input = EndDriveInput(id=drive_log.id, end_km=event.end_km)
+    try:
+        conn.execute(text(END_DRIVE_SQL), end_drive_params(input))
+    except IntegrityError as e:
+        raise_drive_log_rule_error(e, start_km=drive_log.start_km, end_km=input.end_km)
+    return drive_log.id, drive_log.vehicle_id
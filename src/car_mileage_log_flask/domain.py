@@ -4,13 +4,26 @@ from enum import Enum
 from typing import Literal
 
 
-@dataclass
+@dataclass(slots=True)
 class JobSite:
     id: int | None
     name: str
     address: str
 
 
+@dataclass(slots=True)
+class Vehicle:
+    id: int | None
+    name: str
+    plate: str
+
+
+@dataclass(slots=True)
+class User:
+    id: int
+    username: str
+
+
 class DriveLogStatus(Enum):
     IN_PROGRESS = "in_progress"
     COMPLETED = "completed"
@@ -28,3 +41,48 @@ class EndKmTooLowError(Exception):
         super().__init__(
             f"End km ({end_km}) cannot be lower than Start km ({start_km})"
         )
+
+
+class DriveInProgressError(Exception):
+    def __init__(self) -> None:
+        super().__init__("Cannot be more than one drive in progress per vehicle")
+
+
+class DriveDateOutOfRangeError(Exception):
+    def __init__(self, date: date) -> None:
+        super().__init__(f"Cannot log a drive on {date}, {date.year} is not open for drive logs")
+
+
+class DriveNotInProgressError(Exception):
+    def __init__(self) -> None:
+        super().__init__("There is no drive in progress to end")
+
+
+class DriveLogNotSavedError(Exception):
+    def __init__(self, reason: str) -> None:
+        super().__init__(f"Not saved: {reason}")
+
+
+@dataclass
+class OdometerConflict:
+    drive_log_id: int
+    date: date
+    start_km: int
+    previous_end_km: int
+
+
+class OdometerConflictError(Exception):
+    def __init__(self, conflicts: list[OdometerConflict]) -> None:
+        self.conflicts = conflicts
+        super().__init__(
+            "; ".join(
+                f"The drive of {conflict.date} would start at {conflict.start_km} km,"
+                f" below the previous End km ({conflict.previous_end_km})"
+                for conflict in conflicts
+            )
+        )
+
+
+class DriveLogChangedError(Exception):
+    def __init__(self) -> None:
+        super().__init__("The drive log was changed since it was opened, review it and save again")
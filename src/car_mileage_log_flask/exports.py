@@ -0,0 +1,74 @@
+"""
+Drive log exports for accounting.
+
+Both formats consume an iterator of drive logs, so an export never holds more
+than one batch of rows in memory.
+"""
+
+import csv
+import io
+import tempfile
+from collections.abc import Iterable, Iterator
+from typing import IO
+
+from car_mileage_log_flask.db.reads import DriveLogCompleted
+
+EXPORT_HEADER = [
+    "date",
+    "job_site_name",
+    "job_site_address",
+    "start_km",
+    "end_km",
+    "distance_km",
+]
+
+# flush CSV output in chunks of about this many characters
+CSV_CHUNK_SIZE = 64 * 1024
+
+
+def _export_row(drive_log: DriveLogCompleted) -> list:
+    return [
+        drive_log.date,
+        drive_log.job_site_name,
+        drive_log.job_site_address,
+        drive_log.start_km,
+        drive_log.end_km,
+        drive_log.end_km - drive_log.start_km,
+    ]
+
+
+def iter_csv(drive_logs: Iterable[DriveLogCompleted]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_HEADER)
+
+    for drive_log in drive_logs:
+        writer.writerow(_export_row(drive_log))
+        if buffer.tell() >= CSV_CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def write_xlsx(drive_logs: Iterable[DriveLogCompleted]) -> IO[bytes]:
+    """
+    Write drive logs to a temporary XLSX file and return it, rewound.
+
+    Uses openpyxl's write-only mode, which spills rows to disk instead of
+    keeping them in memory. Raises ImportError when openpyxl is not installed.
+    """
+    # the `xlsx` extra
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Drive logs")
+    sheet.append(EXPORT_HEADER)
+    for drive_log in drive_logs:
+        sheet.append(_export_row(drive_log))
+
+    file = tempfile.TemporaryFile()
+    workbook.save(file)
+    file.seek(0)
+    return file
@@ -0,0 +1,101 @@
+"""
+Conditional GETs for the list and detail pages.
+
+A page's version comes from the database (see the version reads at the end
+of db/reads.py). Responses carry an ETag built from it and its Last-Modified,
+with `Cache-Control: private, no-cache`, so browsers keep the page and
+revalidate it on every visit. A request whose If-None-Match or
+If-Modified-Since still matches gets a 304 without the page being queried or
+rendered.
+
+Rendered pages are cached in process under their ETag, so other drivers, or
+the same one after their browser cache dropped the page, get it without
+rendering. Versions are part of the key, so entries never need invalidating;
+old ones are evicted. Pages with flashed messages are always rendered and
+never cached, the messages show once.
+"""
+
+import hashlib
+import os
+from collections.abc import Awaitable, Callable
+from functools import cache
+
+from flask import Flask, Response, current_app, request, session
+from werkzeug.http import is_resource_modified
+
+from car_mileage_log_flask.assets import manifest
+from car_mileage_log_flask.db.cache import LocalGeneration, TTLCache
+from car_mileage_log_flask.db.reads import ContentVersion
+
+page_cache = TTLCache(
+    ttl=float(os.getenv("PAGE_CACHE_TTL", "300")),
+    maxsize=int(os.getenv("PAGE_CACHE_MAXSIZE", "256")),
+    generation=LocalGeneration(),
+)
+
+
+@cache
+def _templates_digest(app: Flask) -> str:
+    # a deploy that changes the templates, or the assets they link, changes every ETag
+    digest = hashlib.blake2b(digest_size=8)
+    for name in sorted(app.jinja_env.list_templates()):
+        source, _, _ = app.jinja_env.loader.get_source(app.jinja_env, name)
+        digest.update(source.encode())
+    digest.update(repr(sorted(manifest().items())).encode())
+    return digest.hexdigest()
+
+
+def _etag(version: ContentVersion, key: tuple) -> str:
+    app = current_app._get_current_object()
+    parts = (_templates_digest(app), version.token, request.full_path, *key)
+    return hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+
+
+def _validated(response: Response, etag: str, version: ContentVersion) -> Response:
+    response.set_etag(etag)
+    response.last_modified = version.last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.vary.add("Cookie")
+    return response
+
+
+def _not_modified(etag: str, version: ContentVersion) -> bool:
+    return not is_resource_modified(
+        request.environ, etag=etag, last_modified=version.last_modified
+    )
+
+
+def conditional_page(
+    version: ContentVersion | None, render: Callable[[], str], key: tuple = ()
+) -> Response | str:
+    """
+    Answer a GET for a page at `version`, rendering it with `render` only when needed.
+
+    `key` is whatever else the page depends on beyond its URL, e.g. the current
+    vehicle. A `version` of None renders the page uncached.
+    """
+    if version is None or "_flashes" in session:
+        return render()
+
+    etag = _etag(version, key)
+    if _not_modified(etag, version):
+        return _validated(Response(status=304), etag, version)
+
+    body = page_cache.get_or_load(etag, render)
+    return _validated(Response(body, mimetype="text/html"), etag, version)
+
+
+async def conditional_page_async(
+    version: ContentVersion | None, render: Callable[[], Awaitable[str]], key: tuple = ()
+) -> Response | str:
+    """Same as `conditional_page`, for an async `render`. Shares the page cache with it."""
+    if version is None or "_flashes" in session:
+        return await render()
+
+    etag = _etag(version, key)
+    if _not_modified(etag, version):
+        return _validated(Response(status=304), etag, version)
+
+    body = await page_cache.get_or_load_async(etag, render)
+    return _validated(Response(body, mimetype="text/html"), etag, version)
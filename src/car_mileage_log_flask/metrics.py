@@ -0,0 +1,227 @@
+"""
+Request performance metrics.
+
+Per endpoint: request latency, number of DB queries and DB time per request,
+template render time and pool checkout wait. Exposed in Prometheus text format
+on /metrics and per response in a Server-Timing header.
+
+Off unless METRICS_ENABLED is set. When off nothing is registered, so requests
+pay nothing. Metrics live in the worker process; with several gunicorn workers
+each one reports its own.
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from dataclasses import dataclass
+
+from flask import (
+    Flask,
+    Response,
+    abort,
+    before_render_template,
+    g,
+    has_request_context,
+    request,
+    template_rendered,
+)
+from sqlalchemy import Engine, event
+
+from car_mileage_log_flask.db.cache import job_site_cache
+from car_mileage_log_flask.db.connection import env_flag
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+@dataclass
+class HistogramSpec:
+    name: str
+    help: str
+    buckets: tuple[float, ...]
+
+
+HISTOGRAMS = [
+    HistogramSpec(
+        "http_request_duration_seconds", "Request latency.", LATENCY_BUCKETS
+    ),
+    HistogramSpec(
+        "db_queries_per_request", "DB queries run by one request.", QUERY_COUNT_BUCKETS
+    ),
+    HistogramSpec(
+        "db_time_per_request_seconds", "Time one request spent in DB queries.", LATENCY_BUCKETS
+    ),
+    HistogramSpec(
+        "template_render_seconds", "Time one request spent rendering templates.", LATENCY_BUCKETS
+    ),
+    HistogramSpec(
+        "db_pool_checkout_wait_seconds", "Time one request waited for a pooled connection.", LATENCY_BUCKETS
+    ),
+]
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._histograms: dict[tuple[str, str], Histogram] = {}
+
+    def observe(self, name: str, endpoint: str, value: float) -> None:
+        spec = next(spec for spec in HISTOGRAMS if spec.name == name)
+        with self._lock:
+            histogram = self._histograms.get((name, endpoint))
+            if histogram is None:
+                histogram = self._histograms[(name, endpoint)] = Histogram(spec.buckets)
+            histogram.observe(value)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for spec in HISTOGRAMS:
+                lines.append(f"# HELP {spec.name} {spec.help}")
+                lines.append(f"# TYPE {spec.name} histogram")
+                for (name, endpoint), histogram in sorted(self._histograms.items()):
+                    if name != spec.name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(spec.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(
+                            f'{name}_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}'
+                        )
+                    lines.append(
+                        f'{name}_bucket{{endpoint="{endpoint}",le="+Inf"}} {histogram.count}'
+                    )
+                    lines.append(f'{name}_sum{{endpoint="{endpoint}"}} {histogram.sum}')
+                    lines.append(f'{name}_count{{endpoint="{endpoint}"}} {histogram.count}')
+
+        stats = job_site_cache.stats()
+        lines += [
+            "# HELP job_site_cache_hits_total Job site cache hits.",
+            "# TYPE job_site_cache_hits_total counter",
+            f"job_site_cache_hits_total {stats.hits}",
+            "# HELP job_site_cache_misses_total Job site cache misses.",
+            "# TYPE job_site_cache_misses_total counter",
+            f"job_site_cache_misses_total {stats.misses}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+@dataclass
+class RequestTimings:
+    start: float
+    db_queries: int = 0
+    db_time: float = 0.0
+    template_time: float = 0.0
+    template_start: float = 0.0
+
+
+def _timings() -> RequestTimings | None:
+    if not has_request_context():
+        return None
+    return g.get("request_timings")
+
+
+# one value per connection, a connection runs one query at a time; a failed
+# query, which gets no after_cursor_execute, is overwritten by the next one
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_start"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info.pop("query_start", None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    timings = _timings()
+    if timings is not None:
+        timings.db_queries += 1
+        timings.db_time += elapsed
+
+
+def _before_render_template(sender, template, context, **extra):
+    timings = _timings()
+    if timings is not None:
+        timings.template_start = time.perf_counter()
+
+
+def _template_rendered(sender, template, context, **extra):
+    timings = _timings()
+    if timings is not None:
+        timings.template_time += time.perf_counter() - timings.template_start
+
+
+def _start_timer():
+    g.request_timings = RequestTimings(start=time.perf_counter())
+
+
+def _server_timing(response: Response) -> Response:
+    timings = _timings()
+    if timings is None:
+        return response
+
+    elapsed = time.perf_counter() - timings.start
+    pool_wait = g.get("db_pool_wait", 0.0)
+    response.headers["Server-Timing"] = ", ".join(
+        [
+            f"app;dur={elapsed * 1000:.1f}",
+            f'db;dur={timings.db_time * 1000:.1f};desc="{timings.db_queries} queries"',
+            f"tpl;dur={timings.template_time * 1000:.1f}",
+            f"pool;dur={pool_wait * 1000:.1f}",
+        ]
+    )
+    return response
+
+
+# on teardown, which runs for a request that raised too, unlike after_request
+def _record(exc: BaseException | None) -> None:
+    timings = _timings()
+    if timings is None:
+        return
+
+    elapsed = time.perf_counter() - timings.start
+    pool_wait = g.get("db_pool_wait", 0.0)
+    endpoint = request.endpoint or "unmatched"
+
+    registry.observe("http_request_duration_seconds", endpoint, elapsed)
+    registry.observe("db_queries_per_request", endpoint, timings.db_queries)
+    registry.observe("db_time_per_request_seconds", endpoint, timings.db_time)
+    registry.observe("template_render_seconds", endpoint, timings.template_time)
+    registry.observe("db_pool_checkout_wait_seconds", endpoint, pool_wait)
+
+
+def metrics_endpoint():
+    token = os.getenv("METRICS_TOKEN")
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        abort(401)
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+
+def init_app(app: Flask) -> None:
+    if not env_flag("METRICS_ENABLED", False):
+        return
+
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    before_render_template.connect(_before_render_template, app)
+    template_rendered.connect(_template_rendered, app)
+    app.before_request(_start_timer)
+    app.after_request(_server_timing)
+    app.teardown_request(_record)
+    app.add_url_rule("/metrics", "metrics", metrics_endpoint)
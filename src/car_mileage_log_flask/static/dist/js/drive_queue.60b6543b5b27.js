@@ -0,0 +1,259 @@
+// Start and end drive events, queued in IndexedDB until POST /sync takes them.
+//
+// Forms marked data-drive-event="start" or "end" are posted as fragment
+// requests (the HX-Request header, as htmx sends it): the response is the next
+// screen, swapped in for #drive-screen, one round trip per drive event. When
+// the network fails, or events are already waiting, they submit through the
+// queue instead, so a drive started or ended without a connection is kept on
+// the device and sent once there is one: on the next page load, when the
+// browser goes online, or by sw.js on Background Sync where the browser has
+// it. sw.js loads this file too, only the form handling needs a document.
+const DriveQueue = (() => {
+    const DB_NAME = "drive-queue";
+    const STORE = "events";
+    const SYNC_TAG = "drive-queue";
+
+    function settle(request) {
+        return new Promise((resolve, reject) => {
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+    }
+
+    function done(transaction) {
+        return new Promise((resolve, reject) => {
+            transaction.oncomplete = () => resolve();
+            transaction.onerror = () => reject(transaction.error);
+            transaction.onabort = () => reject(transaction.error);
+        });
+    }
+
+    function open() {
+        const request = indexedDB.open(DB_NAME, 1);
+        // seq keeps the events in the order they were made
+        request.onupgradeneeded = () =>
+            request.result.createObjectStore(STORE, { keyPath: "seq", autoIncrement: true });
+        return settle(request);
+    }
+
+    async function all() {
+        const db = await open();
+        try {
+            return await settle(db.transaction(STORE).objectStore(STORE).getAll());
+        } finally {
+            db.close();
+        }
+    }
+
+    async function add(event) {
+        const db = await open();
+        try {
+            const transaction = db.transaction(STORE, "readwrite");
+            transaction.objectStore(STORE).add(event);
+            await done(transaction);
+        } finally {
+            db.close();
+        }
+    }
+
+    async function remove(seqs) {
+        if (!seqs.length) return;
+        const db = await open();
+        try {
+            const transaction = db.transaction(STORE, "readwrite");
+            const store = transaction.objectStore(STORE);
+            seqs.forEach((seq) => store.delete(seq));
+            await done(transaction);
+        } finally {
+            db.close();
+        }
+    }
+
+    // Sends every queued event in one batch and drops the ones the server
+    // answered, applied or rejected. Throws, keeping the queue, when the server
+    // cannot be reached or the session has expired.
+    async function flush() {
+        const queued = await all();
+        if (!queued.length) return { outcomes: [], states: [] };
+
+        const response = await fetch("/sync", {
+            method: "POST",
+            credentials: "same-origin",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ events: queued.map(({ seq, ...event }) => event) }),
+        });
+        // an expired session is redirected to the login page
+        if (!response.headers.get("Content-Type")?.includes("application/json")) {
+            throw new Error("Sign in to sync the drives saved on this device");
+        }
+        const result = await response.json();
+        if (response.status === 400 && result.index !== undefined) {
+            // a malformed event would hold up the queue for good
+            await remove([queued[result.index].seq]);
+        }
+        if (!response.ok) throw new Error(result.error);
+
+        const answered = new Set(result.outcomes.map((outcome) => outcome.key));
+        await remove(queued.filter((event) => answered.has(event.key)).map((event) => event.seq));
+        return result;
+    }
+
+    async function requestBackgroundSync() {
+        const registration = await navigator.serviceWorker?.ready;
+        await registration?.sync?.register(SYNC_TAG);
+    }
+
+    return { SYNC_TAG, all, add, flush, requestBackgroundSync };
+})();
+
+if (typeof document !== "undefined") {
+    (() => {
+        // looked up every time, it is part of the swapped screen
+        const statusElement = () => document.getElementById("drive-queue-status");
+
+        function notify(message, category) {
+            const status = statusElement();
+            if (!status) return;
+            const alert = document.createElement("div");
+            alert.className = `alert alert-${category}`;
+            alert.textContent = message;
+            status.append(alert);
+        }
+
+        function eventFromForm(form) {
+            const data = new FormData(form);
+            const event = { key: crypto.randomUUID(), type: form.dataset.driveEvent };
+            if (event.type === "start") {
+                event.date = data.get("date");
+                event.start_km = data.get("start_km");
+                event.job_site_id = data.get("job_site_id");
+                event.vehicle_id = form.dataset.vehicleId;
+            } else {
+                event.end_km = data.get("end_km");
+                if (form.dataset.driveLogId) event.drive_log_id = form.dataset.driveLogId;
+                else event.start_key = form.dataset.startKey;
+            }
+            return event;
+        }
+
+        // a drive started on this device and not synced yet is ended from the start page
+        function showOfflineEnd(start) {
+            const startForm = document.querySelector("form[data-drive-event='start']");
+            const endForm = document.getElementById("offline-end-form");
+            if (!startForm || !endForm) return;
+            startForm.hidden = true;
+            endForm.hidden = false;
+            endForm.dataset.startKey = start.key;
+            endForm.querySelector("[data-start-summary]").textContent =
+                `date: ${start.date}, start_km: ${start.start_km}km`;
+        }
+
+        function showQueued(queued) {
+            if (!queued.length) return;
+            notify(`${queued.length} drive event(s) saved on this device, they sync when online`, "info");
+            const last = queued[queued.length - 1];
+            if (last.type === "start") showOfflineEnd(last);
+        }
+
+        function showRejected(result, except) {
+            result.outcomes
+                .filter((outcome) => !outcome.applied && outcome.key !== except)
+                .forEach((outcome) => notify(`Not synced: ${outcome.error}`, "danger"));
+        }
+
+        async function sync() {
+            try {
+                const result = await DriveQueue.flush();
+                showRejected(result);
+                return result;
+            } catch (error) {
+                await DriveQueue.requestBackgroundSync();
+                showQueued(await DriveQueue.all());
+                if (navigator.onLine) notify(error.message, "warning");
+                return null;
+            }
+        }
+
+        // the server answers with the next screen, or the same one with its errors
+        async function post(form) {
+            const response = await fetch(form.action, {
+                method: "POST",
+                body: new FormData(form),
+                credentials: "same-origin",
+                headers: { "HX-Request": "true" },
+            });
+            // a page instead of a screen, e.g. the login page for an expired session
+            const redirect = response.headers.get("HX-Redirect") ?? (response.redirected && response.url);
+            if (redirect) {
+                window.location.assign(redirect);
+                return;
+            }
+            if (!response.ok) {
+                notify(`Not saved: ${response.status} ${response.statusText}`, "danger");
+                return;
+            }
+
+            const html = await response.text();
+            document.querySelectorAll("main > .alert").forEach((alert) => alert.remove());
+            document.getElementById("drive-screen").outerHTML = html;
+            const url = response.headers.get("HX-Push-Url");
+            if (url && url !== window.location.pathname) history.pushState(null, "", url);
+        }
+
+        async function submit(form) {
+            statusElement()?.replaceChildren();
+            if (navigator.onLine && !(await DriveQueue.all()).length) {
+                try {
+                    await post(form);
+                    return;
+                } catch (error) {
+                    // fetch rejects with a TypeError when the network fails, the event is queued
+                    if (!(error instanceof TypeError)) throw error;
+                }
+            }
+
+            const event = eventFromForm(form);
+            await DriveQueue.add(event);
+            const result = await sync();
+            const outcome = result?.outcomes.find((outcome) => outcome.key === event.key);
+            if (outcome?.applied) {
+                const next = event.type === "start" ? `/end-drive/${outcome.drive_log_id}` : "/start-drive";
+                window.location.assign(next);
+            } else if (outcome) {
+                notify(outcome.error, "danger");
+            }
+        }
+
+        // on the document, the forms are replaced with every screen
+        document.addEventListener("submit", (event) => {
+            const form = event.target.closest("form[data-drive-event]");
+            if (!form) return;
+            event.preventDefault();
+            submit(form);
+        });
+
+        // screens were swapped in without loading their page
+        window.addEventListener("popstate", () => window.location.reload());
+
+        window.addEventListener("online", async () => {
+            const result = await sync();
+            if (result?.outcomes.some((outcome) => outcome.applied)) window.location.reload();
+        });
+
+        navigator.serviceWorker?.addEventListener("message", (message) => {
+            if (message.data?.type === "drive-queue-synced") window.location.reload();
+        });
+        navigator.serviceWorker?.register("/sw.js");
+
+        DriveQueue.all().then((queued) => {
+            if (!queued.length) return;
+            if (navigator.onLine) {
+                sync().then((result) => {
+                    if (result?.outcomes.some((outcome) => outcome.applied)) window.location.reload();
+                });
+            } else {
+                showQueued(queued);
+            }
+        });
+    })();
+}
@@ -0,0 +1,29 @@
+// The start drive job site select starts with the most recent job sites, typing
+// in the search box replaces them with the best matches. Listens on the
+// document, so it keeps working when drive_queue.js swaps the screen.
+(() => {
+    let timer;
+    let controller;
+
+    document.addEventListener("input", (event) => {
+        const search = event.target;
+        if (search.id !== "job_site_search") return;
+
+        clearTimeout(timer);
+        timer = setTimeout(async () => {
+            controller?.abort();
+            controller = new AbortController();
+            const url = `${search.dataset.url}?q=${encodeURIComponent(search.value)}`;
+            try {
+                const response = await fetch(url, { signal: controller.signal });
+                if (!response.ok) return;
+                const jobSites = await response.json();
+                document.getElementById("job_site_id")?.replaceChildren(
+                    ...jobSites.map((jobSite) => new Option(`${jobSite.address} (${jobSite.name})`, jobSite.id))
+                );
+            } catch (error) {
+                if (error.name !== "AbortError") throw error;
+            }
+        }, 200);
+    });
+})();
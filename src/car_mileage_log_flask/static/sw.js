@@ -0,0 +1,54 @@
+// Keeps the start and end drive pages and their assets for offline use and
+// flushes the drive queue (static/js/drive_queue.js) on Background Sync.
+importScripts("/static/js/drive_queue.js");
+
+const CACHE = "drive-pages-v2";
+const OFFLINE_PATHS = [/^\/start-drive$/, /^\/end-drive\/\d+$/, /^\/static\//, /^\/assets\//];
+
+self.addEventListener("install", () => self.skipWaiting());
+
+self.addEventListener("activate", (event) => {
+    event.waitUntil(
+        caches
+            .keys()
+            .then((keys) => Promise.all(keys.filter((key) => key !== CACHE).map((key) => caches.delete(key))))
+            .then(() => self.clients.claim())
+    );
+});
+
+function kept(request) {
+    const url = new URL(request.url);
+    if (url.origin !== self.location.origin) return false;
+    return OFFLINE_PATHS.some((path) => path.test(url.pathname));
+}
+
+async function networkFirst(request) {
+    const cache = await caches.open(CACHE);
+    try {
+        const response = await fetch(request);
+        if (response.ok && !response.redirected) await cache.put(request, response.clone());
+        return response;
+    } catch (error) {
+        const cached =
+            (await cache.match(request)) ??
+            (request.mode === "navigate" ? await cache.match("/start-drive") : undefined);
+        if (cached) return cached;
+        throw error;
+    }
+}
+
+self.addEventListener("fetch", (event) => {
+    if (event.request.method !== "GET" || !kept(event.request)) return;
+    event.respondWith(networkFirst(event.request));
+});
+
+self.addEventListener("sync", (event) => {
+    if (event.tag !== DriveQueue.SYNC_TAG) return;
+    event.waitUntil(
+        DriveQueue.flush().then(async (result) => {
+            if (!result.outcomes.length) return;
+            const clients = await self.clients.matchAll({ type: "window" });
+            clients.forEach((client) => client.postMessage({ type: "drive-queue-synced" }));
+        })
+    );
+});